@@ -0,0 +1,187 @@
+"""
+Job store for asynchronous parses (POST /api/parse with "async": true).
+
+A job is the uploaded PDF plus its options, a status (queued, running, done,
+failed), progress counters and finally the orders or an error. The parse
+function only talks to the JobStore interface, so the store is pluggable:
+JOB_STORE=sqlite (the default) keeps jobs in a local SQLite file, and
+JOB_STORE=package.module:factory loads any other implementation, e.g. one
+backed by a database every serverless instance can reach. The local store
+only sees jobs of the machine it runs on.
+"""
+import importlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+JOB_STORE = os.environ.get('JOB_STORE', 'sqlite')
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join(tempfile.gettempdir(), 'pdf-parse-jobs.sqlite3'))
+
+# Finished jobs are deleted after JOB_TTL_SECONDS. A running job whose progress
+# hasn't moved for JOB_STALE_SECONDS lost its worker and is queued again, up to
+# JOB_MAX_ATTEMPTS runs in total; the next claim() of any job does the requeueing.
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', str(24 * 60 * 60)))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '300'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '2'))
+
+
+class JobStore:
+    """Interface every job store implements.
+
+    Jobs are returned as dicts: id, status, options, progress (pagesTotal,
+    pagesExtracted, ordersParsed), createdAt, updatedAt (epoch seconds), plus
+    orders once done or error once failed.
+    """
+
+    def create(self, pdf_bytes, options):
+        """Store a queued job and return its id"""
+        raise NotImplementedError
+
+    def claim(self, job_id=None):
+        """Mark a queued job (the given one, or the oldest) running; (job, pdf_bytes) or None"""
+        raise NotImplementedError
+
+    def progress(self, job_id, pages_total=None, pages_extracted=None, orders_parsed=None):
+        """Record how far a running job has got"""
+        raise NotImplementedError
+
+    def finish(self, job_id, orders):
+        """Mark a job done with its orders"""
+        raise NotImplementedError
+
+    def fail(self, job_id, error):
+        """Mark a job failed with an error message"""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """The job dict, or None for an unknown (or expired) id"""
+        raise NotImplementedError
+
+
+class SqliteJobStore(JobStore):
+    """Jobs in one SQLite file; safe to share between processes on one machine"""
+
+    def __init__(self, path=JOB_STORE_PATH, ttl=JOB_TTL_SECONDS, stale=JOB_STALE_SECONDS,
+                 max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.ttl = ttl
+        self.stale = stale
+        self.max_attempts = max_attempts
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                options TEXT NOT NULL,
+                pdf BLOB,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                pages_total INTEGER,
+                pages_extracted INTEGER NOT NULL DEFAULT 0,
+                orders_parsed INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )''')
+            db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call: cheap for SQLite, and safe across threads and forks
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def create(self, pdf_bytes, options):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute('DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?', ('done', 'failed', now - self.ttl))
+            db.execute('INSERT INTO jobs (id, status, options, pdf, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                       (job_id, 'queued', json.dumps(options), bytes(pdf_bytes), now, now))
+        return job_id
+
+    def claim(self, job_id=None):
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                self._requeue_stale(db, now)
+                if job_id is None:
+                    row = db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+                else:
+                    row = db.execute("SELECT id FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).fetchone()
+                if row is None:
+                    db.execute('COMMIT')
+                    return None
+                db.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                           (now, row[0]))
+                pdf = db.execute('SELECT pdf FROM jobs WHERE id = ?', (row[0],)).fetchone()[0]
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return self.get(row[0]), pdf
+
+    def _requeue_stale(self, db, now):
+        """Queue running jobs whose worker went quiet again, or fail them once out of attempts"""
+        cutoff = now - self.stale
+        db.execute("UPDATE jobs SET status = 'failed', pdf = NULL, error = ?, updated_at = ? "
+                   "WHERE status = 'running' AND updated_at < ? AND attempts >= ?",
+                   ('Worker stopped responding', now, cutoff, self.max_attempts))
+        db.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running' AND updated_at < ?",
+                   (now, cutoff))
+
+    def progress(self, job_id, pages_total=None, pages_extracted=None, orders_parsed=None):
+        with self._connect() as db:
+            db.execute('UPDATE jobs SET pages_total = COALESCE(?, pages_total), '
+                       'pages_extracted = COALESCE(?, pages_extracted), orders_parsed = COALESCE(?, orders_parsed), '
+                       'updated_at = ? WHERE id = ?',
+                       (pages_total, pages_extracted, orders_parsed, time.time(), job_id))
+
+    def finish(self, job_id, orders):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'done', pdf = NULL, result = ?, orders_parsed = ?, updated_at = ? "
+                       "WHERE id = ?", (json.dumps(orders), len(orders), time.time(), job_id))
+
+    def fail(self, job_id, error):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'failed', pdf = NULL, error = ?, updated_at = ? WHERE id = ?",
+                       (error, time.time(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute('SELECT id, status, options, pages_total, pages_extracted, orders_parsed, result, error, '
+                             'created_at, updated_at FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            'id': row[0],
+            'status': row[1],
+            'options': json.loads(row[2]),
+            'progress': {'pagesTotal': row[3], 'pagesExtracted': row[4], 'ordersParsed': row[5]},
+            'createdAt': row[8],
+            'updatedAt': row[9]
+        }
+        if row[6] is not None:
+            job['orders'] = json.loads(row[6])
+        if row[7] is not None:
+            job['error'] = row[7]
+        return job
+
+
+def load_job_store(spec=None):
+    """The store JOB_STORE names: 'sqlite', or 'package.module:factory' called without arguments"""
+    spec = spec or JOB_STORE
+    if spec == 'sqlite':
+        return SqliteJobStore()
+    module_name, _, attribute = spec.partition(':')
+    if not attribute:
+        raise ValueError(f"JOB_STORE must be 'sqlite' or 'package.module:factory', got '{spec}'")
+    return getattr(importlib.import_module(module_name), attribute)()
@@ -0,0 +1,156 @@
+"""
+Per-process counters and latency histograms in the Prometheus text format.
+
+Every serverless instance keeps its own registry, so each function serves the
+metrics of the process that handled its requests (GET /api/parse?metrics,
+GET /api/queue?metrics) and Prometheus sums them across instances. Only the
+standard library is used, so importing this costs the endpoints nothing at
+cold start.
+"""
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers a cached parse (~10 ms) up to a large PDF near the function timeout
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(names, values):
+    """'{a="1",b="2"}' with Prometheus escaping, or '' without labels"""
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic total per label combination"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labels:
+            items = [((), 0)]  # an unlabelled counter is reported from zero
+        for key, value in items:
+            yield self.name + format_labels(self.labels, key), value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        bucket_labels = self.labels + ('le',)
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield self.name + '_bucket' + format_labels(bucket_labels, key + (format_value(bound),)), cumulative
+            yield self.name + '_sum' + format_labels(self.labels, key), counts[-1]
+            yield self.name + '_count' + format_labels(self.labels, key), cumulative
+
+
+class MetricsRegistry:
+    """Named counters and histograms plus collectors evaluated at scrape time"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def collector(self, collect):
+        """Register collect() -> iterable of (name, kind, help, [(labels dict, value), ...]).
+
+        For values another object already keeps (pattern counters, cache
+        hits), so the hot path does no extra bookkeeping.
+        """
+        self._collectors.append(collect)
+        return collect
+
+    def _add(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # A module imported twice (reload, or as both api.x and x) keeps counting into the same series
+            if existing.kind != metric.kind or existing.labels != metric.labels:
+                raise ValueError(f"Metric '{metric.name}' is already registered differently")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {format_value(value)}" for sample, value in metric.samples())
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(tuple(labels), tuple(labels.values()))} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def send_metrics(request_handler):
+    """Write REGISTRY as a text/plain response on a BaseHTTPRequestHandler"""
+    body = REGISTRY.render().encode('utf-8')
+    request_handler.send_response(200)
+    request_handler.send_header('Content-type', CONTENT_TYPE)
+    request_handler.send_header('Access-Control-Allow-Origin', '*')
+    request_handler.send_header('Cache-Control', 'no-store')
+    request_handler.send_header('Content-Length', str(len(body)))
+    request_handler.end_headers()
+    request_handler.wfile.write(body)
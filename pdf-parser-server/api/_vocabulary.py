@@ -0,0 +1,141 @@
+"""
+Games, rarities and conditions the card patterns recognise.
+
+Built once at import into lookup tables, so the engines classify a token
+with a dict or set lookup instead of each pattern carrying its own
+alternation or alias table: game names (the "<Game> - <Set>" lines and a
+game stuck to the end of a condition), rarity words and letter codes (a
+rarity in the collector-number column), and condition phrases with their
+suffixes ("Near Mint 1st Edition", "Lightly Played Foil") for the layout
+engine's product cells. Only the lookups live here; how a row is split into
+fields stays with the pattern that reads it.
+
+When TCGplayer adds a game, rarity or condition, VOCABULARY_FILE can name a
+JSON file whose entries are added to the built-in ones, with no regex to
+edit:
+
+    {"games": ["Lorcana"], "rarities": {"enchanted": "Enchanted"}, "rarity_codes": ["E"],
+     "conditions": ["Played"], "condition_suffixes": ["Etched"], "condition_tokens": ["pl"]}
+
+DIGEST hashes the loaded tables. It is part of the parse-cache key and of the
+pattern profile, so nothing parsed or planned with another vocabulary is reused.
+"""
+import hashlib
+import json
+import os
+import re
+
+VOCABULARY_FILE = os.environ.get('VOCABULARY_FILE', '')
+
+GAMES = ["Magic", "Pokemon", "Yu-Gi-Oh", "YuGiOh", "Marvel's Spider-Man"]
+# Games cut from the end of a condition ("Lightly Played Magic"); "YuGiOh" never has been
+TRAILING_GAMES = ["Magic", "Pokemon", "Yu-Gi-Oh", "Marvel's Spider-Man"]
+
+# Lowercased rarity word -> how it is reported
+RARITIES = {
+    'common': 'Common', 'uncommon': 'Uncommon', 'rare': 'Rare', 'mythic': 'Mythic',
+    'special': 'Special', 'promo': 'Promo', 'short print': 'Short Print',
+    'secret rare': 'Secret Rare', 'double rare': 'Double Rare',
+    'illustration rare': 'Illustration Rare', 'ultra rare': 'Ultra Rare',
+    'holo rare': 'Holo Rare', 'super rare': 'Super Rare'
+}
+# One-letter rarities, reported as written. Pattern 9 rows also take L and T
+# (Magic lands and tokens); Pattern 8 rows don't.
+RARITY_CODES = ['C', 'U', 'R', 'M', 'S']
+LAND_TOKEN_CODES = ['L', 'T']
+
+CONDITIONS = ['Near Mint', 'Lightly Played', 'Moderately Played', 'Heavily Played', 'Damaged']
+CONDITION_SUFFIXES = ['1st', 'Edition', 'Unlimited', 'Limited', 'Foil', 'Holofoil', 'Reverse', 'Holo']
+
+# Lowercased words (and abbreviations) that continue a condition wrapped onto the next line
+CONDITION_TOKENS = [
+    'near', 'mint', 'lightly', 'played', 'moderately', 'heavily', 'damaged', 'foil',
+    'nm', 'lp', 'mp', 'hp', 'nif', 'lpf', 'mpf', 'nmf', 'good', 'excellent', 'poor',
+    'signed', 'graded', 'pld', 'gd', 'ex', 'sp', 'pr', 'moderate', 'light'
+]
+
+
+def load_extensions(path):
+    """Add the entries of a VOCABULARY_FILE to the built-in lists"""
+    with open(path) as f:
+        extra = json.load(f)
+    unknown = set(extra) - {'games', 'rarities', 'rarity_codes', 'conditions', 'condition_suffixes',
+                            'condition_tokens'}
+    if unknown:
+        raise ValueError(f"{path}: unknown vocabulary keys {sorted(unknown)}")
+    rarities = extra.get('rarities', {})
+    if isinstance(rarities, list):
+        rarities = {rarity.lower(): rarity for rarity in rarities}
+    GAMES.extend(game for game in extra.get('games', []) if game not in GAMES)
+    TRAILING_GAMES.extend(game for game in extra.get('games', []) if game not in TRAILING_GAMES)
+    RARITIES.update((word.lower(), rarity) for word, rarity in rarities.items())
+    RARITY_CODES.extend(code.upper() for code in extra.get('rarity_codes', []))
+    CONDITIONS.extend(condition for condition in extra.get('conditions', []) if condition not in CONDITIONS)
+    CONDITION_SUFFIXES.extend(extra.get('condition_suffixes', []))
+    CONDITION_TOKENS.extend(token.lower() for token in extra.get('condition_tokens', []))
+    # A new condition's words continue a wrapped condition like the built-in ones
+    CONDITION_TOKENS.extend(word.lower() for condition in extra.get('conditions', []) for word in condition.split())
+
+
+if VOCABULARY_FILE:
+    load_extensions(VOCABULARY_FILE)
+
+GAMES = tuple(GAMES)
+TRAILING_GAMES = tuple(TRAILING_GAMES)
+RARITY_CODES = frozenset(RARITY_CODES)
+RARITY_CODES_WITH_LANDS = RARITY_CODES | frozenset(LAND_TOKEN_CODES)
+CONDITIONS = tuple(CONDITIONS)
+CONDITION_PHRASES = frozenset(CONDITIONS)
+CONDITION_SUFFIXES = frozenset(CONDITION_SUFFIXES)
+CONDITION_TOKENS = frozenset(CONDITION_TOKENS)
+
+DIGEST = hashlib.sha256(json.dumps([
+    GAMES, TRAILING_GAMES, RARITIES, sorted(RARITY_CODES), LAND_TOKEN_CODES, CONDITIONS,
+    sorted(CONDITION_SUFFIXES), sorted(CONDITION_TOKENS)
+], sort_keys=True).encode()).hexdigest()[:16]
+
+# Trailing games by their last GAME_TAIL characters, so a condition's tail finds
+# its candidates in one lookup
+GAME_TAIL = min(len(game) for game in TRAILING_GAMES)
+GAMES_BY_TAIL = {}
+for _game in TRAILING_GAMES:
+    GAMES_BY_TAIL.setdefault(_game[-GAME_TAIL:], []).append(_game)
+
+
+def game_alternation():
+    """Regex alternation of the game names, longest first"""
+    return '|'.join(re.escape(game) for game in sorted(GAMES, key=len, reverse=True))
+
+
+def rarity_for(token, codes=RARITY_CODES):
+    """The rarity a collector-column token names ("U", "Secret Rare"), or None"""
+    token = token.strip()
+    if len(token) == 1:
+        code = token.upper()
+        return code if code in codes else None
+    return RARITIES.get(token.lower())
+
+
+def strip_trailing_game(condition):
+    """condition without a game name stuck to its end ("Lightly Played Magic")"""
+    for game in GAMES_BY_TAIL.get(condition[-GAME_TAIL:], ()):
+        if condition.endswith(game):
+            return condition[: -len(game)].rstrip()
+    return condition
+
+
+def is_condition(text):
+    """Whether text is exactly a condition phrase followed by any suffixes"""
+    words = text.split()
+    for end in range(len(words), 0, -1):
+        if ' '.join(words[:end]) in CONDITION_PHRASES:
+            return True
+        if words[end - 1] not in CONDITION_SUFFIXES:
+            return False
+    return False
+
+
+def is_condition_suffix(text):
+    """Whether text is only condition suffixes ("1st Edition", "Foil"), as on a wrapped line"""
+    words = text.split()
+    return bool(words) and all(word in CONDITION_SUFFIXES for word in words)
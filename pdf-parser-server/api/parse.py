@@ -6,280 +6,1944 @@ from http.server import BaseHTTPRequestHandler
 import json
 import re
 import io
+import os
 import base64
+import hashlib
+import tempfile
+import gzip
+import atexit
+import heapq
+import random
+import threading
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl
+from time import perf_counter, time
+try:
+    import fcntl
+except ImportError:  # Windows: pattern profile flushes aren't serialised across processes
+    fcntl = None
 
 try:
-    import pdfplumber
+    from _metrics import REGISTRY as METRICS, send_metrics
+except ImportError:
+    from api._metrics import REGISTRY as METRICS, send_metrics
+try:
+    import _vocabulary as VOCABULARY
 except ImportError:
-    pdfplumber = None
+    from api import _vocabulary as VOCABULARY
 
+# pdfplumber (with pdfminer, Pillow and cryptography behind it) is most of this
+# module's import time, so it is loaded on first use by load_pdfplumber() rather
+# than at cold start, where OPTIONS preflights and rejected requests never need it.
+pdfplumber = None
 
-class handler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        """Handle PDF upload and parsing"""
-        try:
-            # Read request body
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            
-            # Parse JSON body
-            try:
-                body = json.loads(post_data.decode('utf-8'))
-                pdf_base64 = body.get('pdf')
-                
-                if not pdf_base64:
-                    self.send_error_response(400, "Missing 'pdf' field in request body")
-                    return
-                
-                # Decode base64 PDF
-                pdf_bytes = base64.b64decode(pdf_base64)
-                
-            except json.JSONDecodeError:
-                self.send_error_response(400, "Invalid JSON in request body")
-                return
-            except Exception as e:
-                self.send_error_response(400, f"Error decoding PDF: {str(e)}")
-                return
-            
-            # Check if pdfplumber is available
-            if pdfplumber is None:
-                self.send_error_response(500, "pdfplumber not installed")
+# Card extraction engine: 'legacy' runs every pattern family as its own scan,
+# 'linear' classifies each line once and only visits the lines a family can match,
+# 'layout' reads the item table's columns from word positions (LayoutBackend).
+CARD_ENGINES = ('legacy', 'linear', 'layout')
+CARD_ENGINE = os.environ.get('CARD_ENGINE', 'legacy')
+
+# Line token kinds for the linear engine. A cleaned line can carry several kinds;
+# each kind is a cheap necessary condition for one or more pattern families.
+TOKEN_QTY = 1             # bare quantity line, e.g. "1"
+TOKEN_LEADING_DIGIT = 2   # starts with a digit ("1 Card - #12 - ...")
+TOKEN_CONT = 4            # starts with '-' (condition continuation / wrapped header)
+TOKEN_HASH = 8            # contains a '#' collector marker
+TOKEN_BIN = 16            # contains a "Bin" location
+TOKEN_DASH = 32           # contains at least one '-'
+TOKEN_DASH3 = 64          # contains three or more '-' (full "name - col - rarity - cond" rows)
+TOKEN_DASH_END = 128      # ends with '-' (header continued on the next line)
+TOKEN_GAME_SET = 256      # "<Game> - <Set>" line, optionally prefixed by a quantity
+
+# Pattern timing: every pattern run counts attempts and hits, but only times itself
+# (two perf_counter calls per match) with PATTERN_TIMING=1. Otherwise the 'ms' of
+# pattern stats, timings.patternFamilies and pdf_parser_pattern_seconds_total stay 0.
+PATTERN_TIMING = os.environ.get('PATTERN_TIMING', '0') == '1'
+
+
+class CountedPattern:
+    """A compiled regex that records how often it is run, and how long when timed is set"""
+    __slots__ = ('name', 'source', 'flags', 'family', 'regex', 'attempts', 'hits', 'seconds')
+    timed = PATTERN_TIMING
+
+    def __init__(self, name, source, flags=0, family=None):
+        self.name = name
+        self.source = source
+        self.flags = flags
+        self.family = family
+        self.regex = None  # compiled by PatternRegistry on first lookup
+        self.attempts = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def match(self, string, pos=0):
+        if self.timed:
+            start = perf_counter()
+            m = self.regex.match(string, pos)
+            self.seconds += perf_counter() - start
+        else:
+            m = self.regex.match(string, pos)
+        self.attempts += 1
+        if m:
+            self.hits += 1
+        return m
+
+    def search(self, string, pos=0):
+        if self.timed:
+            start = perf_counter()
+            m = self.regex.search(string, pos)
+            self.seconds += perf_counter() - start
+        else:
+            m = self.regex.search(string, pos)
+        self.attempts += 1
+        if m:
+            self.hits += 1
+        return m
+
+    def finditer(self, string):
+        """Yield matches like re.finditer; one attempt per scan, one hit per match"""
+        self.attempts += 1
+        matches = self.regex.finditer(string)
+        if not self.timed:
+            for m in matches:
+                self.hits += 1
+                yield m
+            return
+        while True:
+            start = perf_counter()
+            m = next(matches, None)
+            self.seconds += perf_counter() - start
+            if m is None:
                 return
-            
-            # Parse PDF
-            orders = self.parse_pdf(pdf_bytes)
-            
-            # Return JSON response
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            # Aggregate debug info
-            total_debug = {
-                'pattern_0b_attempts': 0, 
-                'pattern_0b_matches': 0,
-                'pattern_0b_digit_fails': 0,
-                'pattern_0b_collector_fails': 0,
-                'pattern_0c_attempts': 0, 
-                'pattern_0c_matches': 0,
-                'theoden_found': False,
-                'squirtle_found': False
-            }
-            for order in orders:
-                if 'debug' in order:
-                    for key in ['pattern_0b_attempts', 'pattern_0b_matches', 'pattern_0b_digit_fails', 
-                               'pattern_0b_collector_fails', 'pattern_0c_attempts', 'pattern_0c_matches']:
-                        total_debug[key] += order['debug'].get(key, 0)
-                    total_debug['theoden_found'] = total_debug['theoden_found'] or order['debug'].get('theoden_found', False)
-                    total_debug['squirtle_found'] = total_debug['squirtle_found'] or order['debug'].get('squirtle_found', False)
-            
-            response = {
-                'success': True,
-                'orders': orders,
-                'totalOrders': len(orders),
-                'debug': total_debug
-            }
-            
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-            
-        except Exception as e:
-            self.send_error_response(500, f"Internal server error: {str(e)}")
-    
-    def do_OPTIONS(self):
-        """Handle CORS preflight"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-    
-    def send_error_response(self, code, message):
-        """Send error response"""
-        self.send_response(code)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        
-        response = {
-            'success': False,
-            'error': message
-        }
+            self.hits += 1
+            yield m
+
+    def sub(self, repl, string):
+        if self.timed:
+            start = perf_counter()
+            result, count = self.regex.subn(repl, string)
+            self.seconds += perf_counter() - start
+        else:
+            result, count = self.regex.subn(repl, string)
+        self.attempts += 1
+        if count:
+            self.hits += 1
+        return result
+
+
+class PatternRegistry:
+    """Every regex the parser runs, addressed by name.
+
+    Registering a pattern only records its source; it is compiled the first
+    time it is looked up, so a cold start compiles only the patterns the
+    request actually runs.
+    """
+
+    def __init__(self):
+        self._patterns = {}
+        self._family = None
+
+    def family(self, name):
+        """Put the patterns registered from here on in the named family"""
+        self._family = name
+
+    def register(self, name, pattern, flags=0):
+        if name in self._patterns:
+            raise ValueError(f"Pattern '{name}' is already registered")
+        counted = CountedPattern(name, pattern, flags, self._family)
+        self._patterns[name] = counted
+        return counted
+
+    def __getitem__(self, name):
+        counted = self._patterns[name]
+        if counted.regex is None:
+            counted.regex = re.compile(counted.source, counted.flags)
+        return counted
+
+    def names(self):
+        return list(self._patterns)
+
+    def snapshot(self):
+        """Current (attempts, hits, seconds) per pattern, for diffing with stats()"""
+        return {name: (p.attempts, p.hits, p.seconds) for name, p in self._patterns.items()}
+
+    def restore(self, snapshot):
+        """Put every counter back to a snapshot(), forgetting the matching done since"""
+        for name, p in self._patterns.items():
+            p.attempts, p.hits, p.seconds = snapshot.get(name, (0, 0, 0.0))
+
+    def stats(self, since=None):
+        """Per-pattern counters (optionally relative to a snapshot); unused patterns are omitted"""
+        result = {}
+        for name, p in self._patterns.items():
+            attempts, hits, seconds = p.attempts, p.hits, p.seconds
+            if since and name in since:
+                base_attempts, base_hits, base_seconds = since[name]
+                attempts -= base_attempts
+                hits -= base_hits
+                seconds -= base_seconds
+            if attempts:
+                result[name] = {'attempts': attempts, 'hits': hits, 'ms': round(seconds * 1000, 3)}
+        return result
+
+    def family_totals(self):
+        """Cumulative (attempts, hits, seconds) per pattern family, for the metrics endpoint"""
+        totals = {}
+        for p in self._patterns.values():
+            attempts, hits, seconds = totals.get(p.family, (0, 0, 0.0))
+            totals[p.family] = (attempts + p.attempts, hits + p.hits, seconds + p.seconds)
+        return totals
+
+    def family_stats(self, since=None):
+        """stats() summed per pattern family: {family: {'attempts', 'hits', 'ms'}}"""
+        result = {}
+        for name, counters in self.stats(since).items():
+            family = result.setdefault(self._patterns[name].family, {'attempts': 0, 'hits': 0, 'ms': 0.0})
+            family['attempts'] += counters['attempts']
+            family['hits'] += counters['hits']
+            family['ms'] = round(family['ms'] + counters['ms'], 3)
+        return result
+
+    def reset(self):
+        for p in self._patterns.values():
+            p.attempts = p.hits = 0
+            p.seconds = 0.0
+
+
+PATTERNS = PatternRegistry()
+
+# Order split and buyer name
+PATTERNS.family('order')
+PATTERNS.register('order_header', r'Direct by TCGplayer #\s*(\d{6}-[A-F0-9]{4})')
+PATTERNS.register('shipping_header', r'Shipping Address\s*\n')
+# Buyer names are tokenized by extract_buyer_name; these only check one word or anchor one address line
+PATTERNS.register('buyer_token', r"[A-Za-z]'?[A-Za-z\-]*\.?\Z")
+PATTERNS.register('buyer_address', r'\s*(?:(?:[A-Za-z0-9\-]+[ \t]+[A-Za-z0-9 \t]+)|(?:[Pp]\.?[Oo]\.?[ \t]+[Bb][Oo][Xx][ \t]+[\w\-]+)|(?:CMR[ \t]+\d+[ \t]+Box[ \t]+\d+)|(?:HC[ \t]+\d+[ \t]+BOX[ \t]+[\w\-]+)|(?:RR[ \t]+\d+[ \t]+Box[ \t]+[\w\-]+))')
+
+# Line cleanup
+PATTERNS.family('cleanup')
+PATTERNS.register('slot_header', r'^Slot\s+[A-Z]\s+-\s+', re.IGNORECASE)
+PATTERNS.register('table_header', r'^(SLOT\s+)?QTY\s+PRODUCT\s+NAME\s+SET\s+NAME$', re.IGNORECASE)
+PATTERNS.register('slot_prefix', r'^[A-Z](?:-[A-Z])?\s+(\d+)\s+(.*)$')
+
+# Slot rows (Patterns 0, 0a, 0b, 0c), matched one line at a time
+PATTERNS.family('slot_rows')
+PATTERNS.register('0', r'^(.+?)\s+-\s+#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
+PATTERNS.register('0a', r'^(.+?)\s+-\s+#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s*(.*)$')
+PATTERNS.register('0b', r'^(.+?)\s+-\s+([A-Za-z\-\']+)\s+-\s+(.+)$')
+PATTERNS.register('0c', r'^(.+)\s+-\s*$')
+PATTERNS.register('qty_game_set', r'^(\d+)\s+([A-Za-z\-\']+)\s+-\s+(.+)$')
+PATTERNS.register('collector_rarity_cond', r'^#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+)$')
+PATTERNS.register('next_header', r'^(.+?)\s+-\s+#')
+
+# Card rows scanned over the whole order text (may span lines). Every card pattern
+# stays linear on a line of any length: the Bin rows commit to the first
+# "Bin <slot> <qty>" of a line (atomic group) instead of retrying from each later
+# one, and a collector number without a '#' before it is at most 200 characters
+# (rows merged across lines reach ~110), where unbounded it would be scanned to
+# the end of the text from every " - " the name could end at.
+PATTERNS.family('scan_rows')
+PATTERNS.register('1', r'^(?>[^\n]*?Bin\s+[\w\-]+\s+(\d+)\s+)(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$', re.MULTILINE)
+PATTERNS.register('2', r'^(\d+)\s+(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)\s+[A-Za-z\-\']+\s+-\s+(.+?)$', re.MULTILINE)
+PATTERNS.register('2b', r'^(\d+)\s+(.+?)\s+-\s([A-Za-z0-9/\-\s]{1,200}?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)\s+[A-Za-z\-\']+\s+-\s+(.+?)$', re.MULTILINE)
+PATTERNS.register('3', r'^(?>[^\n]*?Bin\s+[\w\-]+\s+(\d+)\s+)(.+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$', re.MULTILINE)
+PATTERNS.register('4', r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+([A-Za-z ]+)$', re.MULTILINE)
+PATTERNS.register('5', r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s*$', re.MULTILINE)
+PATTERNS.register('5b', r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+)$', re.MULTILINE)
+PATTERNS.register('6', r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+([A-Za-z]+)\s+[A-Za-z\-\']+\s+-\s+(.+)$', re.MULTILINE)
+
+# Card rows matched one line at a time (Patterns 8, 9 and the fallbacks); the
+# _no_hash rows bound their collector number like 2b
+PATTERNS.family('line_rows')
+PATTERNS.register('8', r'^(?:[A-Z]\s+)?(\d+)\s+(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
+PATTERNS.register('8_no_hash', r'^(?:[A-Z]\s+)?(\d+)\s+(.+?)\s+-\s([A-Za-z0-9/\-\s]{1,200}?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
+PATTERNS.register('9', r'^(?![A-Z](?:-[A-Z])?\s+\d+\s)(?!\d+\s)(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
+PATTERNS.register('9_no_hash', r'^(?![A-Z](?:-[A-Z])?\s+\d+\s)(?!\d+\s)(.+?)\s+-\s([A-Za-z0-9/\-\s]{1,200}?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
+PATTERNS.register('9_minimal', r'^(?![A-Z](?:-[A-Z])?\s+\d+\s)(?!\d+\s)(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)$')
+PATTERNS.register('header_like_any', r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)(?:\s*-\s*.*)?$')
+PATTERNS.register('header_like', r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)$')
+PATTERNS.register('header_fragment', r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+)-$')  # e.g., "... - #DOOD-"
+PATTERNS.register('code_continue', r'^([A-Za-z0-9/\s]+)\s*-\s*([A-Za-z ]+)(?:\s*-\s*(.+))?$')  # e.g., "EN085 - Common - Near Mint 1st Edition"
+
+# Set, quantity and condition fragments on neighbouring lines
+PATTERNS.family('fragments')
+PATTERNS.register('game_set_line', rf"^(?:\d+\s+)?({VOCABULARY.game_alternation()})\s+-\s+(.+)$")
+PATTERNS.register('game_line', rf"^({VOCABULARY.game_alternation()})\s+-\s+(.+)$")
+PATTERNS.register('slot_qty_set', r"^[A-Z](?:-[A-Z])?\s+(\d+)\s+[A-Za-z\-']+\s+-\s+(.+)$")
+PATTERNS.register('qty_set', r"^(\d+)\s+[A-Za-z\-']+\s+-\s+(.+)$")
+PATTERNS.register('inline_game_set', r"^(.*?)\s+[A-Za-z\-']+\s+-\s+(.+)$")
+PATTERNS.register('inline_word_game_set', r'^(.*?)\s+[A-Za-z]+\s+-\s+(.+)$')
+PATTERNS.register('word_game_set', r'^[A-Za-z]+\s+-\s+(.+)$')
+PATTERNS.register('game_prefix', r"^[A-Za-z\-']+\s+-\s+")
+PATTERNS.register('hyphen_cont', r'^[\-–]\s+(.+)$')
+PATTERNS.register('bin_game_set', r'Bin\s+[\w\-]+\s+(\d+)\s+[A-Za-z]+\s+-\s+(.+)')
+PATTERNS.register('bin_game_set_any', r'Bin\s+[\w\-]+\s+(\d+)\s+[A-Za-z\-\']+\s+-\s+(.+)')
+PATTERNS.register('bin_qty', r'Bin\s+[\w\-]+\s+(\d+)')
+PATTERNS.register('leading_qty', r'^\d+\s+')
+PATTERNS.register('leading_digits', r'^\d+')
+PATTERNS.register('non_alpha', r'[^a-z]')
+PATTERNS.register('digit', r'\d')
+
+# Product cells of the layout engine, which are already whole rows (conditions
+# are told apart by _vocabulary.py)
+PATTERNS.family('layout_rows')
+PATTERNS.register('layout_collector', r'^(?:#\S+(?:\s+//\s+\S+)?|\d+/\d+)$')
+
+# Parallel page extraction: worker processes (0 = one per CPU, 1 = serial) and the
+# page count below which fork overhead outweighs the gain
+EXTRACT_WORKERS = int(os.environ.get('EXTRACT_WORKERS', '1'))
+PARALLEL_MIN_PAGES = int(os.environ.get('PARALLEL_MIN_PAGES', '24'))
+
+
+def load_pdfplumber():
+    """Import pdfplumber on first use; returns the module, or None if it is not installed"""
+    global pdfplumber
+    if pdfplumber is None:
+        try:
+            import pdfplumber as module
+        except ImportError:
+            return None
+        pdfplumber = module
+    return pdfplumber
+
+
+def open_pdf(pdf_source):
+    """Open a PDF given as bytes or as a seekable binary file (e.g. a spooled upload)"""
+    load_pdfplumber()
+    if isinstance(pdf_source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(pdf_source))
+    pdf_source.seek(0)
+    return pdfplumber.open(pdf_source)
+
+
+def pdf_digest(pdf_source):
+    """SHA-256 hex digest of a PDF given as bytes or as a seekable binary file"""
+    if isinstance(pdf_source, (bytes, bytearray)):
+        return hashlib.sha256(pdf_source).hexdigest()
+    digest = hashlib.sha256()
+    pdf_source.seek(0)
+    for chunk in iter(lambda: pdf_source.read(UPLOAD_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Text extraction backends. Each turns a PDF into one line-ordered string per page;
+# the card and buyer patterns only ever see that text.
+EXTRACT_BACKEND = os.environ.get('EXTRACT_BACKEND', 'pdfplumber')
+
+# pdfminer layout tuning: build text lines only. boxes_flow=None skips the
+# hierarchical text-box grouping (quadratic in the number of boxes), which is
+# irrelevant because lines are re-sorted top-to-bottom anyway.
+PDFMINER_LAPARAMS = {
+    'char_margin': 2.0,
+    'line_margin': 0.5,
+    'word_margin': 0.1,
+    'boxes_flow': None,
+    'detect_vertical': False,
+    'all_texts': False
+}
+# Lines whose tops are within this many points share a row (pdfplumber's default y_tolerance)
+PDFMINER_ROW_TOLERANCE = 3
+
+
+class PdfplumberBackend:
+    """pdfplumber's Page.extract_text(): full char objects plus its own line clustering"""
+    name = 'pdfplumber'
+    filters_text = False   # True for backends that deliberately drop lines
+
+    def available(self):
+        return load_pdfplumber() is not None
+
+    def open(self, pdf_source):
+        return open_pdf(pdf_source)
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def iter_texts(self, document, start=0, stop=None):
+        for page in document.pages[start:stop]:
+            text = page.extract_text() or ''
+            self.release(page)
+            yield text
+
+    @staticmethod
+    def release(page):
+        """Free a page's char objects and layout once its text has been taken.
+
+        Page.close() flushes the page's cached properties, but pdfplumber 0.11
+        memoizes get_textmap with an lru_cache on the method, which keeps the
+        chars of every page alive (several MB per page) until it is cleared.
+        """
+        page.close()
+        cache_clear = getattr(page.get_textmap, 'cache_clear', None)
+        if cache_clear:
+            cache_clear()
+
+
+class PdfminerBackend:
+    """pdfminer.six layout analysis driven directly, without pdfplumber's char objects.
+
+    Text lines from LTTextLine are grouped into rows by their top edge and
+    joined left to right, matching pdfplumber's line-ordered output.
+    """
+    name = 'pdfminer'
+    filters_text = False
+
+    def available(self):
+        try:
+            import pdfminer.high_level  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def open(self, pdf_source):
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfpage import PDFPage
         
-        self.wfile.write(json.dumps(response).encode('utf-8'))
-    
-    def parse_pdf(self, pdf_bytes):
-        """Parse TCGplayer Direct PDF and extract orders"""
-        orders = []
+        if isinstance(pdf_source, (bytes, bytearray)):
+            stream = io.BytesIO(pdf_source)
+        else:
+            stream = pdf_source
+            stream.seek(0)
+        return PdfminerDocument(list(PDFPage.create_pages(PDFDocument(PDFParser(stream)))))
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def iter_texts(self, document, start=0, stop=None):
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams, LTTextBox, LTTextLine
         
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            full_text = ""
+        resources = PDFResourceManager(caching=True)
+        device = PDFPageAggregator(resources, laparams=LAParams(**PDFMINER_LAPARAMS))
+        interpreter = PDFPageInterpreter(resources, device)
+        for page in document.pages[start:stop]:
+            interpreter.process_page(page)
+            layout = device.get_result()
             
-            # Extract all text with positions
-            for page_num, page in enumerate(pdf.pages):
-                page_text = page.extract_text()
-                if page_text:
-                    full_text += page_text + "\n\n"
+            lines = []
+            for obj in layout:
+                if isinstance(obj, LTTextBox):
+                    lines.extend(line for line in obj if isinstance(line, LTTextLine))
+                elif isinstance(obj, LTTextLine):
+                    lines.append(obj)
             
-            # Find all order sections
-            order_pattern = r'Direct by TCGplayer #\s*(\d{6}-[A-F0-9]{4})'
-            order_matches = list(re.finditer(order_pattern, full_text))
-            
-            for i, match in enumerate(order_matches):
-                order_num = match.group(1)
-                start_pos = match.start()
-                
-                # Determine end position (start of next order or end of text)
-                end_pos = order_matches[i + 1].start() if i + 1 < len(order_matches) else len(full_text)
-                
-                # Extract this order's section
-                order_section = full_text[start_pos:end_pos]
-                
-                # Extract buyer name (billing person)
-                buyer_name = self.extract_buyer_name(order_section, order_num)
-                
-                # Extract cards from this order
-                cards, debug_info = self.extract_cards(order_section)
-                
-                orders.append({
-                    'orderNumber': order_num,
-                    'buyerName': buyer_name,
-                    'cards': cards,
-                    'startPos': start_pos,
-                    'endPos': end_pos,
-                    'debug': debug_info
-                })
-        
-        return orders
-    
-    def extract_buyer_name(self, order_text, order_num):
-        """Extract billing person name from order section"""
-        exclude_names = [
-            'Near Mint', 'Lightly Played', 'Moderately Played', 'Heavily Played', 'Damaged',
-            'Billing Address', 'Shipping Address', 'Order Date', 'Direct by TCGplayer',
-            'Included Orders', 'Seller Name', 'Order Number'
-        ]
+            # (top, x0, text) with whitespace collapsed, as pdfplumber joins words with one space
+            items = sorted((layout.y1 - line.y1, line.x0, ' '.join(line.get_text().split())) for line in lines)
+            rows = []
+            row_top = None
+            for top, x0, text in items:
+                if not text:
+                    continue
+                if row_top is not None and top - row_top <= PDFMINER_ROW_TOLERANCE:
+                    rows[-1].append((x0, text))
+                else:
+                    rows.append([(x0, text)])
+                row_top = top
+            yield '\n'.join(' '.join(text for _, text in sorted(row)) for row in rows)
 
-        # First try to extract from the explicit "Shipping Address" section
-        shipping_section = re.search(r'Shipping Address\s*\n(.*?)Shipping Method:', order_text, re.DOTALL)
-        if shipping_section:
-            shipping_text = shipping_section.group(1)
-
-            # Pattern: Look for person name (no newlines between parts!) followed by street address
-            # Use [ \t] instead of \s to exclude newlines within the name
-            # Allow both capitalized and lowercase names, including middle initials and hyphens
-            # Support various address formats:
-            #   - Street numbers: "123 Main St"
-            #   - Alphanumeric: "N58W23783 Hastings Ct" (Wisconsin)
-            #   - Hawaiian: "91-111 MAKAALOA PL" (hyphenated house numbers)
-            #   - PO BOX: "PO BOX 123", "p.o. box 123", "P.O. BOX 123" (case-insensitive, optional periods)
-            #   - CMR (military), HC (Highway Contract), RR (Rural Route)
-            # Support name formats: "First Last", "Last, First", "R. Jeremy", "philip alston" (lowercase)
-            # Address must have multiple tokens to avoid matching single order numbers or collector numbers
-            # Note: Requires at least 2 name parts to avoid false positives with single words
-            name_pattern = r'([A-Za-z][A-Za-z\-]*\.?(?:[ \t,]+[A-Za-z]\'?[A-Za-z\-]*\.?)+)\s*\n\s*(?:(?:[A-Za-z0-9\-]+[ \t]+[A-Za-z0-9 \t]+)|(?:[Pp]\.?[Oo]\.?[ \t]+[Bb][Oo][Xx][ \t]+[\w\-]+)|(?:CMR[ \t]+\d+[ \t]+Box[ \t]+\d+)|(?:HC[ \t]+\d+[ \t]+BOX[ \t]+[\w\-]+)|(?:RR[ \t]+\d+[ \t]+Box[ \t]+[\w\-]+))'
-
-            matches = list(re.finditer(name_pattern, shipping_text))
-
-            # Get the first match in shipping address (should be the recipient name)
-            for match in matches:
-                candidate_name = match.group(1).strip()
 
-                # Skip if it contains excluded words
-                if any(excluded in candidate_name for excluded in exclude_names):
-                    continue
+class PdfminerDocument:
+    """Parsed page list for PdfminerBackend; pdfminer has nothing to close"""
 
-                return candidate_name
+    def __init__(self, pages):
+        self.pages = pages
 
-        return None
-    
-    def extract_cards(self, order_text):
-        """Extract card details from order section - robust multi-line handling"""
-        cards = []
-        seen_cards = set()  # Deduplicate by name+collector#
+    def __enter__(self):
+        return self
 
-        # Preprocess: drop slot headers and table headers that can break patterns
-        cleaned_lines = []
-        for line in order_text.split('\n'):
-            l = line.strip()
-            if not l:
+    def __exit__(self, *exc_info):
+        self.pages = []
+
+
+# Row anchors that delimit the address and item-table regions, matched against a
+# line's text with spaces removed so word spacing differences don't matter
+REGION_ORDER_HEADER = re.compile(r'DirectbyTCGplayer#?(\d{6}-[A-F0-9]{4})?')
+REGION_ADDRESS_START = 'ShippingAddress'
+REGION_ADDRESS_END = 'ShippingMethod:'
+REGION_TABLE_HEADER = re.compile(r'^(SLOT)?QTYPRODUCTNAMESETNAME$', re.IGNORECASE)
+REGION_SLOT_HEADER = re.compile(r'^Slot[A-Z]-', re.IGNORECASE)
+
+
+class RegionBackend(PdfplumberBackend):
+    """pdfplumber extraction limited to the page regions the parsers read.
+
+    Each page is laid out into text lines once (extract_text_lines gives the
+    same lines as extract_text, with their bounding boxes) and the address
+    and item-table regions are located from anchor rows: order header rows,
+    the shipping-address block through "Shipping Method:" and the item table
+    after it are kept. Slot and table header rows and everything between an
+    order header and its shipping address (order details, billing block) are
+    dropped before the regex stage. The item table runs until the next order
+    header, so region state carries over page breaks.
+    """
+    name = 'regions'
+    filters_text = True
+
+    def iter_texts(self, document, start=0, stop=None):
+        # A worker starting mid-document may be inside an item table
+        state = 'table' if start else 'skip'
+        for page in document.pages[start:stop]:
+            lines, state = self.region_lines(page.extract_text_lines(return_chars=False), state)
+            self.release(page)
+            yield '\n'.join(line['text'] for line in lines)
+
+    @staticmethod
+    def region_lines(lines, state):
+        """Return (lines inside the address/table regions, state after the page).
+
+        state is 'skip', 'header', 'address' or 'table'.
+        """
+        kept = []
+        for line in lines:
+            text = line['text'].replace(' ', '')
+            header = REGION_ORDER_HEADER.search(text)
+            if header:
+                # Keep the next row too when the order number wrapped onto it
+                state = 'skip' if header.group(1) else 'header'
+            elif state == 'header':
+                state = 'skip'
+            elif REGION_ADDRESS_START in text:
+                state = 'address'
+            elif REGION_TABLE_HEADER.match(text) or REGION_SLOT_HEADER.match(text):
+                state = 'table'
                 continue
-            # Skip slot header like "Slot C - Near Mint" or "Slot X - Lightly Played"
-            if re.match(r'^Slot\s+[A-Z]\s+-\s+', l, flags=re.IGNORECASE):
+            elif state == 'address':
+                if REGION_ADDRESS_END in text:
+                    state = 'table'   # items follow, with or without a table header
+            elif state != 'table':
                 continue
-            # Skip table header rows
-            if re.match(r'^(SLOT\s+)?QTY\s+PRODUCT\s+NAME\s+SET\s+NAME$', l, flags=re.IGNORECASE):
+            kept.append(line)
+        return kept, state
+
+
+# Layout engine: words whose tops are within LAYOUT_ROW_TOLERANCE points share a row,
+# and a column starts LAYOUT_COLUMN_SLACK points left of its header label
+LAYOUT_ROW_TOLERANCE = 3
+LAYOUT_COLUMN_SLACK = 3
+LAYOUT_COLUMNS = ('QTY', 'PRODUCT', 'SET')
+
+
+class LayoutText(str):
+    """A page's text plus the item-table rows LayoutBackend read from its words.
+
+    rows is a list of (offset into the text, CardRecord), with None in place
+    of the record for a row whose cells don't form a card.
+    """
+
+    def __new__(cls, text, rows=()):
+        page = super().__new__(cls, text)
+        page.rows = rows
+        return page
+
+
+class LayoutRow:
+    """The cells of one item-table row while LayoutBackend collects its lines"""
+    __slots__ = ('top', 'qty', 'product', 'set_name')
+
+    def __init__(self, top):
+        self.top = top
+        self.qty = []
+        self.product = []
+        self.set_name = []
+
+    @staticmethod
+    def join(parts):
+        """Cell lines as one string; a line ending in a bare hyphen ("#DOOD-") was broken inside a word"""
+        text = ''
+        for part in parts:
+            if text and not (text.endswith('-') and not text.endswith(' -')):
+                text += ' '
+            text += part
+        return text
+
+    def complete(self):
+        """Whether the product cell has reached its condition, the last field of a row"""
+        return bool(self.product) and VOCABULARY.is_condition(self.join(self.product).rsplit(' - ', 1)[-1])
+
+    def card(self):
+        """The CardRecord these cells hold, or None"""
+        if len(self.qty) != 1 or not self.qty[0].isdigit() or not self.complete():
+            return None
+        collector_pattern = PATTERNS['layout_collector']
+        segments = self.join(self.product).split(' - ')
+        condition = segments.pop()
+        rarity = collector = ''
+        if len(segments) > 1 and not collector_pattern.match(segments[-1]):
+            rarity = segments.pop()
+        if len(segments) > 1 and collector_pattern.match(segments[-1]):
+            collector = segments.pop().lstrip('#')
+        name = ' - '.join(segments)
+        game, separator, set_name = self.join(self.set_name).partition(' - ')
+        return CardRecord(
+            name=name,
+            quantity=int(self.qty[0]),
+            condition=condition,
+            set_name=set_name if separator else game,
+            collector_number=collector,
+            rarity=rarity,
+            seen_key=(name, collector, condition)
+        )
+
+
+class LayoutBackend(PdfplumberBackend):
+    """pdfplumber text plus the item table read from word positions, for the 'layout' engine.
+
+    The page text is extract_text()'s, so orders and buyer names come out as
+    with the pdfplumber backend. The table comes from extract_words(): a table
+    header row fixes where the QTY, PRODUCT NAME and SET NAME columns start,
+    each later word belongs to the column its x0 falls in, and a product line
+    starts a new row once the previous row's product cell ends in its
+    condition. Cells wrapped over several lines, and a quantity centred between
+    them, come out as one card without any guessing about which line belongs
+    to which field. Columns carry over page breaks until the next order
+    header; a worker starting mid-document has none until the next table header.
+    """
+    name = 'layout'
+    filters_text = False
+
+    def iter_texts(self, document, start=0, stop=None):
+        columns = None
+        for page in document.pages[start:stop]:
+            lines = page.extract_text_lines(return_chars=False)
+            rows, columns = self.table_rows(page.extract_words(), lines, columns)
+            self.release(page)
+            yield LayoutText('\n'.join(line['text'] for line in lines), rows)
+
+    @classmethod
+    def table_rows(cls, words, lines, columns):
+        """Return ([(offset, CardRecord or None)], columns after the page).
+
+        columns is None outside an item table, else the x positions where the
+        QTY, PRODUCT NAME and SET NAME columns begin. offset is that of the
+        text line the row starts on.
+        """
+        tops = [line['top'] for line in lines]
+        offsets = []
+        position = 0
+        for line in lines:
+            offsets.append(position)
+            position += len(line['text']) + 1
+
+        rows = []
+        row = None
+
+        def finish():
+            if row is not None:
+                index = min(bisect_left(tops, row.top - LAYOUT_ROW_TOLERANCE), len(offsets) - 1)
+                rows.append((offsets[index], row.card()))
+
+        for top, row_words in cls.word_rows(words):
+            text = ''.join(word['text'] for word in row_words)
+            if REGION_ORDER_HEADER.search(text):
+                finish()
+                row = columns = None  # the next order's table brings its own header
                 continue
-            # Normalize leading slot code prefixes like 'K 1 ' or 'K-T 1 ' -> '1 '
-            m_slot = re.match(r'^[A-Z](?:-[A-Z])?\s+(\d+)\s+(.*)$', l)
-            if m_slot:
-                l = f"{m_slot.group(1)} {m_slot.group(2)}".strip()
-            cleaned_lines.append(l)
-        order_text = '\n'.join(cleaned_lines)
+            if REGION_TABLE_HEADER.match(text):
+                finish()
+                row = None
+                columns = cls.header_columns(row_words)
+                continue
+            if columns is None or REGION_SLOT_HEADER.match(text):
+                continue
+
+            cells = ([], [], [], [])  # slot, qty, product, set name
+            for word in row_words:
+                cells[bisect_right(columns, word['x0'])].append(word['text'])
+            _, qty, product, set_name = cells
+            if product:
+                product = ' '.join(product)
+                if row is None or (row.complete() and not VOCABULARY.is_condition_suffix(product)):
+                    finish()
+                    row = LayoutRow(top)
+                row.product.append(product)
+            elif row is None and (qty or set_name):
+                row = LayoutRow(top)  # stray cells before any product line; recorded as an unreadable row
+            if row is not None:
+                row.qty.extend(qty)
+                if set_name:
+                    row.set_name.append(' '.join(set_name))
+        finish()
+        return rows, columns
+
+    @staticmethod
+    def word_rows(words):
+        """[(top, words left to right)] for each run of words whose tops are within LAYOUT_ROW_TOLERANCE"""
+        rows = []
+        for word in sorted(words, key=lambda word: (word['top'], word['x0'])):
+            if rows and word['top'] - rows[-1][0] <= LAYOUT_ROW_TOLERANCE:
+                rows[-1][1].append(word)
+            else:
+                rows.append((word['top'], [word]))
+        for _, row_words in rows:
+            row_words.sort(key=lambda word: word['x0'])
+        return rows
+
+    @staticmethod
+    def header_columns(words):
+        """Column edges from a table header row: just left of each column's label, but not into the word before it"""
+        edges = []
+        previous = None
+        for word in words:
+            label = word['text'].upper()
+            if len(edges) < len(LAYOUT_COLUMNS) and label.startswith(LAYOUT_COLUMNS[len(edges)]):
+                edge = word['x0'] - LAYOUT_COLUMN_SLACK
+                edges.append(max(edge, previous['x1']) if previous else edge)
+            previous = word
+        return edges if len(edges) == len(LAYOUT_COLUMNS) else None
+
+
+EXTRACT_BACKENDS = {backend.name: backend for backend in (PdfplumberBackend(), PdfminerBackend(), RegionBackend(),
+                                                          LayoutBackend())}
+
+
+def default_backend(engine=None):
+    """The backend used when none is named: the layout engine needs LayoutBackend's word positions"""
+    return 'layout' if (engine or CARD_ENGINE) == 'layout' else EXTRACT_BACKEND
+
+# Order index: a first pass that only decodes the text each page draws (no layout
+# analysis, no char objects), roughly a tenth of the cost of extraction. The raw
+# text carries no layout spaces, so headers are matched with whitespace removed.
+INDEX_ORDER_HEADER = re.compile(r'DirectbyTCGplayer#(\d{6}-[A-F0-9]{4})')
+
+
+def scan_order_index(pdf_source):
+    """[(order number, first page, last page)] in document order, pages 0-based and inclusive.
+
+    An order runs up to the page holding the next order header, and includes
+    that page unless the next header is the first text drawn on it.
+    """
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+    from pdfminer.pdfdevice import PDFTextDevice
+    from pdfminer.pdffont import PDFUnicodeNotDefined
+    
+    class TextOnlyDevice(PDFTextDevice):
+        """Collects the unicode of every drawn glyph; positions are never computed"""
         
-        # Pattern 0: Slot O/X multi-line format (card name first, then qty+game+set on next line)
-        # Format: "CardName - #Collector - Rarity - Condition [partial]"
-        #   Next: "Quantity Game - Set Name"
-        #   Optional: "Edition" or other condition continuation
-        # Example: "Tri-Brigade Hammer - #DOOD-EN068 - Super Rare - Near Mint 1st"
-        #          "1 YuGiOh - Doom of Dimensions"
-        #          "Edition"
-        slot_card_pattern = r'^(.+?)\s+-\s+#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$'
-        qty_game_set_pattern = r'^(\d+)\s+([A-Za-z\-\']+)\s+-\s+(.+)$'
+        def __init__(self, resources):
+            super().__init__(resources)
+            self.parts = []
         
-        # Pattern 0a: Card with collector but NO complete condition on first line
-        # Format: "CardName - #Collector - Rarity -" OR "CardName - #Collector - Rarity - PartialCondition"
-        #   Next: "Quantity Game - Set Name"
-        #   Third: "Condition" or "Condition continuation"
-        slot_card_no_cond = r'^(.+?)\s+-\s+#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s*(.*)$'
+        def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+            try:
+                self.parts.append(font.to_unichr(cid))
+            except PDFUnicodeNotDefined:
+                pass
+            return font.char_width(cid) * fontsize * scaling
+    
+    if isinstance(pdf_source, (bytes, bytearray)):
+        stream = io.BytesIO(pdf_source)
+    else:
+        stream = pdf_source
+        stream.seek(0)
+    resources = PDFResourceManager(caching=True)
+    device = TextOnlyDevice(resources)
+    interpreter = PDFPageInterpreter(resources, device)
+    
+    headers = []  # (page, order number, first text on the page)
+    page_count = 0
+    for page_number, page in enumerate(PDFPage.create_pages(PDFDocument(PDFParser(stream)))):
+        device.parts = []
+        interpreter.process_page(page)
+        text = ''.join(''.join(device.parts).split())
+        headers.extend((page_number, match.group(1), match.start() == 0) for match in INDEX_ORDER_HEADER.finditer(text))
+        page_count = page_number + 1
+    
+    index = []
+    for (page, number, _), (next_page, _, next_at_top) in zip(headers, headers[1:] + [(page_count, None, True)]):
+        index.append((number, page, next_page - 1 if next_at_top and next_page > page else next_page))
+    return index
+
+
+def extract_page_range(pdf_bytes, start, stop, backend=None):
+    """Extract text for pages [start, stop) from an independently opened PDF"""
+    backend = EXTRACT_BACKENDS[backend or EXTRACT_BACKEND]
+    with backend.open(pdf_bytes) as document:
+        return list(backend.iter_texts(document, start, stop))
+
+
+def _extract_page_range_worker(conn, pdf_bytes, start, stop, backend):
+    """Process entry point: send ('ok', texts) or ('error', message) back to the parent"""
+    try:
+        conn.send(('ok', extract_page_range(pdf_bytes, start, stop, backend)))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+def iter_pages_parallel(pdf_bytes, page_count, workers, backend=None):
+    """Fan contiguous page ranges out to worker processes and yield page texts in order.
+
+    Uses one Pipe per worker rather than a multiprocessing.Pool, because Pool
+    needs POSIX semaphores (/dev/shm) which the Vercel/Lambda runtime lacks.
+    """
+    import multiprocessing  # only needed once a document is big enough to fan out
+    
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    workers = max(1, min(workers, page_count))
+    chunk = -(-page_count // workers)
+    
+    jobs = []
+    try:
+        for start in range(0, page_count, chunk):
+            recv_conn, send_conn = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_extract_page_range_worker,
+                               args=(send_conn, pdf_bytes, start, min(start + chunk, page_count), backend),
+                               daemon=True)
+            proc.start()
+            send_conn.close()
+            jobs.append((proc, recv_conn))
         
-        # Pattern 0b: Card with NO collector on first line (Theoden case)
-        # Format: "CardName - Game - Set Name (partial)"
-        #   Next: "Quantity" (just number)
-        #   Third: "#Collector - Rarity - Condition Set Name (continued)"
-        slot_card_no_collector = r'^(.+?)\s+-\s+([A-Za-z\-\']+)\s+-\s+(.+)$'
-        collector_rarity_cond = r'^#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+)$'
+        for proc, recv_conn in jobs:
+            status, payload = recv_conn.recv()
+            if status != 'ok':
+                raise RuntimeError(f"Page extraction failed: {payload}")
+            yield from payload
+    finally:
+        for proc, recv_conn in jobs:
+            recv_conn.close()
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+
+
+# Raw (application/pdf) and multipart uploads are streamed from the socket into a
+# SpooledTemporaryFile: kept in memory up to UPLOAD_SPOOL_BYTES, then on disk.
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', str(8 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+MULTIPART_MAX_HEADER_BYTES = 16 * 1024
+MULTIPART_MAX_FIELD_BYTES = 64 * 1024
+MULTIPART_BOUNDARY = re.compile(r'boundary=(?:"([^"]+)"|([^;\s]+))', re.IGNORECASE)
+MULTIPART_PART_NAME = re.compile(r'\bname="([^"]*)"', re.IGNORECASE)
+
+
+def iter_body_chunks(rfile, length, chunk_size=UPLOAD_CHUNK_BYTES):
+    """Yield exactly `length` request body bytes from rfile in bounded chunks"""
+    remaining = length
+    while remaining > 0:
+        chunk = rfile.read(min(chunk_size, remaining))
+        if not chunk:
+            raise ValueError("Request body ended before Content-Length bytes were received")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def spool_upload(chunks):
+    """Copy a raw PDF body into a SpooledTemporaryFile, hashing it on the way.
+
+    Returns (spool, sha256_hex) with spool rewound to the start.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        spool.write(chunk)
+        digest.update(chunk)
+    spool.seek(0)
+    return spool, digest.hexdigest()
+
+
+def spool_multipart(chunks, boundary):
+    """Stream a multipart/form-data body, spooling the PDF part to a temp file.
+
+    The PDF is the part named "pdf", or failing that the first file part:
+    a file part is spooled until a "pdf" part turns up, which replaces it.
+    Other non-file parts are returned as text fields. Returns
+    (spool, sha256_hex, fields); spool is None when no PDF part was sent.
+    """
+    chunks = iter(chunks)
+    delimiter = b'\r\n--' + boundary
+    keep = len(delimiter) - 1   # bytes that may hold the start of a split delimiter
+    buffer = b'\r\n'            # lets a delimiter at the very start match like the others
+    spool = digest = None
+    spool_named = False  # whether spool holds the part named "pdf" rather than a fallback file part
+    fields = {}
+    
+    def fill():
+        nonlocal buffer
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError("Malformed multipart body: unexpected end of data")
+        buffer += chunk
+    
+    # Skip the preamble
+    while delimiter not in buffer:
+        buffer = buffer[-keep:]
+        fill()
+    buffer = buffer[buffer.index(delimiter) + len(delimiter):]
+    
+    while True:
+        # A delimiter followed by "--" closes the body, otherwise part headers follow
+        while len(buffer) < 2:
+            fill()
+        if buffer.startswith(b'--'):
+            break
+        while b'\r\n\r\n' not in buffer:
+            if len(buffer) > MULTIPART_MAX_HEADER_BYTES:
+                raise ValueError("Malformed multipart body: part headers too large")
+            fill()
+        head, buffer = buffer.split(b'\r\n\r\n', 1)
         
-        # Pattern 0c: Card ending with "-" (collector on third line)
-        # Format: "CardName (with or without collector) -"
-        #   Next: "Quantity Game - Set Name"
-        #   Third: "#Collector - Rarity - Condition"
-        # Example: "Squirtle - 007/165 (Reverse Cosmos Holo) (Costco Exclusive) -"
-        slot_card_collector_no_hash = r'^(.+)\s+-\s*$'
+        disposition = ''
+        for line in head.decode('latin-1').split('\r\n'):
+            key, _, value = line.partition(':')
+            if key.strip().lower() == 'content-disposition':
+                disposition = value
+        name_match = MULTIPART_PART_NAME.search(disposition)
+        name = name_match.group(1) if name_match else ''
+        is_file = 'filename=' in disposition.lower()
+        is_pdf = (name == 'pdf' and not spool_named) or (spool is None and is_file)
+        if is_pdf:
+            if spool is not None:
+                spool.close()
+            spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+            digest = hashlib.sha256()
+            spool_named = name == 'pdf'
+        value = bytearray()
         
-        i = 0
-        debug_info = {
-            'pattern_0b_attempts': 0, 
-            'pattern_0b_matches': 0, 
-            'pattern_0b_digit_fails': 0,
-            'pattern_0b_collector_fails': 0,
-            'pattern_0c_attempts': 0, 
-            'pattern_0c_matches': 0,
-            'theoden_found': False,
-            'squirtle_found': False
-        }
+        # Part body runs up to the next delimiter; stream it without buffering it whole
+        while True:
+            end = buffer.find(delimiter)
+            cut = end if end >= 0 else max(0, len(buffer) - keep)
+            data, buffer = buffer[:cut], buffer[cut:]
+            if is_pdf:
+                spool.write(data)
+                digest.update(data)
+            elif not is_file:
+                value += data
+                if len(value) > MULTIPART_MAX_FIELD_BYTES:
+                    raise ValueError(f"Form field '{name}' is too large")
+            if end >= 0:
+                buffer = buffer[len(delimiter):]
+                break
+            fill()
         
-        while i < len(cleaned_lines):
-            line = cleaned_lines[i].strip()
-            
-            # Try Pattern 0b FIRST (most specific - Theoden case)
-            # Must check before Pattern 0 to prevent false matches
-            # Only match if line does NOT contain '#' (no collector on first line)
-            if '#' not in line:
-                debug_info['pattern_0b_attempts'] += 1
-                match_0b = re.match(slot_card_no_collector, line)
-                if match_0b and i + 2 < len(cleaned_lines):
-                    next_line = cleaned_lines[i + 1].strip()
-                    third_line = cleaned_lines[i + 2].strip()
-                    
-                    # Check if next line is just a number and third line has #collector
-                    if next_line.isdigit():
-                        match_collector = re.match(collector_rarity_cond, third_line)
-                        if match_collector:
-                            debug_info['pattern_0b_matches'] += 1
+        if not is_pdf and not is_file:
+            fields[name] = value.decode('utf-8')
+    
+    if spool is None:
+        return None, None, fields
+    spool.seek(0)
+    return spool, digest.hexdigest(), fields
+
+
+# Response encoding. Compact responses drop these per-order fields and use tight
+# separators; gzip is only applied above GZIP_MIN_BYTES, where it pays off.
+COMPACT_DROP_FIELDS = ('startPos', 'endPos', 'debug')
+COMPACT_SEPARATORS = (',', ':')
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+
+
+def compact_order(order):
+    """Order without positional and debug fields"""
+    return {key: value for key, value in order.items() if key not in COMPACT_DROP_FIELDS}
+
+
+# Parse-result cache. PARSER_VERSION is part of the cache key: bump it whenever
+# a change to the parser alters its output for the same PDF. The vocabulary's
+# digest is in the key too, so a new VOCABULARY_FILE needs no bump.
+PARSER_VERSION = '1.4.0'
+PARSE_CACHE_ENABLED = os.environ.get('PARSE_CACHE', '1') != '0'
+PARSE_CACHE_DIR = os.environ.get('PARSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pdf-parse-cache'))
+PARSE_CACHE_MEMORY_BYTES = int(os.environ.get('PARSE_CACHE_MEMORY_BYTES', str(32 * 1024 * 1024)))
+PARSE_CACHE_DISK_BYTES = int(os.environ.get('PARSE_CACHE_DISK_BYTES', str(256 * 1024 * 1024)))
+
+
+class ParseCache:
+    """Two-tier (memory, then disk) LRU cache of parsed orders keyed by PDF content.
+
+    Entries are stored as serialized JSON so both tiers can be bounded by bytes
+    and callers always get a fresh copy of the orders.
+    """
+
+    def __init__(self, directory, memory_bytes, disk_bytes):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> serialized orders, least recently used first
+        self._memory_size = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(digest, engine, backend=None):
+        """SHA-256 of the PDF bytes plus everything else that changes the result"""
+        return f"{digest}-{PARSER_VERSION}-{VOCABULARY.DIGEST}-{engine}-{backend or default_backend(engine)}"
+
+    def get(self, key):
+        """Return (orders, 'memory' | 'disk'), or (None, None) on a miss"""
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return json.loads(data), 'memory'
+        
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # disk LRU order is by mtime
+        except OSError:
+            self.misses += 1
+            return None, None
+        self.disk_hits += 1
+        self._remember(key, data)
+        return json.loads(data), 'disk'
+
+    def put(self, key, orders):
+        data = json.dumps(orders, separators=(',', ':')).encode('utf-8')
+        self._remember(key, data)
+        self._write_disk(key, data)
+
+    def stats(self):
+        return {
+            'memoryHits': self.memory_hits,
+            'diskHits': self.disk_hits,
+            'misses': self.misses,
+            'memoryEntries': len(self._memory),
+            'memoryBytes': self._memory_size
+        }
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _write_disk(self, key, data):
+        if len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError:
+            pass  # the disk tier is best-effort (read-only or full /tmp)
+
+    def _evict_disk(self):
+        """Delete least recently used entries until the directory fits disk_bytes"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+PARSE_CACHE = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MEMORY_BYTES, PARSE_CACHE_DISK_BYTES) if PARSE_CACHE_ENABLED else None
+
+
+# Per-stage timing: off unless the request asks for it (or PARSE_TIMINGS=1), so
+# the parser only pays a None check per page and per order when disabled
+PARSE_TIMINGS = os.environ.get('PARSE_TIMINGS', '0') == '1'
+TIMING_STAGES = ('cache', 'index', 'extract', 'split', 'buyer', 'cards')
+TIMING_SLOWEST_ORDERS = 5
+
+
+class StageTimer:
+    """Monotonic-clock totals per parse stage for one request, plus per-order times"""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.stages = dict.fromkeys(TIMING_STAGES, 0.0)
+        self.orders = []  # (seconds, orderNumber, buyer seconds, cards seconds)
+
+    def add(self, stage, seconds):
+        self.stages[stage] += seconds
+
+    def add_order(self, order_number, buyer_seconds, cards_seconds):
+        self.orders.append((buyer_seconds + cards_seconds, order_number, buyer_seconds, cards_seconds))
+
+    def timed(self, stage, iterable):
+        """Yield from iterable, charging the time spent producing each item to stage"""
+        items = iter(iterable)
+        while True:
+            start = perf_counter()
+            item = next(items, None)
+            self.stages[stage] += perf_counter() - start
+            if item is None:
+                return
+            yield item
+
+    def report(self, patterns_before=None):
+        """The response's 'timings' object; patterns_before scopes the pattern family totals"""
+        slowest = heapq.nlargest(TIMING_SLOWEST_ORDERS, self.orders)
+        return {
+            'totalMs': round((perf_counter() - self.started) * 1000, 3),
+            'stages': {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            'patternFamilies': PATTERNS.family_stats(since=patterns_before),
+            'slowestOrders': [
+                {'orderNumber': number, 'ms': round(seconds * 1000, 3),
+                 'buyerMs': round(buyer * 1000, 3), 'cardsMs': round(cards * 1000, 3)}
+                for seconds, number, buyer, cards in slowest
+            ]
+        }
+
+    def server_timing(self, **extra):
+        """Server-Timing header value: every stage plus any extra {name: seconds}, in ms"""
+        entries = dict(self.stages, **extra)
+        entries['total'] = perf_counter() - self.started
+        return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in entries.items())
+
+
+# Process-wide metrics, served by GET /api/parse?metrics. Pattern and cache
+# counters are already kept by PATTERNS and PARSE_CACHE and are read at scrape time.
+PDFS_PARSED = METRICS.counter('pdf_parser_pdfs_total', 'PDFs run through the parser (cache hits excluded)')
+PAGES_PARSED = METRICS.counter('pdf_parser_pages_total', 'Pages whose text was extracted')
+ORDERS_PARSED = METRICS.counter('pdf_parser_orders_total', 'Orders parsed')
+CARDS_PARSED = METRICS.counter('pdf_parser_cards_total', 'Cards extracted')
+PARSE_REQUESTS = METRICS.counter('pdf_parser_requests_total', 'Parse requests by response status', ('status',))
+PARSE_ERRORS = METRICS.counter('pdf_parser_parse_errors_total', 'Parse requests that failed inside the parser')
+PARSE_SECONDS = METRICS.histogram('pdf_parser_request_duration_seconds',
+                                  'Successful parse request latency by cache outcome ("batch" for batch requests)', ('cache',))
+SHADOW_ORDERS = METRICS.counter('pdf_parser_shadow_orders_total',
+                                'Orders also parsed by SHADOW_ENGINE, by outcome (match, differ, error)', ('outcome',))
+
+
+@METRICS.collector
+def collect_parser_metrics():
+    families = PATTERNS.family_totals()
+    yield ('pdf_parser_pattern_attempts_total', 'counter', 'Pattern attempts by pattern family',
+           [({'family': family}, totals[0]) for family, totals in families.items()])
+    yield ('pdf_parser_pattern_hits_total', 'counter', 'Pattern matches (card rows and fragments) by pattern family',
+           [({'family': family}, totals[1]) for family, totals in families.items()])
+    yield ('pdf_parser_pattern_seconds_total', 'counter', 'Time spent matching by pattern family',
+           [({'family': family}, totals[2]) for family, totals in families.items()])
+    if PARSE_CACHE:
+        cache = PARSE_CACHE.stats()
+        yield ('pdf_parser_cache_hits_total', 'counter', 'Parse cache hits by tier',
+               [({'tier': 'memory'}, cache['memoryHits']), ({'tier': 'disk'}, cache['diskHits'])])
+        yield ('pdf_parser_cache_misses_total', 'counter', 'Parse cache misses', [({}, cache['misses'])])
+        yield ('pdf_parser_cache_memory_bytes', 'gauge', 'Bytes held by the in-memory cache tier',
+               [({}, cache['memoryBytes'])])
+
+
+# Shadow mode: every parsed order (a SHADOW_SAMPLE fraction of them) is also run
+# through the candidate SHADOW_ENGINE. The served engine's cards are returned as
+# always; one JSON line per order goes to SHADOW_LOG with both engines' card
+# extraction times and the cards the candidate missed, added or changed. The
+# candidate's pattern matching is left out of the pattern counters and timings.
+SHADOW_ENGINE = os.environ.get('SHADOW_ENGINE', '')
+SHADOW_SAMPLE = float(os.environ.get('SHADOW_SAMPLE', '1'))
+SHADOW_LOG = os.environ.get('SHADOW_LOG', os.path.join(tempfile.gettempdir(), 'pdf-parse-shadow.jsonl'))
+
+
+def shadow_engine_for(engine):
+    """The engine to shadow an order parsed with engine, or None"""
+    if SHADOW_ENGINE not in CARD_ENGINES or SHADOW_ENGINE == (engine or CARD_ENGINE):
+        return None
+    return SHADOW_ENGINE if SHADOW_SAMPLE >= 1 or random.random() < SHADOW_SAMPLE else None
+
+
+def diff_cards(served, candidate):
+    """{'missing', 'extra', 'changed'} cards of candidate against served.
+
+    Cards equal in every field pair up first; a leftover served card and a
+    leftover candidate card with the same name and collector number are a
+    change, the rest are missing or extra.
+    """
+    unmatched = {}
+    for card in served:
+        unmatched.setdefault(json.dumps(card, sort_keys=True), []).append(card)
+    extra = []
+    for card in candidate:
+        same = unmatched.get(json.dumps(card, sort_keys=True))
+        if same:
+            same.pop()
+        else:
+            extra.append(card)
+    missing = {}
+    for cards in unmatched.values():
+        for card in cards:
+            missing.setdefault((card['name'], card['collectorNumber']), []).append(card)
+    changed = []
+    for card in list(extra):
+        partners = missing.get((card['name'], card['collectorNumber']))
+        if partners:
+            changed.append({'served': partners.pop(0), 'candidate': card})
+            extra.remove(card)
+    return {'missing': [card for cards in missing.values() for card in cards], 'extra': extra, 'changed': changed}
+
+
+def write_shadow_record(record):
+    """Append one line to SHADOW_LOG; a log that can't be written never fails the parse"""
+    try:
+        with open(SHADOW_LOG, 'a') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    except OSError:
+        pass
+
+
+# Adaptive pattern plans for the linear engine. Each order's hits per pattern
+# family are counted per document layout (the item-table header it has and
+# whether it has Bin rows) and shared through PATTERN_PROFILE_PATH. The
+# slot-row rules, where the first rule to claim a line wins, are tried most
+# successful first within SLOT_ROW_PRECEDENCE. A family that hasn't hit in
+# PATTERN_SKIP_AFTER orders of a layout is skipped there, except on every
+# PATTERN_PROBE_EVERY-th order of the layout, which runs all. Skipping can lose
+# a card, and the parse cache keeps whatever the plan produced, so it is off
+# unless PATTERN_SKIP_AFTER is set (0 = never skip).
+PATTERN_PROFILE_ENABLED = os.environ.get('PATTERN_PROFILE', '1') == '1'
+PATTERN_PROFILE_PATH = os.environ.get('PATTERN_PROFILE_PATH',
+                                      os.path.join(tempfile.gettempdir(), 'pdf-parse-pattern-profile.json'))
+PATTERN_SKIP_AFTER = int(os.environ.get('PATTERN_SKIP_AFTER', '0'))
+PATTERN_PROBE_EVERY = int(os.environ.get('PATTERN_PROBE_EVERY', '20'))
+PATTERN_PROFILE_FLUSH_SECONDS = 30
+
+# Slot-row rules in their hand-written order, and the pairs (first, then) that
+# must keep it because a line both can claim has to go to first. 0b is
+# disjoint from the rest: it needs a line without '#' followed by a bare
+# quantity, 0 and 0a need a '#', 0c needs a "<qty> <Game> - <Set>" line next.
+# benchmarks/pattern_order.py checks these claims against a corpus.
+SLOT_ROW_RULES = ('0b', '0c', '0', '0a')
+SLOT_ROW_PRECEDENCE = (('0c', '0'), ('0c', '0a'), ('0', '0a'))
+# The other linear families fill a bucket each, so the order they run in never matters
+LINE_FAMILIES = ('1', '3', '2', '2b', '4', '5', '5b', '6', '8', 'stitch', 'ygo', '9')
+ALL_FAMILIES = SLOT_ROW_RULES + LINE_FAMILIES
+
+
+class PatternProfile:
+    """Orders run and hits per pattern family and layout, merged across processes through a JSON file.
+
+    layouts maps a layout to {'orders', 'runs': {family: orders it ran in},
+    'hits': {family: cards or rows it produced}}, as of the last flush (None
+    until the first plan reads the file, so importing parse doesn't); this
+    process's orders since are counted in pending. Plans are worked out once
+    per layout and flush, so an order only pays for a dict lookup, and the
+    file is written at most every PATTERN_PROFILE_FLUSH_SECONDS (and at exit;
+    processes that leave through os._exit call flush_pattern_profile first).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.layouts = None
+        self.pending = {}
+        self.flushed_at = time()
+        self._plans = {}
+        self._orders = {}  # layout -> orders planned by this process, for spacing out probes
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Hit rates of another parser version's (or vocabulary's) patterns say nothing about these
+        if data.get('parserVersion') != PARSER_VERSION or data.get('vocabulary') != VOCABULARY.DIGEST:
+            return {}
+        return data.get('layouts', {})
+
+    @staticmethod
+    def _add(layouts, layout, orders, runs, hits):
+        stats = layouts.setdefault(layout, {'orders': 0, 'runs': {}, 'hits': {}})
+        stats['orders'] += orders
+        for family, count in runs.items():
+            stats['runs'][family] = stats['runs'].get(family, 0) + count
+        for family, count in hits.items():
+            stats['hits'][family] = stats['hits'].get(family, 0) + count
+
+    def plan(self, layout):
+        """(slot-row rules in the order to try them, frozenset of families to skip) for an order of layout"""
+        if self.layouts is None:
+            self.layouts = self._read()
+        stats = self.layouts.get(layout)
+        if stats is None:
+            return SLOT_ROW_RULES, frozenset()
+        plan = self._plans.get(layout)
+        if plan is None:
+            plan = self._plans[layout] = self._make_plan(stats)
+        if plan[1]:
+            orders = self._orders[layout] = self._orders.get(layout, 0) + 1
+            if not orders % PATTERN_PROBE_EVERY:
+                return plan[0], frozenset()  # a probe order runs every family
+        return plan
+
+    @staticmethod
+    def _make_plan(stats):
+        runs, hits = stats['runs'], stats['hits']
+        skip = set()
+        if PATTERN_SKIP_AFTER:
+            skip = {family for family in ALL_FAMILIES
+                    if runs.get(family, 0) >= PATTERN_SKIP_AFTER and not hits.get(family)}
+        # A rule that must come before one still tried is tried too, or the
+        # later rule would claim the lines the skipped one is there for
+        changed = True
+        while changed:
+            changed = False
+            for first, then in SLOT_ROW_PRECEDENCE:
+                if first in skip and then not in skip:
+                    skip.discard(first)
+                    changed = True
+        remaining = sorted((rule for rule in SLOT_ROW_RULES if rule not in skip),
+                           key=lambda rule: -hits.get(rule, 0) / max(runs.get(rule, 0), 1))
+        order = []
+        while remaining:
+            # The most successful rule none of whose required predecessors is still waiting
+            rule = next(rule for rule in remaining
+                        if not any(then == rule and first in remaining for first, then in SLOT_ROW_PRECEDENCE))
+            order.append(rule)
+            remaining.remove(rule)
+        return tuple(order), frozenset(skip)
+
+    def observe(self, layout, skipped, hits):
+        """Count one order of layout: every family but skipped ran, and hits is what each produced"""
+        with self._lock:
+            stats = self.pending.get(layout)
+            if stats is None:
+                stats = self.pending[layout] = {'orders': 0, 'runs': dict.fromkeys(ALL_FAMILIES, 0), 'hits': {}}
+            stats['orders'] += 1
+            runs = stats['runs']
+            for family in ALL_FAMILIES:
+                if family not in skipped:
+                    runs[family] += 1
+            counts = stats['hits']
+            for family, count in hits.items():
+                counts[family] = counts.get(family, 0) + count
+            if time() - self.flushed_at >= PATTERN_PROFILE_FLUSH_SECONDS:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            if self.pending:
+                self._flush()
+
+    def _merged(self):
+        """The profile on disk plus pending"""
+        merged = self._read()
+        for layout, stats in self.pending.items():
+            self._add(merged, layout, stats['orders'], stats['runs'], stats['hits'])
+        return merged
+
+    def _flush(self):
+        """Add pending to the profile on disk (best-effort) and pick up other processes' orders.
+
+        The read, merge and replace hold an exclusive lock on a sidecar file,
+        so processes flushing at once don't drop each other's counts.
+        """
+        merged = None
+        try:
+            with open(f"{self.path}.lock", 'a') as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file is closed
+                merged = self._merged()
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(json.dumps({'parserVersion': PARSER_VERSION, 'vocabulary': VOCABULARY.DIGEST,
+                                        'layouts': merged}, separators=(',', ':')))
+                os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+        self.layouts = merged if merged is not None else self._merged()
+        self.pending = {}
+        self.flushed_at = time()
+        self._plans = {}
+
+
+PATTERN_PROFILE = PatternProfile(PATTERN_PROFILE_PATH) if PATTERN_PROFILE_ENABLED else None
+if PATTERN_PROFILE:
+    atexit.register(PATTERN_PROFILE.flush)
+
+
+def flush_pattern_profile():
+    """Write this process's pending pattern profile counts now.
+
+    For processes that leave through os._exit (forked servers, job and batch
+    workers), which skips the atexit flush.
+    """
+    if PATTERN_PROFILE:
+        PATTERN_PROFILE.flush()
+
+
+NAME_LETTERS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
+# Lines that can look like a name in the address blocks
+BUYER_NAME_EXCLUDES = VOCABULARY.CONDITIONS + (
+    'Billing Address', 'Shipping Address', 'Order Date', 'Direct by TCGplayer',
+    'Included Orders', 'Seller Name', 'Order Number'
+)
+
+
+class CardRecord:
+    """One extracted card while the engines run; to_dict() gives the JSON shape.
+
+    Most candidates the pattern families produce are dropped by dedupe, so
+    records are slotted, carry their seen_cards key as a tuple of the matched
+    strings (no formatting), and compute the best-entry key and score at most once.
+    """
+    __slots__ = ('name', 'quantity', 'condition', 'set_name', 'collector_number', 'rarity',
+                 'seen_key', '_best_key', '_score')
+
+    def __init__(self, name, quantity, condition, set_name, collector_number, rarity, seen_key=None):
+        self.name = name
+        self.quantity = quantity
+        self.condition = condition
+        self.set_name = set_name
+        self.collector_number = collector_number
+        self.rarity = rarity
+        self.seen_key = seen_key
+        self._best_key = None
+        self._score = None
+
+    def strip_leading_qty(self, leading_qty):
+        """Drop a quantity that leaked into the name, e.g. '1 Red Elemental Blast'"""
+        self.name = leading_qty.sub('', self.name).strip()
+        self._best_key = None
+
+    @property
+    def best_key(self):
+        """Normalized name + collector# the best-entry pass groups by, computed once.
+
+        Deliberately not sys.intern'ed: the interpreter's intern table never
+        shrinks, so a warm instance would keep growing with every card name seen.
+        """
+        if self._best_key is None:
+            self._best_key = (self.name.lower().strip(), (self.collector_number or '').lower().strip())
+        return self._best_key
+
+    @property
+    def score(self):
+        """Prefer entries with a clean setName and a condition without an embedded 'Game - '"""
+        if self._score is None:
+            s = 0
+            set_name = self.set_name or ''
+            if set_name:
+                s += 2
+                sn = set_name.lower()
+                # Penalize malformed/borrowed set names (contain '#', embedded dashes chain, or 'magic - ')
+                if '#' in sn or ' - ' in sn or 'magic - ' in sn:
+                    s -= 2
+            if ' - ' not in (self.condition or ''):
+                s += 1
+            self._score = s
+        return self._score
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'quantity': self.quantity,
+            'condition': self.condition,
+            'setName': self.set_name,
+            'collectorNumber': self.collector_number,
+            'rarity': self.rarity
+        }
+
+
+# A header split by a page break is found by scanning each page together with
+# this much of the previous one (longer than any "Direct by TCGplayer #" header)
+HEADER_OVERLAP_CHARS = 64
+
+
+class PageChunks:
+    """Document text as a list of page chunks plus an offset table.
+
+    Stands in for one growing string: appending a page doesn't copy the text
+    before it, text before an offset can be dropped, and only the ranges
+    asked for are joined.
+    """
+    __slots__ = ('chunks', 'starts', 'end')
+
+    def __init__(self):
+        self.chunks = []
+        self.starts = []  # position of each chunk in the text of all pages so far
+        self.end = 0      # length of the text of all pages so far
+
+    def append(self, chunk):
+        self.chunks.append(chunk)
+        self.starts.append(self.end)
+        self.end += len(chunk)
+
+    def tail(self, size):
+        """Up to the last size characters of the newest chunk"""
+        return self.chunks[-1][-size:] if self.chunks else ''
+
+    def text(self, start, end):
+        """The text between two positions, joined from the chunks holding it"""
+        parts = []
+        for i in range(max(0, bisect_right(self.starts, start) - 1), len(self.chunks)):
+            chunk_start = self.starts[i]
+            if chunk_start >= end:
+                break
+            parts.append(self.chunks[i][max(0, start - chunk_start):end - chunk_start])
+        return ''.join(parts)
+
+    def drop_before(self, position):
+        """Forget the chunks that end at or before position"""
+        count = bisect_right(self.starts, position) - 1
+        if count > 0:
+            del self.chunks[:count]
+            del self.starts[:count]
+
+
+class OrderParser:
+    """Direct PDF -> orders. Holds no request state, so one instance serves every caller"""
+
+    def parse_pdf(self, pdf_source, engine=None, workers=None, backend=None, timer=None):
+        """Parse TCGplayer Direct PDF (bytes or a binary file) and extract orders"""
+        return list(self.iter_orders(pdf_source, engine, workers, backend, timer))
+    
+    def iter_orders(self, pdf_source, engine=None, workers=None, backend=None, timer=None, on_page=None):
+        """Yield orders in document order as soon as each one is complete.
+
+        An order is complete once the next "Direct by TCGplayer #" header (or
+        the end of the document) has been extracted. Only the text of the
+        current, unfinished order is kept; positions are still reported as
+        offsets into the full document text. A StageTimer, if given, is charged
+        for extraction, splitting and each order's buyer/card extraction.
+        on_page, if given, is called with the number of pages extracted so far.
+        """
+        PDFS_PARSED.inc()
+        page_texts = self.iter_page_texts(pdf_source, workers, backend or default_backend(engine))
+        if timer:
+            page_texts = timer.timed('extract', page_texts)
+        yield from self.orders_from_pages(page_texts, engine, timer, on_page)
+    
+    def orders_from_pages(self, page_texts, engine=None, timer=None, on_page=None, wanted=None):
+        """Split consecutive page texts into orders and parse each as soon as it is complete.
+
+        With wanted (a set of order numbers) only those orders are parsed;
+        the rest are split off and dropped without running the extractors.
+        """
+        order_header = PATTERNS['order_header']
+        text = PageChunks()  # pages from the unfinished order (or, before the first header, the last page) on
+        current = None       # (order number, position) of the unfinished order
+        table_rows = None    # (position, card) item-table rows of the pages held, from LayoutBackend pages
+        pages_done = 0
+        
+        for page_text in page_texts:
+            PAGES_PARSED.inc()
+            pages_done += 1
+            if on_page:
+                on_page(pages_done)
+            if not page_text:
+                continue
+            if timer:
+                split_start = perf_counter()
+            
+            # Scan only the new page, plus enough of the one before to catch a header split by the page break
+            tail = text.tail(HEADER_OVERLAP_CHARS)
+            window_start = text.end - len(tail)
+            chunk = page_text + "\n\n"
+            page_rows = getattr(page_text, 'rows', None)
+            if page_rows is not None:
+                table_rows = table_rows or []
+                table_rows.extend((text.end + offset, card) for offset, card in page_rows)
+            text.append(chunk)
+            
+            # Every new header closes the order before it
+            sections = []
+            for match in order_header.finditer(tail + chunk):
+                if match.end() <= len(tail):
+                    continue  # found while scanning the previous page
+                header = (match.group(1), window_start + match.start())
+                if current:
+                    sections.append((current, header[1]))
+                current = header
+            if timer:
+                timer.add('split', perf_counter() - split_start)
+            
+            # An order's text is only joined when it is parsed
+            for (order_num, start_pos), end_pos in sections:
+                if wanted is None or order_num in wanted:
+                    yield self.parse_order(order_num, text.text(start_pos, end_pos), start_pos, engine, timer,
+                                           self._rows_between(table_rows, start_pos, end_pos))
+            keep = current[1] if current else text.end - len(chunk)
+            text.drop_before(keep)
+            if table_rows:
+                del table_rows[:bisect_left(table_rows, (keep,))]
+        
+        # End of document closes the last order
+        if current and (wanted is None or current[0] in wanted):
+            yield self.parse_order(current[0], text.text(current[1], text.end), current[1], engine, timer,
+                                   self._rows_between(table_rows, current[1], text.end))
+    
+    @staticmethod
+    def _rows_between(table_rows, start, end):
+        """Cards of the table rows starting in [start, end), or None when the pages carried no table rows"""
+        if table_rows is None:
+            return None
+        return [card for position, card in table_rows if start <= position < end]
+    
+    def iter_selected_orders(self, pdf_source, order_numbers=None, page_range=None, engine=None, backend=None,
+                             timer=None, index=None):
+        """Yield only the wanted orders, extracting just the pages they are on.
+
+        Orders are wanted by number, or by the 1-based inclusive page_range
+        (first, last) their header falls in. Their pages come from
+        scan_order_index (or the index passed in); each contiguous run of
+        pages is extracted and split like iter_orders, and only wanted orders
+        are parsed. startPos/endPos are offsets into the text of the run an
+        order was found in. A wanted order the index places but the extracted
+        text doesn't show, or any order when the index is empty (fonts without
+        a unicode map), falls back to a full parse.
+        """
+        if index is None:
+            start = perf_counter()
+            index = scan_order_index(pdf_source)
+            if timer:
+                timer.add('index', perf_counter() - start)
+        wanted = set(order_numbers or ())
+        if page_range:
+            wanted.update(number for number, first, _ in index if page_range[0] <= first + 1 <= page_range[1])
+        
+        runs = []
+        for page in sorted({page for number, first, last in index if number in wanted for page in range(first, last + 1)}):
+            if runs and runs[-1][1] == page:
+                runs[-1][1] = page + 1
+            else:
+                runs.append([page, page + 1])
+        
+        backend = backend or default_backend(engine)
+        extractor = EXTRACT_BACKENDS[backend]
+        found = set()
+        PDFS_PARSED.inc()
+        with extractor.open(pdf_source) as document:
+            for start, stop in runs:
+                page_texts = extractor.iter_texts(document, start, stop)
+                if timer:
+                    page_texts = timer.timed('extract', page_texts)
+                for order in self.orders_from_pages(page_texts, engine, timer, wanted=wanted):
+                    found.add(order['orderNumber'])
+                    yield order
+        
+        missing = {number for number, _, _ in index if number in wanted} - found if index else wanted
+        if missing:
+            page_texts = self.iter_page_texts(pdf_source, 1, backend)
+            if timer:
+                page_texts = timer.timed('extract', page_texts)
+            yield from self.orders_from_pages(page_texts, engine, timer, wanted=missing)
+    
+    def parse_order(self, order_num, order_section, start_pos, engine=None, timer=None, table_rows=None):
+        """Parse one order section starting at start_pos in the document text.
+
+        table_rows are the cards LayoutBackend read from the section's item
+        table (None for other backends); only the layout engine uses them.
+        """
+        shadow = shadow_engine_for(engine)
+        if timer or shadow:
+            start = perf_counter()
+        
+        # Extract buyer name (billing person)
+        buyer_name = self.extract_buyer_name(order_section, order_num)
+        
+        if timer or shadow:
+            buyer_done = perf_counter()
+        
+        # Extract cards from this order
+        cards, debug_info = self.extract_cards(order_section, engine, table_rows)
+        
+        if timer or shadow:
+            cards_done = perf_counter()
+        if timer:
+            timer.add('buyer', buyer_done - start)
+            timer.add('cards', cards_done - buyer_done)
+            timer.add_order(order_num, buyer_done - start, cards_done - buyer_done)
+        if shadow:
+            self.shadow_order(order_num, order_section, table_rows, engine or CARD_ENGINE, shadow, cards,
+                              cards_done - buyer_done, debug_info.get('layout'))
+        ORDERS_PARSED.inc()
+        CARDS_PARSED.inc(len(cards))
+        
+        return {
+            'orderNumber': order_num,
+            'buyerName': buyer_name,
+            'cards': cards,
+            'startPos': start_pos,
+            'endPos': start_pos + len(order_section),
+            'debug': debug_info
+        }
+    
+    def shadow_order(self, order_num, order_section, table_rows, engine, candidate_engine, cards, seconds,
+                     layout=None):
+        """Extract an order's cards again with candidate_engine and log how they differ from cards.
+
+        A layout engine (served, with its debug layout, or candidate) that had
+        to fall back to linear is recorded with its table row count and
+        fallback flag, so its records aren't taken for the layout engine's.
+        """
+        record = {
+            'time': round(time(), 3),
+            'orderNumber': order_num,
+            'engine': engine,
+            'candidate': candidate_engine,
+            'ms': round(seconds * 1000, 3)
+        }
+        if layout:
+            record['layout'] = layout
+        before = PATTERNS.snapshot()
+        start = perf_counter()
+        try:
+            candidate_cards, candidate_debug = self.extract_cards(order_section, candidate_engine, table_rows)
+            if 'layout' in candidate_debug:
+                record['candidateLayout'] = candidate_debug['layout']
+        except Exception as e:
+            record['candidateMs'] = round((perf_counter() - start) * 1000, 3)
+            record['error'] = f"{type(e).__name__}: {e}"
+            outcome = 'error'
+        else:
+            record['candidateMs'] = round((perf_counter() - start) * 1000, 3)
+            record['cards'] = len(cards)
+            record.update(diff_cards(cards, candidate_cards))
+            outcome = 'differ' if record['missing'] or record['extra'] or record['changed'] else 'match'
+        finally:
+            PATTERNS.restore(before)
+        record['outcome'] = outcome
+        SHADOW_ORDERS.inc(outcome=outcome)
+        write_shadow_record(record)
+    
+    def iter_page_texts(self, pdf_source, workers=None, backend=None):
+        """Yield the text of every page, in page order.
+
+        Large documents are split into contiguous page ranges that worker
+        processes extract in parallel; small ones (or workers <= 1) run serially.
+        """
+        if workers is None:
+            workers = EXTRACT_WORKERS
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        backend = backend or EXTRACT_BACKEND
+        extractor = EXTRACT_BACKENDS[backend]
+        
+        with extractor.open(pdf_source) as document:
+            page_count = extractor.page_count(document)
+            if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+                yield from extractor.iter_texts(document)
+                return
+        
+        # Forked workers would share a spilled upload's file offset, so give them bytes
+        if isinstance(pdf_source, (bytes, bytearray)):
+            pdf_bytes = pdf_source
+        else:
+            pdf_source.seek(0)
+            pdf_bytes = pdf_source.read()
+        
+        done = 0
+        try:
+            for page_text in iter_pages_parallel(pdf_bytes, page_count, workers, backend):
+                done += 1
+                yield page_text
+        except (OSError, EOFError):
+            # No process support in this sandbox (or a worker died) - finish serially
+            yield from extract_page_range(pdf_bytes, done, page_count, backend)
+    
+    def extract_buyer_name(self, order_text, order_num):
+        """Extract billing person name from order section"""
+        # First try to extract from the explicit "Shipping Address" section
+        shipping_text = None
+        header = PATTERNS['shipping_header'].search(order_text)
+        if header:
+            section_end = order_text.find('Shipping Method:', header.end())
+            if section_end != -1:
+                shipping_text = order_text[header.end():section_end]
+
+        if shipping_text:
+            # Look for a person name on a line of its own followed by a street address
+            # (names: "First Last", "Last, First", "R. Jeremy", "philip alston"; addresses:
+            # "123 Main St", "N58W23783 Hastings Ct", "91-111 MAKAALOA PL", PO BOX, CMR, HC, RR).
+            # Lines are tokenized rather than matched with one name regex, whose nested
+            # quantifiers backtracked quadratically on long runs of name-like words.
+            for candidate_name in self._address_names(shipping_text):
+                # Skip if it contains excluded words
+                if any(excluded in candidate_name for excluded in BUYER_NAME_EXCLUDES):
+                    continue
+
+                return candidate_name
+
+        return None
+    
+    def _address_names(self, text):
+        """Yield every name followed by an address line, in document order.
+
+        A name is a line's tail of two or more words (split by spaces, tabs or
+        commas) running to the end of the line, taken from its leftmost valid
+        start; the next non-blank line must start like a street, PO BOX, CMR,
+        HC or RR address. Scanning resumes after that address start, so the
+        results are what a left-to-right regex scan would find, in linear time.
+        """
+        buyer_address = PATTERNS['buyer_address']
+        pos = 0
+        while True:
+            newline = text.find('\n', pos)
+            if newline == -1:
+                return  # a name must end its line
+            end = pos + len(text[pos:newline].rstrip())
+            name_start = self._name_start(text, pos, end)
+            address = buyer_address.match(text, newline) if name_start is not None else None
+            if address:
+                yield text[name_start:end]
+                pos = address.end()
+            else:
+                pos = newline + 1
+    
+    @staticmethod
+    def _name_start(text, start, end):
+        """Leftmost position from which text[..:end] is a whole name, or None.
+
+        Words are walked right to left: every word after the first must be a
+        full name token (buyer_token), and the first may be the tail of a word
+        as long as that tail is letters/hyphens with an optional final '.'.
+        """
+        buyer_token = PATTERNS['buyer_token']
+        separators = ' \t,'
+        name_start = None
+        later_words = 0
+        word_end = end
+        while word_end > start:
+            word_start = word_end
+            while word_start > start and text[word_start - 1] not in separators:
+                word_start -= 1
+            
+            if later_words:
+                # Leftmost tail of this word that can open the name
+                tail = word_end - 1 if text[word_end - 1] == '.' else word_end
+                while tail > word_start and (text[tail - 1] in NAME_LETTERS or text[tail - 1] == '-'):
+                    tail -= 1
+                while tail < word_end and text[tail] not in NAME_LETTERS:
+                    tail += 1
+                if tail < word_end:
+                    name_start = tail
+            
+            if not buyer_token.match(text[word_start:word_end]):
+                break  # nothing further left can be followed by this word
+            later_words += 1
+            word_end = word_start
+            while word_end > start and text[word_end - 1] in separators:
+                word_end -= 1
+            if word_end == word_start:
+                break  # reached start without a separator run
+        return name_start
+    
+    def extract_cards(self, order_text, engine=None, table_rows=None):
+        """Extract card details from order section using the selected engine.
+
+        Returns (cards, debug_info) where debug_info holds the per-pattern
+        attempt/hit/time counters accumulated while parsing this section.
+        The layout engine takes its cards from table_rows; an order without
+        table rows, or with a row whose cells don't form a card, falls back
+        to the linear engine (debug_info['layout'] says which happened).
+        """
+        before = PATTERNS.snapshot()
+        engine = engine or CARD_ENGINE
+        layout = None
+        if engine == 'layout':
+            layout = {'rows': len(table_rows or ()), 'fallback': not table_rows or None in table_rows}
+            if not layout['fallback']:
+                return ([card.to_dict() for card in table_rows],
+                        {'patterns': PATTERNS.stats(since=before), 'layout': layout})
+        debug_info = {}
+        if engine in ('linear', 'layout'):
+            cards = self.extract_cards_linear(order_text, debug_info)
+        else:
+            cards = self.extract_cards_legacy(order_text)
+        debug_info = {'patterns': PATTERNS.stats(since=before), **debug_info}
+        if layout:
+            debug_info['layout'] = layout
+        return [card.to_dict() for card in cards], debug_info
+
+    def extract_cards_legacy(self, order_text):
+        """Extract card details from order section - robust multi-line handling"""
+        cards = []
+        seen_cards = set()  # Deduplicate by name+collector#
+
+        # Preprocess: drop slot headers and table headers that can break patterns
+        cleaned_lines = []
+        for line in order_text.split('\n'):
+            l = line.strip()
+            if not l:
+                continue
+            # Skip slot header like "Slot C - Near Mint" or "Slot X - Lightly Played"
+            if PATTERNS['slot_header'].match(l):
+                continue
+            # Skip table header rows
+            if PATTERNS['table_header'].match(l):
+                continue
+            # Normalize leading slot code prefixes like 'K 1 ' or 'K-T 1 ' -> '1 '
+            m_slot = PATTERNS['slot_prefix'].match(l)
+            if m_slot:
+                l = f"{m_slot.group(1)} {m_slot.group(2)}".strip()
+            cleaned_lines.append(l)
+        order_text = '\n'.join(cleaned_lines)
+        
+        # Pattern 0: Slot O/X multi-line format (card name first, then qty+game+set on next line)
+        # Format: "CardName - #Collector - Rarity - Condition [partial]"
+        #   Next: "Quantity Game - Set Name"
+        #   Optional: "Edition" or other condition continuation
+        # Example: "Tri-Brigade Hammer - #DOOD-EN068 - Super Rare - Near Mint 1st"
+        #          "1 YuGiOh - Doom of Dimensions"
+        #          "Edition"
+        slot_card_pattern = PATTERNS['0']
+        qty_game_set_pattern = PATTERNS['qty_game_set']
+        
+        # Pattern 0a: Card with collector but NO complete condition on first line
+        # Format: "CardName - #Collector - Rarity -" OR "CardName - #Collector - Rarity - PartialCondition"
+        #   Next: "Quantity Game - Set Name"
+        #   Third: "Condition" or "Condition continuation"
+        slot_card_no_cond = PATTERNS['0a']
+        
+        # Pattern 0b: Card with NO collector on first line (Theoden case)
+        # Format: "CardName - Game - Set Name (partial)"
+        #   Next: "Quantity" (just number)
+        #   Third: "#Collector - Rarity - Condition Set Name (continued)"
+        slot_card_no_collector = PATTERNS['0b']
+        collector_rarity_cond = PATTERNS['collector_rarity_cond']
+        
+        # Pattern 0c: Card ending with "-" (collector on third line)
+        # Format: "CardName (with or without collector) -"
+        #   Next: "Quantity Game - Set Name"
+        #   Third: "#Collector - Rarity - Condition"
+        # Example: "Squirtle - 007/165 (Reverse Cosmos Holo) (Costco Exclusive) -"
+        slot_card_collector_no_hash = PATTERNS['0c']
+        
+        i = 0
+        
+        while i < len(cleaned_lines):
+            line = cleaned_lines[i].strip()
+            
+            # Try Pattern 0b FIRST (most specific - Theoden case)
+            # Must check before Pattern 0 to prevent false matches
+            # Only match if line does NOT contain '#' (no collector on first line)
+            if '#' not in line:
+                match_0b = slot_card_no_collector.match(line)
+                if match_0b and i + 2 < len(cleaned_lines):
+                    next_line = cleaned_lines[i + 1].strip()
+                    third_line = cleaned_lines[i + 2].strip()
+                    
+                    # Check if next line is just a number and third line has #collector
+                    if next_line.isdigit():
+                        match_collector = collector_rarity_cond.match(third_line)
+                        if match_collector:
                             card_name = match_0b.group(1).strip()
-                            if 'theoden' in card_name.lower():
-                                debug_info['theoden_found'] = True
                             game = match_0b.group(2).strip()
                             set_name_part1 = match_0b.group(3).strip()
                             
@@ -301,39 +1965,31 @@ class handler(BaseHTTPRequestHandler):
                                 condition = condition_and_set
                                 set_name = set_name_part1
                             
-                            card_key = f"{card_name}|{collector_num}|{condition}"
+                            card_key = (card_name, collector_num, condition)
                             if card_key not in seen_cards:
                                 seen_cards.add(card_key)
-                                cards.append({
-                                    'name': card_name,
-                                    'quantity': quantity,
-                                    'condition': condition,
-                                    'setName': set_name,
-                                    'collectorNumber': collector_num,
-                                    'rarity': rarity
-                                })
+                                cards.append(CardRecord(
+                                    name=card_name,
+                                    quantity=quantity,
+                                    condition=condition,
+                                    set_name=set_name,
+                                    collector_number=collector_num,
+                                    rarity=rarity
+                                ))
                             
                             i += 3
                             continue
-                        else:
-                            debug_info['pattern_0b_collector_fails'] += 1
-                    else:
-                        debug_info['pattern_0b_digit_fails'] += 1
             
             # Try Pattern 0c SECOND (Squirtle case - ends with "-")
-            debug_info['pattern_0c_attempts'] += 1
-            match_0c = re.match(slot_card_collector_no_hash, line)
+            match_0c = slot_card_collector_no_hash.match(line)
             if match_0c and i + 2 < len(cleaned_lines):
                 next_line = cleaned_lines[i + 1].strip()
                 third_line = cleaned_lines[i + 2].strip()
-                match_qty = re.match(qty_game_set_pattern, next_line)
-                match_collector = re.match(collector_rarity_cond, third_line)
+                match_qty = qty_game_set_pattern.match(next_line)
+                match_collector = collector_rarity_cond.match(third_line)
                 
                 if match_qty and match_collector:
-                    debug_info['pattern_0c_matches'] += 1
                     card_name = match_0c.group(1).strip()
-                    if 'squirtle' in card_name.lower():
-                        debug_info['squirtle_found'] = True
                     collector_num = match_collector.group(1).strip()
                     rarity = match_collector.group(2).strip()
                     condition = match_collector.group(3).strip()
@@ -342,27 +1998,27 @@ class handler(BaseHTTPRequestHandler):
                     game = match_qty.group(2).strip()
                     set_name = match_qty.group(3).strip()
                     
-                    card_key = f"{card_name}|{collector_num}|{condition}"
+                    card_key = (card_name, collector_num, condition)
                     if card_key not in seen_cards:
                         seen_cards.add(card_key)
-                        cards.append({
-                            'name': card_name,
-                            'quantity': quantity,
-                            'condition': condition,
-                            'setName': set_name,
-                            'collectorNumber': collector_num,
-                            'rarity': rarity
-                        })
+                        cards.append(CardRecord(
+                            name=card_name,
+                            quantity=quantity,
+                            condition=condition,
+                            set_name=set_name,
+                            collector_number=collector_num,
+                            rarity=rarity
+                        ))
                     
                     i += 3
                     continue
             
             # Try Pattern 0 third (full format)
-            match_card = re.match(slot_card_pattern, line)
+            match_card = slot_card_pattern.match(line)
             
             if match_card and i + 1 < len(cleaned_lines):
                 next_line = cleaned_lines[i + 1].strip()
-                match_qty = re.match(qty_game_set_pattern, next_line)
+                match_qty = qty_game_set_pattern.match(next_line)
                 
                 if match_qty:
                     card_name = match_card.group(1).strip()
@@ -377,33 +2033,33 @@ class handler(BaseHTTPRequestHandler):
                     # Check for condition continuation on third line
                     if i + 2 < len(cleaned_lines):
                         third_line = cleaned_lines[i + 2].strip()
-                        if third_line and len(third_line) < 30 and not re.match(r'^(.+?)\s+-\s+#', third_line):
+                        if third_line and len(third_line) < 30 and not PATTERNS['next_header'].match(third_line):
                             condition = f"{condition} {third_line}".strip()
                             i += 1
                     
-                    card_key = f"{card_name}|{collector_num}|{condition}"
+                    card_key = (card_name, collector_num, condition)
                     if card_key not in seen_cards:
                         seen_cards.add(card_key)
-                        cards.append({
-                            'name': card_name,
-                            'quantity': quantity,
-                            'condition': condition,
-                            'setName': set_name,
-                            'collectorNumber': collector_num,
-                            'rarity': rarity
-                        })
+                        cards.append(CardRecord(
+                            name=card_name,
+                            quantity=quantity,
+                            condition=condition,
+                            set_name=set_name,
+                            collector_number=collector_num,
+                            rarity=rarity
+                        ))
                     
                     i += 2
                     continue
             
             # Try Pattern 0a: No complete condition on first line (Lightning case)
-            match_0a = re.match(slot_card_no_cond, line)
+            match_0a = slot_card_no_cond.match(line)
             if match_0a and i + 2 < len(cleaned_lines):
                 next_line = cleaned_lines[i + 1].strip()
                 third_line = cleaned_lines[i + 2].strip()
-                match_qty = re.match(qty_game_set_pattern, next_line)
+                match_qty = qty_game_set_pattern.match(next_line)
                 
-                if match_qty and not re.match(r'^(.+?)\s+-\s+#', third_line):
+                if match_qty and not PATTERNS['next_header'].match(third_line):
                     card_name = match_0a.group(1).strip()
                     collector_num = match_0a.group(2).strip()
                     rarity = match_0a.group(3).strip()
@@ -419,17 +2075,17 @@ class handler(BaseHTTPRequestHandler):
                     game = match_qty.group(2).strip()
                     set_name = match_qty.group(3).strip()
                     
-                    card_key = f"{card_name}|{collector_num}|{condition}"
+                    card_key = (card_name, collector_num, condition)
                     if card_key not in seen_cards:
                         seen_cards.add(card_key)
-                        cards.append({
-                            'name': card_name,
-                            'quantity': quantity,
-                            'condition': condition,
-                            'setName': set_name,
-                            'collectorNumber': collector_num,
-                            'rarity': rarity
-                        })
+                        cards.append(CardRecord(
+                            name=card_name,
+                            quantity=quantity,
+                            condition=condition,
+                            set_name=set_name,
+                            collector_number=collector_num,
+                            rarity=rarity
+                        ))
                     
                     i += 3
                     continue
@@ -438,9 +2094,9 @@ class handler(BaseHTTPRequestHandler):
         
         # Pattern 1: With "Bin X" prefix - handles multiline set names
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        pattern_bin = r'Bin\s+[\w\-]+\s+(\d+)\s+(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$'
+        pattern_bin = PATTERNS['1']
         
-        for match in re.finditer(pattern_bin, order_text, re.MULTILINE):
+        for match in pattern_bin.finditer(order_text):
             # Get the line after this match to check for set name continuation
             match_end = match.end()
             next_line_start = match_end + 1
@@ -453,53 +2109,53 @@ class handler(BaseHTTPRequestHandler):
             set_name = ""
             
             # Generic "<Game> - <Set>" splitter on same line as condition
-            m_line = re.match(r'^(.*?)\s+[A-Za-z]+\s+-\s+(.+)$', condition)
+            m_line = PATTERNS['inline_word_game_set'].match(condition)
             if m_line:
                 condition = m_line.group(1).strip()
                 set_name = m_line.group(2).strip()
             else:
                 # Set name may be on the next line; try to split "<Game> - <Set>"
-                if next_line and not next_line.startswith('Bin') and not re.match(r'^\d+\s+', next_line):
-                    m_next = re.match(r'^[A-Za-z]+\s+-\s+(.+)$', next_line)
+                if next_line and not next_line.startswith('Bin') and not PATTERNS['leading_qty'].match(next_line):
+                    m_next = PATTERNS['word_game_set'].match(next_line)
                     set_name = m_next.group(1).strip() if m_next else next_line
             
-            card_key = f"{match.group(2)}|{match.group(3)}|{condition}"
+            card_key = (match.group(2), match.group(3), condition)
             if card_key not in seen_cards:
                 seen_cards.add(card_key)
-                cards.append({
-                    'name': match.group(2).strip(),
-                    'quantity': int(match.group(1)),
-                    'condition': condition,
-                    'setName': set_name,
-                    'collectorNumber': match.group(3).strip(),
-                    'rarity': match.group(4).strip()
-                })
+                cards.append(CardRecord(
+                    name=match.group(2).strip(),
+                    quantity=int(match.group(1)),
+                    condition=condition,
+                    set_name=set_name,
+                    collector_number=match.group(3).strip(),
+                    rarity=match.group(4).strip()
+                ))
         
         # Pattern 2: Standard format (no Bin prefix)
         # Matches: "1 CardName - #123 - R - Condition <Game> - Set" (Game can be Magic, Pokemon, etc.)
         # Allow game tokens with hyphens/apostrophes (e.g., Yu-Gi-Oh, Marvel's)
         # Updated to handle double-sided cards with '//' in name and collector number (e.g., "Treasure // Plot" with "#18 // 20")
-        pattern_standard = r'^(\d+)\s+(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)\s+[A-Za-z\-\']+\s+-\s+(.+?)$'
+        pattern_standard = PATTERNS['2']
         
-        for match in re.finditer(pattern_standard, order_text, re.MULTILINE):
+        for match in pattern_standard.finditer(order_text):
             condition = match.group(5).strip()
-            card_key = f"{match.group(2)}|{match.group(3)}|{condition}"
+            card_key = (match.group(2), match.group(3), condition)
             if card_key not in seen_cards:
                 seen_cards.add(card_key)
-                cards.append({
-                    'name': match.group(2).strip(),
-                    'quantity': int(match.group(1)),
-                    'condition': condition,
-                    'setName': match.group(6).strip(),
-                    'collectorNumber': match.group(3).strip(),
-                    'rarity': match.group(4).strip()
-                })
+                cards.append(CardRecord(
+                    name=match.group(2).strip(),
+                    quantity=int(match.group(1)),
+                    condition=condition,
+                    set_name=match.group(6).strip(),
+                    collector_number=match.group(3).strip(),
+                    rarity=match.group(4).strip()
+                ))
 
         # Pattern 8: Card line without game/set on same line; look at adjacent line for "<Game> - <Set>"
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        card_no_game = re.compile(r'^(?:[A-Z]\s+)?(\d+)\s+(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
-        card_no_game_no_hash = re.compile(r'^(?:[A-Z]\s+)?(\d+)\s+(.+?)\s+-\s([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
-        game_set_line = re.compile(r"^(?:\d+\s+)?(Magic|Pokemon|Yu-Gi-Oh|YuGiOh|Marvel's Spider-Man)\s+-\s+(.+)$")
+        card_no_game = PATTERNS['8']
+        card_no_game_no_hash = PATTERNS['8_no_hash']
+        game_set_line = PATTERNS['game_set_line']
 
         lines = cleaned_lines
         for i, line in enumerate(lines):
@@ -520,63 +2176,42 @@ class handler(BaseHTTPRequestHandler):
                     set_name = gs.group(2).strip()
             # If the 'col' token looks like a rarity (e.g., 'U', 'C', 'R', 'M', 'Common', 'Uncommon', etc.),
             # then this line likely has NO collector number and the trailing token is actually the set name.
-            rarity_alias = {
-                'common': 'Common',
-                'uncommon': 'Uncommon',
-                'rare': 'Rare',
-                'mythic': 'Mythic',
-                'special': 'Special',
-                'promo': 'Promo',
-                'short print': 'Short Print',
-                'secret rare': 'Secret Rare',
-                'double rare': 'Double Rare',
-                'illustration rare': 'Illustration Rare',
-                'ultra rare': 'Ultra Rare',
-                'holo rare': 'Holo Rare',
-                'super rare': 'Super Rare'
-            }
-            col_l = col.strip().lower()
-            col_is_letter_code = len(col.strip()) == 1 and col.strip().upper() in {'C','U','R','M','S'}
-            col_is_word = col_l in rarity_alias
-            if col_is_letter_code or col_is_word:
+            mapped_rarity = VOCABULARY.rarity_for(col)
+            if mapped_rarity:
                 # shift fields: rarity comes from 'col', condition from 'rarity', and 'condition' token is actually set
-                mapped_rarity = col.strip().upper() if col_is_letter_code else rarity_alias[col_l]
                 set_name = set_name or condition.strip()
                 condition = rarity  # e.g., 'Lightly Played Magic'
                 rarity = mapped_rarity
                 col = ''  # no collector number present
             condition = condition.strip()
             # If condition still contains inline "<Game> - <Set>", split it
-            m_inline = re.match(r"^(.*?)\s+[A-Za-z\-']+\s+-\s+(.+)$", condition)
+            m_inline = PATTERNS['inline_game_set'].match(condition)
             if m_inline:
                 condition = m_inline.group(1).strip()
                 set_name = m_inline.group(2).strip()
             # If condition ends with a lone game token (no dash), drop it
-            for g in ("Magic", "Pokemon", "Yu-Gi-Oh", "Marvel's Spider-Man"):
-                if condition.endswith(g):
-                    condition = condition[: -len(g)].rstrip()
-                    break
+            condition = VOCABULARY.strip_trailing_game(condition)
             # Clean set_name to remove any leading "Game - " prefix if present
             if set_name:
-                set_name = re.sub(r"^[A-Za-z\-']+\s+-\s+", "", set_name).strip()
-            card_key = f"{name}|{col}|{condition}"
+                set_name = PATTERNS['game_prefix'].sub("", set_name).strip()
+            card_key = (name, col, condition)
             if card_key in seen_cards:
                 continue
             seen_cards.add(card_key)
-            cards.append({
-                'name': name.strip(),
-                'quantity': int(qty),
-                'condition': condition,
-                'setName': set_name,
-                'collectorNumber': col.strip(),
-                'rarity': rarity.strip()
-            })
+            cards.append(CardRecord(
+                name=name.strip(),
+                quantity=int(qty),
+                condition=condition,
+                set_name=set_name,
+                collector_number=col.strip(),
+                rarity=rarity.strip()
+            ))
 
         # Final robust fallback: stitch header-like lines to following game-set and condition lines (handles split or minimal headers)
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        header_like_any = re.compile(r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)(?:\s*-\s*.*)?$')
-        header_fragment = re.compile(r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+)-$')
-        code_continue = re.compile(r'^([A-Za-z0-9/\s]+)\s*-\s*([A-Za-z ]+)(?:\s*-\s*(.+))?$')
+        header_like_any = PATTERNS['header_like_any']
+        header_fragment = PATTERNS['header_fragment']
+        code_continue = PATTERNS['code_continue']
         for i, line in enumerate(lines):
             hm = header_like_any.match(line.strip())
             name = col = rarity = None
@@ -608,9 +2243,9 @@ class handler(BaseHTTPRequestHandler):
             # look ahead for game-set
             if i+1 < len(lines):
                 nxt = lines[i+1].strip()
-                m_slot = re.match(r"^[A-Z](?:-[A-Z])?\s+(\d+)\s+[A-Za-z\-']+\s+-\s+(.+)$", nxt)
-                m_simple = re.match(r"^(\d+)\s+[A-Za-z\-']+\s+-\s+(.+)$", nxt)
-                m_game = re.match(r"^(Magic|Pokemon|Yu-Gi-Oh|YuGiOh|Marvel's Spider-Man)\s+-\s+(.+)$", nxt)
+                m_slot = PATTERNS['slot_qty_set'].match(nxt)
+                m_simple = PATTERNS['qty_set'].match(nxt)
+                m_game = PATTERNS['game_line'].match(nxt)
                 if m_slot:
                     qty = int(m_slot.group(1)); set_name = m_slot.group(2).strip()
                 elif m_simple:
@@ -620,32 +2255,30 @@ class handler(BaseHTTPRequestHandler):
             # condition continuation
             for off in (1,2,3):
                 if i+off < len(lines):
-                    hy = re.match(r'^[\-–]\s+(.+)$', lines[i+off].strip())
+                    hy = PATTERNS['hyphen_cont'].match(lines[i+off].strip())
                     if hy and not condition:
                         condition = hy.group(1).strip()
                         break
             if set_name:
-                set_name = re.sub(r"^[A-Za-z\-']+\s+-\s+", "", set_name).strip()
+                set_name = PATTERNS['game_prefix'].sub("", set_name).strip()
             condition = (condition or '').strip()
-            card_key = f"{name}|{col}|{condition}"
+            card_key = (name, col, condition)
             if card_key in seen_cards:
                 continue
             seen_cards.add(card_key)
-            cards.append({
-                'name': name.strip(),
-                'quantity': int(qty),
-                'condition': condition,
-                'setName': set_name,
-                'collectorNumber': col.strip(),
-                'rarity': rarity.strip()
-            })
+            cards.append(CardRecord(
+                name=name.strip(),
+                quantity=int(qty),
+                condition=condition,
+                set_name=set_name,
+                collector_number=col.strip(),
+                rarity=rarity.strip()
+            ))
 
         # YGO back-link fallback: find 'YuGiOh - <Set>' lines, attach previous header-like '<Name> - #CODE - Rarity'
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        game_only_line = re.compile(r"^(?:\d+\s+)?(Magic|Pokemon|Yu-Gi-Oh|YuGiOh|Marvel's Spider-Man)\s+-\s+(.+)$")
-        header_like = re.compile(r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)$')
-        header_fragment = re.compile(r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+)-$')  # e.g., "... - #DOOD-"
-        code_continue = re.compile(r'^([A-Za-z0-9/\s]+)\s*-\s*([A-Za-z ]+)(?:\s*-\s*(.+))?$')  # e.g., "EN085 - Common - Near Mint 1st Edition"
+        game_only_line = PATTERNS['game_set_line']
+        header_like = PATTERNS['header_like']
         for i, line in enumerate(lines):
             gm = game_only_line.match(line.strip())
             if not gm:
@@ -706,28 +2339,28 @@ class handler(BaseHTTPRequestHandler):
             condition = ''
             if i + 1 < len(lines):
                 n1 = lines[i+1].strip()
-                cont = re.match(r'^[\-–]\s+(.+)$', n1)
+                cont = PATTERNS['hyphen_cont'].match(n1)
                 if cont:
                     condition = cont.group(1).strip()
             if not condition and i + 2 < len(lines):
                 n2 = lines[i+2].strip()
-                cont = re.match(r'^[\-–]\s+(.+)$', n2)
+                cont = PATTERNS['hyphen_cont'].match(n2)
                 if cont:
                     condition = cont.group(1).strip()
             # clean set prefix if includes game token
-            set_name = re.sub(r"^[A-Za-z\-']+\s+-\s+", "", set_name).strip()
-            card_key = f"{name}|{col}|{condition}"
+            set_name = PATTERNS['game_prefix'].sub("", set_name).strip()
+            card_key = (name, col, condition)
             if card_key in seen_cards:
                 continue
             seen_cards.add(card_key)
-            cards.append({
-                'name': name.strip(),
-                'quantity': 1,
-                'condition': condition.strip(),
-                'setName': set_name,
-                'collectorNumber': col.strip(),
-                'rarity': rarity.strip()
-            })
+            cards.append(CardRecord(
+                name=name.strip(),
+                quantity=1,
+                condition=condition.strip(),
+                set_name=set_name,
+                collector_number=col.strip(),
+                rarity=rarity.strip()
+            ))
 
         # Pattern 9: Header line without quantity; next/prev line contains quantity and game-set
         # Example:
@@ -735,9 +2368,9 @@ class handler(BaseHTTPRequestHandler):
         #   M-T 1 Magic - Wilds of Eldraine: Enchanting Tales
         #   Foil
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        header_no_qty = re.compile(r'^(?![A-Z](?:-[A-Z])?\s+\d+\s)(?!\d+\s)(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
-        header_no_qty_no_hash = re.compile(r'^(?![A-Z](?:-[A-Z])?\s+\d+\s)(?!\d+\s)(.+?)\s+-\s([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$')
-        header_minimal = re.compile(r'^(?![A-Z](?:-[A-Z])?\s+\d+\s)(?!\d+\s)(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)$')
+        header_no_qty = PATTERNS['9']
+        header_no_qty_no_hash = PATTERNS['9_no_hash']
+        header_minimal = PATTERNS['9_minimal']
         for i, line in enumerate(lines):
             m = header_no_qty.match(line)
             m2 = header_no_qty_no_hash.match(line)
@@ -753,24 +2386,14 @@ class handler(BaseHTTPRequestHandler):
             set_name = ''
 
             # Prefer inline Game - Set in the condition token
-            m_inline = re.match(r"^(.*?)\s+[A-Za-z\-']+\s+-\s+(.+)$", condition.strip())
+            m_inline = PATTERNS['inline_game_set'].match(condition.strip())
             if m_inline:
                 condition = m_inline.group(1).strip()
                 set_name = m_inline.group(2).strip()
 
             # If 'col' looks like a rarity code/word, shift fields (no collector number)
-            rarity_alias = {
-                'common': 'Common', 'uncommon': 'Uncommon', 'rare': 'Rare', 'mythic': 'Mythic',
-                'special': 'Special', 'promo': 'Promo', 'short print': 'Short Print',
-                'secret rare': 'Secret Rare', 'double rare': 'Double Rare',
-                'illustration rare': 'Illustration Rare', 'ultra rare': 'Ultra Rare',
-                'holo rare': 'Holo Rare', 'super rare': 'Super Rare'
-            }
-            col_l = col.strip().lower()
-            col_is_letter_code = len(col.strip()) == 1 and col.strip().upper() in {'C','U','R','M','S','L','T'}
-            col_is_word = col_l in rarity_alias
-            if col_is_letter_code or col_is_word:
-                mapped_rarity = col.strip().upper() if col_is_letter_code else rarity_alias[col_l]
+            mapped_rarity = VOCABULARY.rarity_for(col, VOCABULARY.RARITY_CODES_WITH_LANDS)
+            if mapped_rarity:
                 # If no inline set yet, try to treat current 'rarity' token as condition and 'condition' token as set
                 if not set_name:
                     set_name = condition.strip()
@@ -781,9 +2404,9 @@ class handler(BaseHTTPRequestHandler):
             # Look next for quantity + game-set if set_name still empty
             if not set_name and i+1 < len(lines):
                 nxt = lines[i+1].strip()
-                m_slot = re.match(r"^[A-Z](?:-[A-Z])?\s+(\d+)\s+[A-Za-z\-']+\s+-\s+(.+)$", nxt)
-                m_simple = re.match(r"^(\d+)\s+[A-Za-z\-']+\s+-\s+(.+)$", nxt)
-                m_game = re.match(r"^(Magic|Pokemon|Yu-Gi-Oh|YuGiOh|Marvel's Spider-Man)\s+-\s+(.+)$", nxt)
+                m_slot = PATTERNS['slot_qty_set'].match(nxt)
+                m_simple = PATTERNS['qty_set'].match(nxt)
+                m_game = PATTERNS['game_line'].match(nxt)
                 if m_slot:
                     qty = int(m_slot.group(1))
                     set_name = m_slot.group(2).strip()
@@ -796,68 +2419,42 @@ class handler(BaseHTTPRequestHandler):
             if i+2 < len(lines):
                 nxt2 = lines[i+2].strip()
                 # condition continuation like '- Near Mint 1st Edition'
-                cont = re.match(r'^[\-–]\s+(.+)$', nxt2)
+                cont = PATTERNS['hyphen_cont'].match(nxt2)
                 if cont and not condition:
                     condition = cont.group(1).strip()
                 if nxt2.lower() == 'foil' and 'foil' not in condition.lower():
                     condition = (condition + ' Foil').strip()
                 # If set_name looks truncated and next token is a short word continuation (e.g., 'Tales'), append it
-                if set_name and nxt2 and ' - ' not in nxt2 and nxt2.lower() not in {'foil'} and not re.search(r'\d', nxt2) and len(nxt2) <= 20:
+                if set_name and nxt2 and ' - ' not in nxt2 and nxt2.lower() not in {'foil'} and not PATTERNS['digit'].search(nxt2) and len(nxt2) <= 20:
                     set_name = (set_name + ' ' + nxt2).strip()
 
             condition = condition.strip()
             # Remove trailing lone game token if stuck in condition
-            for g in ("Magic", "Pokemon", "Yu-Gi-Oh", "Marvel's Spider-Man"):
-                if condition.endswith(g):
-                    condition = condition[: -len(g)].rstrip()
-                    break
+            condition = VOCABULARY.strip_trailing_game(condition)
             # Clean set_name to remove any leading "Game - " prefix if present
             if set_name:
-                set_name = re.sub(r"^[A-Za-z\-']+\s+-\s+", "", set_name).strip()
-            card_key = f"{name}|{col}|{condition}"
+                set_name = PATTERNS['game_prefix'].sub("", set_name).strip()
+            card_key = (name, col, condition)
             if card_key in seen_cards:
                 continue
             seen_cards.add(card_key)
-            cards.append({
-                'name': name.strip(),
-                'quantity': int(qty),
-                'condition': condition,
-                'setName': set_name,
-                'collectorNumber': col.strip(),
-                'rarity': rarity.strip()
-            })
+            cards.append(CardRecord(
+                name=name.strip(),
+                quantity=int(qty),
+                condition=condition,
+                set_name=set_name,
+                collector_number=col.strip(),
+                rarity=rarity.strip()
+            ))
         
-        # Cleanup: strip leading quantity that may have leaked into names like '1 Red Elemental Blast'
-        if cards:
-            for e in cards:
-                e['name'] = re.sub(r'^\d+\s+', '', e['name']).strip()
-
-        # Dedupe: prefer entries with non-empty setName or cleaner condition (no embedded 'Game - ')
-        if cards:
-            best = {}
-            def score(entry):
-                s = 0
-                set_name = (entry.get('setName') or '')
-                cond = (entry.get('condition') or '')
-                if set_name:
-                    s += 2
-                    sn = set_name.lower()
-                    # Penalize malformed/borrowed set names (contain '#', embedded dashes chain, or 'magic -')
-                    if '#' in sn or ' - ' in sn or 'magic - ' in sn:
-                        s -= 2
-                if ' - ' not in cond:
-                    s += 1
-                return s
-            for e in cards:
-                key = (e['name'].lower().strip(), (e.get('collectorNumber') or '').lower().strip())
-                if key not in best or score(e) > score(best[key]):
-                    best[key] = e
-            cards = list(best.values())
+        # Cleanup leaked quantities, then dedupe: prefer entries with non-empty setName or
+        # cleaner condition (no embedded 'Game - ')
+        cards = self._select_best_cards(cards)
 
         # Pattern 3: Bin format WITHOUT collector number (e.g. "Bin 7 2 Raging Goblin - C - Lightly Played Magic - Portal")
-        pattern_bin_no_num = r'Bin\s+[\w\-]+\s+(\d+)\s+(.+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)$'
+        pattern_bin_no_num = PATTERNS['3']
         
-        for match in re.finditer(pattern_bin_no_num, order_text, re.MULTILINE):
+        for match in pattern_bin_no_num.finditer(order_text):
             # Skip if card name contains collector number (would be caught by pattern 1)
             if ' - #' in match.group(2):
                 continue
@@ -866,31 +2463,31 @@ class handler(BaseHTTPRequestHandler):
             set_name = ""
             
             # Generic "<Game> - <Set>" splitter on same line as condition
-            m_line = re.match(r'^(.*?)\s+[A-Za-z]+\s+-\s+(.+)$', condition)
+            m_line = PATTERNS['inline_word_game_set'].match(condition)
             if m_line:
                 condition = m_line.group(1).strip()
                 set_name = m_line.group(2).strip()
             
             # Use card name + set + condition as key since no collector number
-            card_key = f"{match.group(2)}|{set_name}|{condition}"
+            card_key = (match.group(2), set_name, condition)
             if card_key not in seen_cards:
                 seen_cards.add(card_key)
-                cards.append({
-                    'name': match.group(2).strip(),
-                    'quantity': int(match.group(1)),
-                    'condition': condition,
-                    'setName': set_name,
-                    'collectorNumber': '',  # No collector number
-                    'rarity': match.group(3).strip()
-                })
+                cards.append(CardRecord(
+                    name=match.group(2).strip(),
+                    quantity=int(match.group(1)),
+                    condition=condition,
+                    set_name=set_name,
+                    collector_number='',  # No collector number
+                    rarity=match.group(3).strip()
+                ))
         
         # Pattern 4: Extreme split case (card name on one line, Bin+qty on next)
         # Handles cases where condition might be split across 3 lines
         # Use a broad name matcher to include apostrophes and punctuation; allow collector numbers with slashes
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        pattern_split = r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+([A-Za-z ]+)$'
+        pattern_split = PATTERNS['4']
         
-        for match in re.finditer(pattern_split, order_text, re.MULTILINE):
+        for match in pattern_split.finditer(order_text):
             match_end = match.end()
             next_line_start = match_end + 1
             next_line_end = order_text.find('\n', next_line_start)
@@ -899,7 +2496,7 @@ class handler(BaseHTTPRequestHandler):
             next_line = order_text[next_line_start:next_line_end].strip()
             
             # Check if next line has Bin info
-            bin_match = re.match(r'Bin\s+[\w\-]+\s+(\d+)\s+[A-Za-z]+\s+-\s+(.+)', next_line)
+            bin_match = PATTERNS['bin_game_set'].match(next_line)
             if bin_match:
                 # Condition from first line
                 condition_part1 = match.group(4).strip()
@@ -912,22 +2509,22 @@ class handler(BaseHTTPRequestHandler):
                 third_line = order_text[third_line_start:third_line_end].strip()
                 
                 # If third line is a single word (like "Played"), append it to condition
-                if third_line and not third_line.startswith('Bin') and not re.match(r'^\d+', third_line) and len(third_line.split()) <= 2:
+                if third_line and not third_line.startswith('Bin') and not PATTERNS['leading_digits'].match(third_line) and len(third_line.split()) <= 2:
                     full_condition = f"{condition_part1} {third_line}"
                 else:
                     full_condition = condition_part1
                 
-                card_key = f"{match.group(1)}|{match.group(2)}|{full_condition}"
+                card_key = (match.group(1), match.group(2), full_condition)
                 if card_key not in seen_cards:
                     seen_cards.add(card_key)
-                    cards.append({
-                        'name': match.group(1).strip(),
-                        'quantity': int(bin_match.group(1)),
-                        'condition': full_condition,
-                        'setName': bin_match.group(2).strip(),
-                        'collectorNumber': match.group(2).strip(),
-                        'rarity': match.group(3).strip()
-                    })
+                    cards.append(CardRecord(
+                        name=match.group(1).strip(),
+                        quantity=int(bin_match.group(1)),
+                        condition=full_condition,
+                        set_name=bin_match.group(2).strip(),
+                        collector_number=match.group(2).strip(),
+                        rarity=match.group(3).strip()
+                    ))
 
         # Pattern 5: Split case where condition is absent on first line (e.g., ends with '-')
         # Example:
@@ -935,15 +2532,15 @@ class handler(BaseHTTPRequestHandler):
         #   Bin 8-T 1 Magic - Phyrexia: All Will Be One
         #   Lightly Played Foil
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        pattern_split_no_cond = r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s*$'
+        pattern_split_no_cond = PATTERNS['5']
 
         # Pattern 5b: Split case with partial condition on first line (e.g., ends with 'Near')
         # Example:
         #   Treasure // Plot Double-Sided Token - #18 // 20 - T - Near
         #   Bin 1 1 Magic - Outlaws of Thunder Junction
         #   Mint
-        pattern_split_partial_cond = r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+)$'
-        for match in re.finditer(pattern_split_no_cond, order_text, re.MULTILINE):
+        pattern_split_partial_cond = PATTERNS['5b']
+        for match in pattern_split_no_cond.finditer(order_text):
             match_end = match.end()
             next_line_start = match_end + 1
             next_line_end = order_text.find('\n', next_line_start)
@@ -951,7 +2548,7 @@ class handler(BaseHTTPRequestHandler):
                 next_line_end = len(order_text)
             next_line = order_text[next_line_start:next_line_end].strip()
 
-            bin_match = re.match(r'Bin\s+[\w\-]+\s+(\d+)\s+[A-Za-z]+\s+-\s+(.+)', next_line)
+            bin_match = PATTERNS['bin_game_set'].match(next_line)
             if bin_match:
                 # Condition expected on the following line
                 third_line_start = next_line_end + 1
@@ -961,20 +2558,20 @@ class handler(BaseHTTPRequestHandler):
                 third_line = order_text[third_line_start:third_line_end].strip()
                 full_condition = third_line if third_line else ''
 
-                card_key = f"{match.group(1)}|{match.group(2)}|{full_condition}"
+                card_key = (match.group(1), match.group(2), full_condition)
                 if card_key not in seen_cards:
                     seen_cards.add(card_key)
-                    cards.append({
-                        'name': match.group(1).strip(),
-                        'quantity': int(bin_match.group(1)),
-                        'condition': full_condition.strip(),
-                        'setName': bin_match.group(2).strip(),
-                        'collectorNumber': match.group(2).strip(),
-                        'rarity': match.group(3).strip()
-                    })
+                    cards.append(CardRecord(
+                        name=match.group(1).strip(),
+                        quantity=int(bin_match.group(1)),
+                        condition=full_condition.strip(),
+                        set_name=bin_match.group(2).strip(),
+                        collector_number=match.group(2).strip(),
+                        rarity=match.group(3).strip()
+                    ))
 
         # Process Pattern 5b: partial condition on first line
-        for match in re.finditer(pattern_split_partial_cond, order_text, re.MULTILINE):
+        for match in pattern_split_partial_cond.finditer(order_text):
             match_end = match.end()
             next_line_start = match_end + 1
             next_line_end = order_text.find('\n', next_line_start)
@@ -982,7 +2579,7 @@ class handler(BaseHTTPRequestHandler):
                 next_line_end = len(order_text)
             next_line = order_text[next_line_start:next_line_end].strip()
 
-            bin_match = re.match(r'Bin\s+[\w\-]+\s+(\d+)\s+[A-Za-z\-\']+\s+-\s+(.+)', next_line)
+            bin_match = PATTERNS['bin_game_set_any'].match(next_line)
             if bin_match:
                 # Partial condition from first line (e.g., "Near")
                 condition_part1 = match.group(4).strip()
@@ -997,17 +2594,17 @@ class handler(BaseHTTPRequestHandler):
                 # Combine condition parts
                 full_condition = f"{condition_part1} {third_line}".strip() if third_line and not third_line.startswith('Bin') else condition_part1
 
-                card_key = f"{match.group(1)}|{match.group(2)}|{full_condition}"
+                card_key = (match.group(1), match.group(2), full_condition)
                 if card_key not in seen_cards:
                     seen_cards.add(card_key)
-                    cards.append({
-                        'name': match.group(1).strip(),
-                        'quantity': int(bin_match.group(1)),
-                        'condition': full_condition,
-                        'setName': bin_match.group(2).strip(),
-                        'collectorNumber': match.group(2).strip(),
-                        'rarity': match.group(3).strip()
-                    })
+                    cards.append(CardRecord(
+                        name=match.group(1).strip(),
+                        quantity=int(bin_match.group(1)),
+                        condition=full_condition,
+                        set_name=bin_match.group(2).strip(),
+                        collector_number=match.group(2).strip(),
+                        rarity=match.group(3).strip()
+                    ))
 
         # Pattern 6: Split case where the line with Bin information lacks the "Magic -" portion
         # Example:
@@ -1015,22 +2612,12 @@ class handler(BaseHTTPRequestHandler):
         #   Bin 8 1
         #   Played Foil Ixalan
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        pattern_split_bin_simple = r'^(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+([A-Za-z]+)\s+[A-Za-z\-\']+\s+-\s+(.+)$'
-
-        # Pattern 7: Slot-letter prefix quantity (e.g., "X 1 Pikachu ... - #027/078 - Common - Near Mint Pokemon - Pokemon GO")
-        # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        pattern_slotqty = r'^[A-Z](?:-[A-Z])?\s+(\d+)\s+(.+?)\s+-\s#([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)\s+[A-Za-z\-\']+\s+-\s+(.+?)$'
-        pattern_slotqty_no_hash = r'^[A-Z](?:-[A-Z])?\s+(\d+)\s+(.+?)\s+-\s([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)\s+[A-Za-z\-\']+\s+-\s+(.+?)$'
+        pattern_split_bin_simple = PATTERNS['6']
 
         # Pattern 2b: Standard format without '#' before collector number (e.g., "1 Ditto - 132/165 - Rare - Near Mint Pokemon - Deck Exclusives")
         # Updated to handle double-sided cards with '//' in collector number (e.g., "#18 // 20")
-        pattern_standard_no_hash = r'^(\d+)\s+(.+?)\s+-\s([A-Za-z0-9/\-\s]+?)\s+-\s+([A-Za-z ]+)\s+-\s+(.+?)\s+[A-Za-z\-\']+\s+-\s+(.+?)$'
-        condition_tokens_whitelist = {
-            'near', 'mint', 'lightly', 'played', 'moderately', 'heavily', 'damaged', 'foil',
-            'nm', 'lp', 'mp', 'hp', 'nif', 'lpf', 'mpf', 'nmf', 'good', 'excellent', 'poor',
-            'signed', 'graded', 'pld', 'gd', 'ex', 'sp', 'pr', 'heavily', 'moderate', 'moderately', 'light'
-        }
-        for match in re.finditer(pattern_split_bin_simple, order_text, re.MULTILINE):
+        pattern_standard_no_hash = PATTERNS['2b']
+        for match in pattern_split_bin_simple.finditer(order_text):
             match_end = match.end()
             next_line_start = match_end + 1
             next_line_end = order_text.find('\n', next_line_start)
@@ -1038,7 +2625,7 @@ class handler(BaseHTTPRequestHandler):
                 next_line_end = len(order_text)
             next_line = order_text[next_line_start:next_line_end].strip()
 
-            bin_match = re.match(r'Bin\s+[\w\-]+\s+(\d+)', next_line)
+            bin_match = PATTERNS['bin_qty'].match(next_line)
             if bin_match:
                 # Third line contains remaining condition + possible set tail
                 third_line_start = next_line_end + 1
@@ -1054,8 +2641,8 @@ class handler(BaseHTTPRequestHandler):
                 set_tail_tokens = []
                 tokens = third_line.split()
                 for token in tokens:
-                    clean = re.sub(r'[^a-z]', '', token.lower())
-                    if clean in condition_tokens_whitelist and not set_tail_tokens:
+                    clean = PATTERNS['non_alpha'].sub('', token.lower())
+                    if clean in VOCABULARY.CONDITION_TOKENS and not set_tail_tokens:
                         additional_condition_tokens.append(token)
                     else:
                         set_tail_tokens.append(token)
@@ -1068,31 +2655,1511 @@ class handler(BaseHTTPRequestHandler):
                 else:
                     full_set = set_part1
 
-                card_key = f"{match.group(1)}|{match.group(2)}|{full_condition}"
+                card_key = (match.group(1), match.group(2), full_condition)
                 if card_key not in seen_cards:
                     seen_cards.add(card_key)
-                    cards.append({
-                        'name': match.group(1).strip(),
-                        'quantity': int(bin_match.group(1)),
-                        'condition': full_condition,
-                        'setName': full_set,
-                        'collectorNumber': match.group(2).strip(),
-                        'rarity': match.group(3).strip()
-                    })
+                    cards.append(CardRecord(
+                        name=match.group(1).strip(),
+                        quantity=int(bin_match.group(1)),
+                        condition=full_condition,
+                        set_name=full_set,
+                        collector_number=match.group(2).strip(),
+                        rarity=match.group(3).strip()
+                    ))
 
         # Iterate Pattern 2b (no '#')
-        for match in re.finditer(pattern_standard_no_hash, order_text, re.MULTILINE):
+        for match in pattern_standard_no_hash.finditer(order_text):
             condition = match.group(5).strip()
-            card_key = f"{match.group(2)}|{match.group(3)}|{condition}"
+            card_key = (match.group(2), match.group(3), condition)
             if card_key not in seen_cards:
                 seen_cards.add(card_key)
-                cards.append({
-                    'name': match.group(2).strip(),
-                    'quantity': int(match.group(1)),
-                    'condition': condition,
-                    'setName': match.group(6).strip(),
-                    'collectorNumber': match.group(3).strip(),
-                    'rarity': match.group(4).strip()
-                })
+                cards.append(CardRecord(
+                    name=match.group(2).strip(),
+                    quantity=int(match.group(1)),
+                    condition=condition,
+                    set_name=match.group(6).strip(),
+                    collector_number=match.group(3).strip(),
+                    rarity=match.group(4).strip()
+                ))
         
-        return cards, debug_info
+        return cards
+
+    def extract_cards_linear(self, order_text, debug_info=None):
+        """Extract card details in O(lines): classify each cleaned line once, then
+        let each pattern family visit only the lines whose token kinds it can match.
+
+        Candidates are bucketed per family and merged in the legacy family order,
+        so `seen_cards` dedupe and the best-entry pass pick the same winners as
+        `extract_cards_legacy`. With PATTERN_PROFILE the slot-row rules run in
+        the order of the layout's plan and its skipped families don't run;
+        debug_info, if given, gets the plan under 'patternPlan'.
+        """
+        P = PATTERNS
+        lines, kinds, game_sets, layout = self._linear_lines(order_text)
+        text = '\n'.join(lines)
+
+        slot_order, skip = PATTERN_PROFILE.plan(layout) if PATTERN_PROFILE else (SLOT_ROW_RULES, frozenset())
+        slot_rules = tuple((rule, getattr(self, f'_slot_row_{rule}')) for rule in slot_order)
+        slot_hits = {}
+        bin_families, digit_families, split_families = ('1', '3'), ('2', '2b'), ('4', '5', '5b', '6')
+        run_8 = run_stitch = run_ygo = run_9 = True
+        if skip:
+            bin_families = tuple(family for family in bin_families if family not in skip)
+            digit_families = tuple(family for family in digit_families if family not in skip)
+            split_families = tuple(family for family in split_families if family not in skip)
+            run_8, run_stitch, run_ygo, run_9 = (family not in skip for family in ('8', 'stitch', 'ygo', '9'))
+        if debug_info is not None and PATTERN_PROFILE:
+            debug_info['patternPlan'] = {'layout': layout, 'slotRows': list(slot_order), 'skipped': sorted(skip)}
+        n = len(lines)
+
+        starts = []
+        pos = 0
+        for l in lines:
+            starts.append(pos)
+            pos += len(l) + 1
+
+        # One bucket of CardRecords (keyed by seen_key) per family, merged in legacy order below
+        families_before_dedupe = ('0', '1', '2', '8', 'stitch', 'ygo', '9')
+        families_after_dedupe = ('3', '4', '5', '5b', '6', '2b')
+        buckets = {family: [] for family in families_before_dedupe + families_after_dedupe}
+
+        # Multi-line families match against the joined text. `cursors` mirrors
+        # re.finditer's non-overlap rule: a line starting before the previous
+        # match end cannot start a new match.
+        cursors = dict.fromkeys(('1', '2', '3', '4', '5', '5b', '6', '2b'), 0)
+        text_len = len(text)
+
+        next_slot_row = 0
+        for i in range(n):
+            line = lines[i]
+            kind = kinds[i]
+            start = starts[i]
+
+            # Slot rows (Patterns 0b/0c/0/0a) consume 1-3 lines per step
+            if i == next_slot_row:
+                next_slot_row = self._linear_slot_row(i, lines, kinds, buckets['0'], slot_rules, slot_hits)
+
+            # Bin families are not anchored to line starts, so drive them by search
+            if kind & TOKEN_BIN:
+                for family in bin_families:
+                    if cursors[family] <= start + len(line):
+                        m = P[family].search(text, max(start, cursors[family]))
+                        if m:
+                            cursors[family] = m.end()
+                            self._linear_emit_bin(family, m, text, buckets[family])
+                        else:
+                            cursors[family] = text_len + 1
+
+            if kind & TOKEN_LEADING_DIGIT:
+                for family in digit_families:
+                    if start >= cursors[family]:
+                        m = P[family].match(text, start)
+                        if m:
+                            cursors[family] = m.end()
+                            condition = m.group(5).strip()
+                            buckets[family].append(CardRecord(
+                                name=m.group(2).strip(),
+                                quantity=int(m.group(1)),
+                                condition=condition,
+                                set_name=m.group(6).strip(),
+                                collector_number=m.group(3).strip(),
+                                rarity=m.group(4).strip(),
+                                seen_key=(m.group(2), m.group(3), condition)
+                            ))
+
+            # "Name - #Col - ..." headers may wrap the '-' or '#' onto the next line
+            if kind & (TOKEN_HASH | TOKEN_DASH_END) or (i + 1 < n and kinds[i + 1] & TOKEN_CONT):
+                for family in split_families:
+                    if start >= cursors[family]:
+                        m = P[family].match(text, start)
+                        if m:
+                            cursors[family] = m.end()
+                            self._linear_emit_split(family, m, text, buckets[family])
+
+            if kind & TOKEN_DASH3 and run_8:
+                self._linear_pattern_8(i, lines, game_sets, buckets['8'])
+
+            if kind & TOKEN_HASH and run_stitch:
+                self._linear_header_stitch(i, lines, buckets['stitch'])
+
+            if kind & TOKEN_GAME_SET and run_ygo:
+                self._linear_ygo_backlink(i, lines, game_sets[i], buckets['ygo'])
+
+            if kind & (TOKEN_HASH | TOKEN_DASH3) and run_9:
+                self._linear_pattern_9(i, lines, buckets['9'])
+
+        if PATTERN_PROFILE:
+            for family in LINE_FAMILIES:
+                if buckets[family]:
+                    slot_hits[family] = len(buckets[family])
+            PATTERN_PROFILE.observe(layout, skip, slot_hits)
+
+        cards = []
+        seen_cards = set()
+        for family in families_before_dedupe:
+            for card in buckets[family]:
+                if card.seen_key not in seen_cards:
+                    seen_cards.add(card.seen_key)
+                    cards.append(card)
+
+        cards = self._select_best_cards(cards)
+
+        for family in families_after_dedupe:
+            for card in buckets[family]:
+                if card.seen_key not in seen_cards:
+                    seen_cards.add(card.seen_key)
+                    cards.append(card)
+
+        return cards
+
+    def _linear_lines(self, order_text):
+        """Preprocess exactly like the legacy path, classifying lines as we go.
+
+        Returns (lines, token kinds, game_set_line match or None per line,
+        layout), where layout names the order's item-table header ('slot',
+        'table' or 'none'), with '+bin' when a line has a Bin location.
+        """
+        P = PATTERNS
+        lines = []
+        kinds = []
+        game_sets = []
+        header = 'none'
+        any_kind = 0
+        for raw in order_text.split('\n'):
+            l = raw.strip()
+            if not l:
+                continue
+            if P['slot_header'].match(l):
+                header = 'slot'
+                continue
+            if P['table_header'].match(l):
+                header = 'table' if header == 'none' else header
+                continue
+            if 'A' <= l[0] <= 'Z':
+                m_slot = P['slot_prefix'].match(l)
+                if m_slot:
+                    l = f"{m_slot.group(1)} {m_slot.group(2)}".strip()
+            lines.append(l)
+            kind, game_set = self._classify_line(l)
+            kinds.append(kind)
+            game_sets.append(game_set)
+            any_kind |= kind
+        return lines, kinds, game_sets, f"{header}+bin" if any_kind & TOKEN_BIN else header
+
+    @staticmethod
+    def _classify_line(line):
+        """Return (token kinds bitmask, game_set_line match or None) for a cleaned line"""
+        kind = 0
+        first = line[0]
+        if first.isdigit():
+            kind |= TOKEN_LEADING_DIGIT
+            if line.isdigit():
+                kind |= TOKEN_QTY
+        elif first == '-' or first == '–':
+            kind |= TOKEN_CONT
+        if '#' in line:
+            kind |= TOKEN_HASH
+        if 'Bin' in line:
+            kind |= TOKEN_BIN
+        game_set = None
+        if '-' in line:
+            kind |= TOKEN_DASH
+            if line.count('-') >= 3:
+                kind |= TOKEN_DASH3
+            if line[-1] == '-':
+                kind |= TOKEN_DASH_END
+            game_set = PATTERNS['game_set_line'].match(line)
+            if game_set:
+                kind |= TOKEN_GAME_SET
+        return kind, game_set
+
+    @staticmethod
+    def _line_after(text, pos):
+        """Return (stripped line starting at pos + 1, end offset) - the legacy next-line lookup"""
+        line_start = pos + 1
+        line_end = text.find('\n', line_start)
+        if line_end == -1:
+            line_end = len(text)
+        return text[line_start:line_end].strip(), line_end
+
+    @staticmethod
+    def _linear_slot_row(i, lines, kinds, bucket, rules, hits=None):
+        """One step of the slot-row state machine: the first of rules to claim line i wins.
+
+        rules are slot-row rule methods (Patterns 0b, 0c, 0, 0a) in the order
+        to try them; hits, if given, counts each rule's claims by name.
+        Returns the index of the next line the state machine should look at.
+        """
+        for name, rule in rules:
+            step = rule(i, lines, kinds, bucket)
+            if step:
+                if hits is not None:
+                    hits[name] = hits.get(name, 0) + 1
+                return step
+        return i + 1
+
+    def _slot_row_0b(self, i, lines, kinds, bucket):
+        """Pattern 0b (Theoden case): no '#' on the first line, bare quantity next"""
+        kind = kinds[i]
+        if kind & TOKEN_HASH or not kind & TOKEN_DASH or i + 2 >= len(lines) or not kinds[i + 1] & TOKEN_QTY:
+            return None
+        match_0b = PATTERNS['0b'].match(lines[i])
+        if not match_0b:
+            return None
+        match_collector = PATTERNS['collector_rarity_cond'].match(lines[i + 2])
+        if not match_collector:
+            return None
+        card_name = match_0b.group(1).strip()
+        set_name_part1 = match_0b.group(3).strip()
+        collector_num = match_collector.group(1).strip()
+        condition_and_set = match_collector.group(3).strip()
+
+        parts = condition_and_set.split(None, 2)
+        if len(parts) == 3 and ('of' in parts[2] or len(parts[2]) > 10):
+            condition = f"{parts[0]} {parts[1]}".strip()
+            set_name = f"{set_name_part1} {parts[2]}".strip()
+        else:
+            condition = condition_and_set
+            set_name = set_name_part1
+
+        bucket.append(CardRecord(
+            name=card_name,
+            quantity=int(lines[i + 1]),
+            condition=condition,
+            set_name=set_name,
+            collector_number=collector_num,
+            rarity=match_collector.group(2).strip(),
+            seen_key=(card_name, collector_num, condition)
+        ))
+        return i + 3
+
+    def _slot_row_0c(self, i, lines, kinds, bucket):
+        """Pattern 0c (Squirtle case): first line ends with a hyphen"""
+        P = PATTERNS
+        if not kinds[i] & TOKEN_DASH_END or i + 2 >= len(lines):
+            return None
+        match_0c = P['0c'].match(lines[i])
+        if not match_0c:
+            return None
+        match_qty = P['qty_game_set'].match(lines[i + 1])
+        match_collector = P['collector_rarity_cond'].match(lines[i + 2])
+        if not (match_qty and match_collector):
+            return None
+        card_name = match_0c.group(1).strip()
+        collector_num = match_collector.group(1).strip()
+        condition = match_collector.group(3).strip()
+        bucket.append(CardRecord(
+            name=card_name,
+            quantity=int(match_qty.group(1)),
+            condition=condition,
+            set_name=match_qty.group(3).strip(),
+            collector_number=collector_num,
+            rarity=match_collector.group(2).strip(),
+            seen_key=(card_name, collector_num, condition)
+        ))
+        return i + 3
+
+    def _slot_row_0(self, i, lines, kinds, bucket):
+        """Pattern 0 (full format) with optional condition continuation"""
+        P = PATTERNS
+        n = len(lines)
+        if not kinds[i] & TOKEN_HASH or i + 1 >= n:
+            return None
+        match_card = P['0'].match(lines[i])
+        if not match_card:
+            return None
+        match_qty = P['qty_game_set'].match(lines[i + 1])
+        if not match_qty:
+            return None
+        card_name = match_card.group(1).strip()
+        collector_num = match_card.group(2).strip()
+        condition = match_card.group(4).strip()
+        step = 2
+        if i + 2 < n:
+            third_line = lines[i + 2]
+            if len(third_line) < 30 and not P['next_header'].match(third_line):
+                condition = f"{condition} {third_line}".strip()
+                step = 3
+        bucket.append(CardRecord(
+            name=card_name,
+            quantity=int(match_qty.group(1)),
+            condition=condition,
+            set_name=match_qty.group(3).strip(),
+            collector_number=collector_num,
+            rarity=match_card.group(3).strip(),
+            seen_key=(card_name, collector_num, condition)
+        ))
+        return i + step
+
+    def _slot_row_0a(self, i, lines, kinds, bucket):
+        """Pattern 0a (Lightning case): condition completed on the third line"""
+        P = PATTERNS
+        if not kinds[i] & TOKEN_HASH or i + 2 >= len(lines):
+            return None
+        match_0a = P['0a'].match(lines[i])
+        if not match_0a:
+            return None
+        third_line = lines[i + 2]
+        match_qty = P['qty_game_set'].match(lines[i + 1])
+        if not match_qty or P['next_header'].match(third_line):
+            return None
+        card_name = match_0a.group(1).strip()
+        collector_num = match_0a.group(2).strip()
+        condition_part1 = match_0a.group(4).strip()
+        condition = f"{condition_part1} {third_line}".strip() if condition_part1 else third_line
+        bucket.append(CardRecord(
+            name=card_name,
+            quantity=int(match_qty.group(1)),
+            condition=condition,
+            set_name=match_qty.group(3).strip(),
+            collector_number=collector_num,
+            rarity=match_0a.group(3).strip(),
+            seen_key=(card_name, collector_num, condition)
+        ))
+        return i + 3
+
+    def _linear_emit_bin(self, family, match, text, bucket):
+        """Emit a Pattern 1 (Bin with collector) or Pattern 3 (Bin without collector) card"""
+        P = PATTERNS
+        if family == '1':
+            next_line, _ = self._line_after(text, match.end())
+            condition = match.group(5).strip()
+            set_name = ""
+            m_line = P['inline_word_game_set'].match(condition)
+            if m_line:
+                condition = m_line.group(1).strip()
+                set_name = m_line.group(2).strip()
+            elif next_line and not next_line.startswith('Bin') and not P['leading_qty'].match(next_line):
+                m_next = P['word_game_set'].match(next_line)
+                set_name = m_next.group(1).strip() if m_next else next_line
+            bucket.append(CardRecord(
+                name=match.group(2).strip(),
+                quantity=int(match.group(1)),
+                condition=condition,
+                set_name=set_name,
+                collector_number=match.group(3).strip(),
+                rarity=match.group(4).strip(),
+                seen_key=(match.group(2), match.group(3), condition)
+            ))
+            return
+
+        if ' - #' in match.group(2):
+            return
+        condition = match.group(4).strip()
+        set_name = ""
+        m_line = P['inline_word_game_set'].match(condition)
+        if m_line:
+            condition = m_line.group(1).strip()
+            set_name = m_line.group(2).strip()
+        bucket.append(CardRecord(
+            name=match.group(2).strip(),
+            quantity=int(match.group(1)),
+            condition=condition,
+            set_name=set_name,
+            collector_number='',
+            rarity=match.group(3).strip(),
+            seen_key=(match.group(2), set_name, condition)
+        ))
+
+    def _linear_emit_split(self, family, match, text, bucket):
+        """Emit a split-row card (Patterns 4, 5, 5b, 6): header line, Bin line, condition tail"""
+        P = PATTERNS
+        next_line, next_line_end = self._line_after(text, match.end())
+        bin_pattern = {'4': 'bin_game_set', '5': 'bin_game_set', '5b': 'bin_game_set_any', '6': 'bin_qty'}[family]
+        bin_match = P[bin_pattern].match(next_line)
+        if not bin_match:
+            return
+        third_line, _ = self._line_after(text, next_line_end)
+        set_name = bin_match.group(2).strip() if family != '6' else ''
+
+        if family == '4':
+            condition_part1 = match.group(4).strip()
+            if (third_line and not third_line.startswith('Bin') and not P['leading_digits'].match(third_line)
+                    and len(third_line.split()) <= 2):
+                condition = f"{condition_part1} {third_line}"
+            else:
+                condition = condition_part1
+        elif family == '5':
+            condition = third_line
+        elif family == '5b':
+            condition_part1 = match.group(4).strip()
+            if third_line and not third_line.startswith('Bin'):
+                condition = f"{condition_part1} {third_line}".strip()
+            else:
+                condition = condition_part1
+        else:
+            # Pattern 6: third line holds the rest of the condition, then the set tail
+            additional_condition_tokens = []
+            set_tail_tokens = []
+            for token in third_line.split():
+                clean = P['non_alpha'].sub('', token.lower())
+                if clean in VOCABULARY.CONDITION_TOKENS and not set_tail_tokens:
+                    additional_condition_tokens.append(token)
+                else:
+                    set_tail_tokens.append(token)
+            condition = ' '.join([match.group(4).strip()] + additional_condition_tokens).strip()
+            set_name = match.group(5).strip()
+            if set_tail_tokens:
+                set_name = f"{set_name} {' '.join(set_tail_tokens)}".strip()
+
+        bucket.append(CardRecord(
+            name=match.group(1).strip(),
+            quantity=int(bin_match.group(1)),
+            condition=condition.strip() if family == '5' else condition,
+            set_name=set_name,
+            collector_number=match.group(2).strip(),
+            rarity=match.group(3).strip(),
+            seen_key=(match.group(1), match.group(2), condition)
+        ))
+
+    def _linear_pattern_8(self, i, lines, game_sets, bucket):
+        """Pattern 8: card row whose "<Game> - <Set>" sits on an adjacent line"""
+        P = PATTERNS
+        line = lines[i]
+        m = P['8'].match(line) or P['8_no_hash'].match(line)
+        if not m:
+            return
+        qty, name, col, rarity, condition = m.groups()
+        set_name = ''
+        if i - 1 >= 0 and game_sets[i - 1]:
+            set_name = game_sets[i - 1].group(2).strip()
+        if not set_name and i + 1 < len(lines) and game_sets[i + 1]:
+            set_name = game_sets[i + 1].group(2).strip()
+        # A rarity-looking 'col' means there is no collector number on this row
+        mapped_rarity = VOCABULARY.rarity_for(col)
+        if mapped_rarity:
+            set_name = set_name or condition.strip()
+            condition = rarity
+            rarity = mapped_rarity
+            col = ''
+        condition = condition.strip()
+        m_inline = P['inline_game_set'].match(condition)
+        if m_inline:
+            condition = m_inline.group(1).strip()
+            set_name = m_inline.group(2).strip()
+        condition = VOCABULARY.strip_trailing_game(condition)
+        if set_name:
+            set_name = P['game_prefix'].sub("", set_name).strip()
+        bucket.append(CardRecord(
+            name=name.strip(),
+            quantity=int(qty),
+            condition=condition,
+            set_name=set_name,
+            collector_number=col.strip(),
+            rarity=rarity.strip(),
+            seen_key=(name, col, condition)
+        ))
+
+    def _linear_header_stitch(self, i, lines, bucket):
+        """Header-stitch fallback: join header-like lines to the following game-set and condition lines"""
+        P = PATTERNS
+        n = len(lines)
+        line = lines[i]
+        name = col = rarity = None
+        condition = ''
+        qty = 1
+        set_name = ''
+        hm = P['header_like_any'].match(line)
+        if hm:
+            name, col, rarity = hm.groups()
+        elif line[-1] == '-':
+            frag = P['header_fragment'].match(line)
+            if frag:
+                name_part, code_prefix = frag.groups()
+                for k in range(i + 1, min(i + 6, n)):
+                    contm = P['code_continue'].match(lines[k])
+                    if contm:
+                        code_suffix, rarity_word, maybe_cond = contm.groups()
+                        name = name_part
+                        col = f"{code_prefix}{code_suffix}".replace(' ', '')
+                        rarity = rarity_word
+                        if maybe_cond:
+                            condition = maybe_cond.strip()
+                        break
+        if not name or not col or not rarity:
+            return
+        if i + 1 < n:
+            nxt = lines[i + 1]
+            m_slot = P['slot_qty_set'].match(nxt)
+            m_simple = P['qty_set'].match(nxt)
+            m_game = P['game_line'].match(nxt)
+            if m_slot:
+                qty = int(m_slot.group(1)); set_name = m_slot.group(2).strip()
+            elif m_simple:
+                qty = int(m_simple.group(1)); set_name = m_simple.group(2).strip()
+            elif m_game:
+                set_name = m_game.group(2).strip()
+        if not condition:
+            for k in range(i + 1, min(i + 4, n)):
+                hy = P['hyphen_cont'].match(lines[k])
+                if hy:
+                    condition = hy.group(1).strip()
+                    break
+        if set_name:
+            set_name = P['game_prefix'].sub("", set_name).strip()
+        condition = condition.strip()
+        bucket.append(CardRecord(
+            name=name.strip(),
+            quantity=int(qty),
+            condition=condition,
+            set_name=set_name,
+            collector_number=col.strip(),
+            rarity=rarity.strip(),
+            seen_key=(name, col, condition)
+        ))
+
+    def _linear_ygo_backlink(self, i, lines, game_set, bucket):
+        """YGO back-link fallback: attach a "<Game> - <Set>" line to the header above it"""
+        P = PATTERNS
+        n = len(lines)
+        set_name = game_set.group(2).strip()
+        name = col = rarity = None
+        for j in range(i - 1, max(i - 5, -1), -1):
+            mhead = P['header_like'].match(lines[j])
+            if mhead:
+                name, col, rarity = mhead.groups()
+                break
+        if name is None:
+            # Reconstruct a split header: "... - #DOOD-" above, "EN085 - Common - ..." below
+            for j in range(i - 1, max(i - 6, -1), -1):
+                frag = P['header_fragment'].match(lines[j])
+                if not frag:
+                    continue
+                name_part, code_prefix = frag.groups()
+                cont_match = None
+                for k in range(i + 1, min(i + 6, n)):
+                    cont_match = P['code_continue'].match(lines[k])
+                    if cont_match:
+                        break
+                if cont_match:
+                    code_suffix, rarity_word, _ = cont_match.groups()
+                    name = name_part
+                    col = f"{code_prefix}-{code_suffix}".replace(' ', '').replace('--', '-')
+                    rarity = rarity_word
+                    break
+            if name is None:
+                return
+        condition = ''
+        for k in range(i + 1, min(i + 3, n)):
+            cont = P['hyphen_cont'].match(lines[k])
+            if cont:
+                condition = cont.group(1).strip()
+                break
+        set_name = P['game_prefix'].sub("", set_name).strip()
+        bucket.append(CardRecord(
+            name=name.strip(),
+            quantity=1,
+            condition=condition.strip(),
+            set_name=set_name,
+            collector_number=col.strip(),
+            rarity=rarity.strip(),
+            seen_key=(name, col, condition)
+        ))
+
+    def _linear_pattern_9(self, i, lines, bucket):
+        """Pattern 9: header without quantity; quantity and game-set on the next line"""
+        P = PATTERNS
+        n = len(lines)
+        line = lines[i]
+        m = P['9'].match(line) or P['9_no_hash'].match(line)
+        if m:
+            name, col, rarity, condition = m.groups()
+        else:
+            m3 = P['9_minimal'].match(line)
+            if not m3:
+                return
+            name, col, rarity = m3.groups()
+            condition = ''
+        qty = 1
+        set_name = ''
+
+        m_inline = P['inline_game_set'].match(condition.strip())
+        if m_inline:
+            condition = m_inline.group(1).strip()
+            set_name = m_inline.group(2).strip()
+
+        mapped_rarity = VOCABULARY.rarity_for(col, VOCABULARY.RARITY_CODES_WITH_LANDS)
+        if mapped_rarity:
+            if not set_name:
+                set_name = condition.strip()
+            condition = rarity.strip()
+            rarity = mapped_rarity
+            col = ''
+
+        if not set_name and i + 1 < n:
+            nxt = lines[i + 1]
+            m_slot = P['slot_qty_set'].match(nxt)
+            m_simple = P['qty_set'].match(nxt)
+            m_game = P['game_line'].match(nxt)
+            if m_slot:
+                qty = int(m_slot.group(1))
+                set_name = m_slot.group(2).strip()
+            elif m_simple:
+                qty = int(m_simple.group(1))
+                set_name = m_simple.group(2).strip()
+            elif m_game:
+                set_name = m_game.group(2).strip()
+        if i + 2 < n:
+            nxt2 = lines[i + 2]
+            cont = P['hyphen_cont'].match(nxt2)
+            if cont and not condition:
+                condition = cont.group(1).strip()
+            if nxt2.lower() == 'foil' and 'foil' not in condition.lower():
+                condition = (condition + ' Foil').strip()
+            if set_name and ' - ' not in nxt2 and nxt2.lower() != 'foil' and not P['digit'].search(nxt2) and len(nxt2) <= 20:
+                set_name = (set_name + ' ' + nxt2).strip()
+
+        condition = condition.strip()
+        condition = VOCABULARY.strip_trailing_game(condition)
+        if set_name:
+            set_name = P['game_prefix'].sub("", set_name).strip()
+        bucket.append(CardRecord(
+            name=name.strip(),
+            quantity=int(qty),
+            condition=condition,
+            set_name=set_name,
+            collector_number=col.strip(),
+            rarity=rarity.strip(),
+            seen_key=(name, col, condition)
+        ))
+
+    @staticmethod
+    def _select_best_cards(cards):
+        """Strip leaked quantities from names and keep the best entry per name+collector#"""
+        if not cards:
+            return cards
+        leading_qty = PATTERNS['leading_qty']
+        for card in cards:
+            card.strip_leading_qty(leading_qty)
+
+        best = {}
+        for card in cards:
+            key = card.best_key
+            current = best.get(key)
+            if current is None or card.score > current.score:
+                best[key] = card
+        return list(best.values())
+
+
+PARSER = OrderParser()
+
+
+def parse_orders(pdf, engine=None, workers=None, backend=None, timer=None, order_numbers=None, page_range=None):
+    """Parse a TCGplayer Direct PDF given as bytes, a file path or a binary file.
+
+    Returns the list of order dicts the /api/parse endpoint sends; no HTTP,
+    base64 or caching is involved. Pass a StageTimer to collect stage timings,
+    and order_numbers and/or a 1-based (first, last) page_range to parse only
+    those orders (see OrderParser.iter_selected_orders).
+    """
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, 'rb') as f:
+            return parse_orders(f, engine, workers, backend, timer, order_numbers, page_range)
+    if order_numbers is not None or page_range is not None:
+        return list(PARSER.iter_selected_orders(pdf, order_numbers, page_range, engine, backend, timer))
+    return PARSER.parse_pdf(pdf, engine, workers, backend, timer)
+
+
+def parse_page_range(value):
+    """(first, last) from "3-7", "5", [3, 7] or 5; raises ValueError unless 1 <= first <= last"""
+    if isinstance(value, str):
+        first, _, last = value.partition('-')
+        value = (first, last or first)
+    elif isinstance(value, int):
+        value = (value, value)
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(value)
+    first, last = int(value[0]), int(value[1])
+    if not 1 <= first <= last:
+        raise ValueError(value)
+    return first, last
+
+
+# Batch requests ({"pdfs": {"<id>": "<base64>", ...}}): at most BATCH_MAX_PDFS per
+# request, parsed by up to BATCH_WORKERS forked processes (0 = one per CPU, 1 = serial)
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', '0'))
+BATCH_MAX_PDFS = int(os.environ.get('BATCH_MAX_PDFS', '20'))
+
+
+def _parse_batch_worker(conn, pdf_bytes, engine, backend):
+    """Process entry point: send ('ok', (orders, pages)) or ('error', message) back to the parent"""
+    try:
+        pages_before = PAGES_PARSED.value()
+        orders = PARSER.parse_pdf(pdf_bytes, engine, 1, backend)
+        conn.send(('ok', (orders, PAGES_PARSED.value() - pages_before)))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+        flush_pattern_profile()  # multiprocessing ends the worker with os._exit
+
+
+def iter_batch_parallel(jobs, workers, engine=None, backend=None):
+    """Parse (key, pdf_bytes) jobs in forked workers, yielding (key, status, payload) as each finishes.
+
+    At most `workers` processes run at once; a new one starts as soon as one
+    finishes, so a slow PDF doesn't hold up the rest of the batch. Results
+    come back in completion order. Like iter_pages_parallel this uses a Pipe
+    per worker instead of a multiprocessing.Pool (no /dev/shm on Vercel).
+    """
+    import multiprocessing
+    from multiprocessing.connection import wait
+    
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    pending = list(reversed(jobs))
+    running = {}  # receiving end of the pipe -> (key, process)
+    
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                key, pdf_bytes = pending.pop()
+                recv_conn, send_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(target=_parse_batch_worker, args=(send_conn, pdf_bytes, engine, backend),
+                                   daemon=True)
+                proc.start()
+                send_conn.close()
+                running[recv_conn] = (key, proc)
+            
+            for recv_conn in wait(list(running)):
+                key, proc = running.pop(recv_conn)
+                try:
+                    status, payload = recv_conn.recv()
+                except EOFError:
+                    status, payload = 'error', f"Worker exited with code {proc.exitcode}"
+                recv_conn.close()
+                proc.join()
+                yield key, status, payload
+    finally:
+        for recv_conn, (key, proc) in running.items():
+            recv_conn.close()
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+
+
+def parse_batch(pdfs, engine=None, backend=None, workers=None, use_cache=True):
+    """Parse several PDFs given as {id: bytes}; one failing PDF never fails the others.
+
+    Returns {id: result}, each result either {'success': True, 'orders': [...],
+    'totalOrders': n, 'cache': <X-Parse-Cache value>} or {'success': False,
+    'error': message}. Cached PDFs are answered without parsing and identical
+    PDFs in one batch are parsed once.
+    """
+    engine = engine or CARD_ENGINE
+    backend = backend or default_backend(engine)
+    if workers is None:
+        workers = BATCH_WORKERS
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    
+    results = {}
+    misses = OrderedDict()  # digest -> (pdf bytes, ids sharing it, cache key)
+    for item_id, pdf_bytes in pdfs.items():
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        if digest in misses:
+            misses[digest][1].append(item_id)
+            continue
+        cache_key = ParseCache.key_for(digest, engine, backend) if PARSE_CACHE and use_cache else None
+        orders, cache_status = handler.cache_get(cache_key)
+        if orders is not None:
+            results[item_id] = {'success': True, 'orders': orders, 'totalOrders': len(orders),
+                                'cache': handler.cache_status_label(cache_key, cache_status)}
+            continue
+        misses[digest] = (pdf_bytes, [item_id], cache_key)
+    
+    def finish(digest, status, payload):
+        pdf_bytes, item_ids, cache_key = misses.pop(digest)
+        if status == 'ok':
+            handler.cache_put(cache_key, payload)
+            result = {'success': True, 'orders': payload, 'totalOrders': len(payload),
+                      'cache': handler.cache_status_label(cache_key, None)}
+        else:
+            PARSE_ERRORS.inc()
+            result = {'success': False, 'error': f"Error parsing PDF: {payload}"}
+        for item_id in item_ids:
+            results[item_id] = result
+    
+    jobs = [(digest, pdf_bytes) for digest, (pdf_bytes, item_ids, cache_key) in misses.items()]
+    if workers > 1 and len(jobs) > 1:
+        try:
+            for digest, status, payload in iter_batch_parallel(jobs, min(workers, len(jobs)), engine, backend):
+                # The worker's counters die with it, so count its work here
+                PDFS_PARSED.inc()
+                if status == 'ok':
+                    orders, pages = payload
+                    PAGES_PARSED.inc(pages)
+                    ORDERS_PARSED.inc(len(orders))
+                    CARDS_PARSED.inc(sum(len(order['cards']) for order in orders))
+                    payload = orders
+                finish(digest, status, payload)
+        except OSError:
+            pass  # No process support in this sandbox - parse what is left serially
+    
+    for digest in list(misses):
+        try:
+            finish(digest, 'ok', PARSER.parse_pdf(misses[digest][0], engine, 1, backend))
+        except Exception as e:
+            finish(digest, 'error', str(e))
+    
+    return {item_id: results[item_id] for item_id in pdfs}
+
+
+# Async jobs ("async": true): the upload is stored in the job store from _jobs.py
+# and parsed by JOB_RUNNER - 'fork' (a detached process per job), 'thread', or
+# 'external' (left queued for tools/job_worker.py). Progress is written at most
+# every JOB_PROGRESS_SECONDS.
+JOB_RUNNER = os.environ.get('JOB_RUNNER', 'fork')
+JOB_PROGRESS_SECONDS = float(os.environ.get('JOB_PROGRESS_SECONDS', '1'))
+JOB_STORE_INSTANCE = None
+
+
+def job_store():
+    """The configured JobStore, created on first use so sync-only instances never touch it"""
+    global JOB_STORE_INSTANCE
+    if JOB_STORE_INSTANCE is None:
+        try:
+            from _jobs import load_job_store
+        except ImportError:
+            from api._jobs import load_job_store
+        JOB_STORE_INSTANCE = load_job_store()
+    return JOB_STORE_INSTANCE
+
+
+def run_job(store, job, pdf_bytes):
+    """Parse a claimed job's PDF, writing progress to the store, then record the orders or the error"""
+    options = job['options']
+    engine = options.get('engine')
+    backend = options.get('backend') or default_backend(engine)
+    orders = []
+    pages = 0
+    last_report = perf_counter()
+    
+    def on_page(pages_done):
+        nonlocal pages, last_report
+        pages = pages_done
+        if perf_counter() - last_report >= JOB_PROGRESS_SECONDS:
+            store.progress(job['id'], pages_extracted=pages, orders_parsed=len(orders))
+            last_report = perf_counter()
+    
+    try:
+        extractor = EXTRACT_BACKENDS[backend]
+        with extractor.open(pdf_bytes) as document:
+            store.progress(job['id'], pages_total=extractor.page_count(document))
+        for order in PARSER.iter_orders(pdf_bytes, engine, options.get('workers'), backend, on_page=on_page):
+            orders.append(order)
+        if PARSE_CACHE and options.get('cache', True):
+            handler.cache_put(ParseCache.key_for(pdf_digest(pdf_bytes), engine or CARD_ENGINE, backend), orders)
+        store.progress(job['id'], pages_extracted=pages)
+        store.finish(job['id'], orders)
+    except Exception as e:
+        PARSE_ERRORS.inc()
+        store.fail(job['id'], f"Error parsing PDF: {str(e)}")
+
+
+def work_job(job_id=None):
+    """Claim a queued job (the given one, or the oldest) and run it; False when there was none"""
+    store = job_store()
+    claimed = store.claim(job_id)
+    if claimed is None:
+        return False
+    run_job(store, *claimed)
+    return True
+
+
+def work_jobs(job_id=None):
+    """Run the given job, then every other queued one until the queue is empty.
+
+    Under fork and thread nothing else claims a job that was queued again
+    after its worker died, so each worker drains the queue before it exits.
+    """
+    work_job(job_id)
+    while work_job():
+        pass
+
+
+def restart_stalled_job(job, close_in_child=()):
+    """Start a worker for a job no worker has touched for JOB_STALE_SECONDS (not under 'external').
+
+    claim() queues a stale running job again before claiming it, so a job
+    whose worker died is picked up by the next status poll.
+    """
+    try:
+        from _jobs import JOB_STALE_SECONDS
+    except ImportError:
+        from api._jobs import JOB_STALE_SECONDS
+    if JOB_RUNNER == 'external' or job['status'] not in ('queued', 'running'):
+        return False
+    if time() - job['updatedAt'] < JOB_STALE_SECONDS:
+        return False
+    start_job(job['id'], close_in_child)
+    return True
+
+
+def start_job(job_id, close_in_child=()):
+    """Run a submitted job in the background according to JOB_RUNNER.
+
+    'fork' double-forks so the worker is reparented away from the server and
+    never left as a zombie; the worker closes the inherited client socket
+    (close_in_child) so the response isn't held open until the parse ends.
+    Either way the worker goes on to any other queued jobs (work_jobs).
+    """
+    if JOB_RUNNER == 'external':
+        return
+    if JOB_RUNNER == 'fork' and hasattr(os, 'fork'):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                if os.fork() == 0:
+                    for sock in close_in_child:
+                        sock.close()
+                    work_jobs(job_id)
+                    flush_pattern_profile()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        return
+    threading.Thread(target=work_jobs, args=(job_id,), daemon=True).start()
+
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Handle PDF upload and parsing"""
+        self.request_start = perf_counter()
+        pdf_source = None
+        try:
+            # Read request body: raw PDF, multipart form, or JSON with a base64 'pdf' field
+            content_length = self.headers.get('Content-Length')
+            if content_length is None:
+                self.send_error_response(411, "Content-Length header is required")
+                return
+            content_length = int(content_length)
+            content_type = self.headers.get('Content-Type') or ''
+            media_type = content_type.split(';', 1)[0].strip().lower()
+            digest = None
+            batch = None
+            
+            try:
+                if media_type in ('application/pdf', 'application/octet-stream'):
+                    # Options come from the query string, e.g. /api/parse?engine=linear
+                    options = self.query_options()
+                    if content_length:
+                        pdf_source, digest = spool_upload(iter_body_chunks(self.rfile, content_length))
+                    
+                elif media_type == 'multipart/form-data':
+                    boundary = MULTIPART_BOUNDARY.search(content_type)
+                    if not boundary:
+                        self.send_error_response(400, "Missing multipart boundary in Content-Type")
+                        return
+                    boundary = (boundary.group(1) or boundary.group(2)).encode('latin-1')
+                    options = self.query_options()
+                    pdf_source, digest, fields = spool_multipart(iter_body_chunks(self.rfile, content_length), boundary)
+                    options.update(self.coerce_options(fields))
+                    
+                else:
+                    # Parse JSON body
+                    options = json.loads(self.rfile.read(content_length).decode('utf-8'))
+                    if not isinstance(options, dict):
+                        self.send_error_response(400, "Request body must be a JSON object")
+                        return
+                    pdf_base64 = options.get('pdf')
+                    batch = options.get('pdfs')
+                    if pdf_base64 is not None and not isinstance(pdf_base64, str):
+                        self.send_error_response(400, "'pdf' must be a base64 string")
+                        return
+                    
+                    # Decode base64 PDF
+                    pdf_source = base64.b64decode(pdf_base64) if pdf_base64 else None
+                
+                if batch is not None:
+                    if not isinstance(batch, dict) or not batch:
+                        self.send_error_response(400, "'pdfs' must be an object mapping ids to base64 PDFs")
+                        return
+                    if len(batch) > BATCH_MAX_PDFS:
+                        self.send_error_response(400, f"Too many PDFs in one batch ({len(batch)}, limit {BATCH_MAX_PDFS})")
+                        return
+                    
+                elif not pdf_source:
+                    self.send_error_response(400, "Missing 'pdf' field in request body")
+                    return
+                
+                # Checked before use: a list or object here would fail as an unhashable lookup
+                for name in ('engine', 'backend'):
+                    if options.get(name) is not None and not isinstance(options[name], str):
+                        self.send_error_response(400, f"'{name}' must be a string")
+                        return
+                
+                engine = options.get('engine') or CARD_ENGINE
+                workers = options.get('workers')
+                backend = options.get('backend') or default_backend(engine)
+                use_cache = options.get('cache', True) is not False
+                compact = options.get('compact', False) is True
+                timings = options.get('timings', PARSE_TIMINGS) is True
+                run_async = options.get('async', False) is True
+                order_numbers = options.get('orderNumbers')
+                page_range = options.get('pages')
+                selective = order_numbers is not None or page_range is not None
+                include_index = options.get('index', False) is True or selective
+                
+                if engine not in CARD_ENGINES:
+                    self.send_error_response(400, f"Unknown engine '{engine}' (expected one of: {', '.join(CARD_ENGINES)})")
+                    return
+                
+                if workers is not None and (not isinstance(workers, int) or workers < 0):
+                    self.send_error_response(400, "'workers' must be a non-negative integer")
+                    return
+                
+                if backend not in EXTRACT_BACKENDS:
+                    self.send_error_response(400, f"Unknown backend '{backend}' (expected one of: {', '.join(EXTRACT_BACKENDS)})")
+                    return
+                
+                if engine == 'layout' and backend != 'layout':
+                    self.send_error_response(400, "Engine 'layout' reads word positions and needs backend 'layout'")
+                    return
+                
+                if batch is not None and run_async:
+                    self.send_error_response(400, "'async' is not supported for batch requests")
+                    return
+                
+                if order_numbers is not None and (not isinstance(order_numbers, list)
+                                                  or not all(isinstance(number, str) for number in order_numbers)):
+                    self.send_error_response(400, "'orderNumbers' must be a list of order numbers")
+                    return
+                
+                if page_range is not None:
+                    try:
+                        page_range = parse_page_range(page_range)
+                    except (TypeError, ValueError):
+                        self.send_error_response(400, "'pages' must be a page or page range like \"3-7\" (1-based)")
+                        return
+                
+            except json.JSONDecodeError:
+                self.send_error_response(400, "Invalid JSON in request body")
+                return
+            except Exception as e:
+                self.send_error_response(400, f"Error decoding PDF: {str(e)}")
+                return
+            
+            # Check if the extraction backend's library is available
+            if not EXTRACT_BACKENDS[backend].available():
+                self.send_error_response(500, f"{backend} not installed")
+                return
+            
+            if batch is not None:
+                self.send_batch(batch, engine, workers, backend, use_cache, compact)
+                return
+            
+            if run_async:
+                self.submit_job(pdf_source, digest, engine, workers, backend, use_cache)
+                return
+            
+            # Parse PDF, counting pattern activity for this request only
+            patterns_before = PATTERNS.snapshot()
+            timer = StageTimer() if timings else None
+            cache_key = None
+            # Selective parses hold only some orders, so they neither use nor fill the cache
+            if PARSE_CACHE and use_cache and not selective:
+                cache_key = ParseCache.key_for(digest or pdf_digest(pdf_source), engine, backend)
+            
+            # Stream one order per line when the client asks for NDJSON
+            if 'application/x-ndjson' in (self.headers.get('Accept') or '') and not include_index:
+                self.stream_orders(pdf_source, engine, workers, backend, patterns_before, cache_key, compact, timer)
+                return
+            
+            index = None
+            if include_index:
+                index_start = perf_counter()
+                index = scan_order_index(pdf_source)
+                if timer:
+                    timer.add('index', perf_counter() - index_start)
+            
+            orders, cache_status = self.cache_get(cache_key, timer)
+            if selective:
+                orders = list(PARSER.iter_selected_orders(pdf_source, order_numbers, page_range, engine, backend,
+                                                          timer, index))
+            elif orders is None:
+                orders = PARSER.parse_pdf(pdf_source, engine, workers, backend, timer)
+                self.cache_put(cache_key, orders, timer)
+            
+            # Return JSON response
+            if timer:
+                encode_start = perf_counter()
+            if compact:
+                response = {
+                    'success': True,
+                    'orders': [compact_order(order) for order in orders],
+                    'totalOrders': len(orders)
+                }
+                response.update(self.index_fields(index, order_numbers, orders))
+                if timer:
+                    response['timings'] = timer.report(patterns_before)
+                body = json.dumps(response, separators=COMPACT_SEPARATORS).encode('utf-8')
+            else:
+                total_debug = {
+                    'patterns': PATTERNS.stats(since=patterns_before),
+                    'cache': self.cache_debug(cache_key, cache_status)
+                }
+                
+                response = {
+                    'success': True,
+                    'orders': orders,
+                    'totalOrders': len(orders),
+                    'debug': total_debug
+                }
+                response.update(self.index_fields(index, order_numbers, orders))
+                if timer:
+                    response['timings'] = timer.report(patterns_before)
+                body = json.dumps(response).encode('utf-8')
+            
+            gzipped = self.accepts_gzip() and len(body) >= GZIP_MIN_BYTES
+            if gzipped:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('X-Parse-Cache', self.cache_status_label(cache_key, cache_status))
+            self.send_header('Vary', 'Accept-Encoding')
+            if gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            if timer:
+                self.send_header('Server-Timing', timer.server_timing(encode=perf_counter() - encode_start))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            
+            self.wfile.write(body)
+            self.count_success(cache_key, cache_status)
+            
+        except Exception as e:
+            PARSE_ERRORS.inc()
+            self.send_error_response(500, f"Internal server error: {str(e)}")
+        finally:
+            if hasattr(pdf_source, 'close'):
+                pdf_source.close()
+    
+    def do_GET(self):
+        """Async job status at GET /api/parse?job=<id>, Prometheus metrics of this instance at ?metrics"""
+        query = dict(parse_qsl(urlsplit(self.path).query, keep_blank_values=True))
+        if 'job' in query:
+            try:
+                self.send_job(query['job'], self.coerce_options(query).get('compact', False))
+            except Exception as e:
+                self.send_error_response(500, f"Internal server error: {str(e)}")
+            return
+        if 'metrics' not in query:
+            self.send_error_response(404, "POST a PDF to parse it, GET ?job=<id> for an async job, or GET ?metrics for metrics")
+            return
+        send_metrics(self)
+    
+    def submit_job(self, pdf_source, digest, engine, workers, backend, use_cache):
+        """Store the upload as an async job, start its worker and answer 202 with the job id.
+
+        A PDF already in the parse cache becomes a finished job straight away.
+        """
+        if not isinstance(pdf_source, (bytes, bytearray)):
+            pdf_source.seek(0)
+            pdf_source = pdf_source.read()
+        store = job_store()
+        job_id = store.create(pdf_source, {'engine': engine, 'backend': backend, 'workers': workers, 'cache': use_cache})
+        
+        cache_key = None
+        if PARSE_CACHE and use_cache:
+            cache_key = ParseCache.key_for(digest or pdf_digest(pdf_source), engine, backend)
+        orders, cache_status = self.cache_get(cache_key)
+        if orders is not None and store.claim(job_id):
+            store.finish(job_id, orders)
+        else:
+            start_job(job_id, close_in_child=self.worker_sockets())
+        
+        status_url = f"/api/parse?job={job_id}"
+        body = json.dumps({
+            'success': True,
+            'jobId': job_id,
+            'status': 'done' if orders is not None else 'queued',
+            'statusUrl': status_url
+        }).encode('utf-8')
+        self.send_response(202)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Location', status_url)
+        self.send_header('X-Parse-Cache', self.cache_status_label(cache_key, cache_status))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        
+        self.wfile.write(body)
+        PARSE_REQUESTS.inc(status='202')
+    
+    def worker_sockets(self):
+        """Sockets a forked job worker closes: the client connection, and the listening socket
+        so a job outliving a long-running server doesn't hold its port"""
+        listener = getattr(self.server, 'socket', None)
+        return (self.connection,) + ((listener,) if listener else ())
+    
+    def send_job(self, job_id, compact=False):
+        """Status and progress of an async job, with its orders once done"""
+        job = job_store().get(job_id) if job_id else None
+        if job is None:
+            self.send_error_response(404, f"Unknown or expired job '{job_id}'")
+            return
+        restart_stalled_job(job, close_in_child=self.worker_sockets())
+        
+        response = {
+            'success': job['status'] != 'failed',
+            'jobId': job['id'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'createdAt': job['createdAt'],
+            'updatedAt': job['updatedAt']
+        }
+        if 'orders' in job:
+            response['orders'] = [compact_order(order) for order in job['orders']] if compact else job['orders']
+            response['totalOrders'] = len(job['orders'])
+        if 'error' in job:
+            response['error'] = job['error']
+        body = json.dumps(response, separators=COMPACT_SEPARATORS if compact else None).encode('utf-8')
+        
+        gzipped = self.accepts_gzip() and len(body) >= GZIP_MIN_BYTES
+        if gzipped:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        
+        self.wfile.write(body)
+    
+    def send_batch(self, batch, engine, workers, backend, use_cache, compact):
+        """Parse every PDF of a batch request and send the results keyed by the client's ids.
+
+        The response is 200 whenever the batch itself was valid; each result
+        carries its own success flag, so one bad PDF only fails its own entry.
+        'workers' caps the batch's worker processes here instead of page extraction.
+        """
+        pdfs = {}
+        results = {}
+        for item_id, pdf_base64 in batch.items():
+            try:
+                if not isinstance(pdf_base64, str) or not pdf_base64:
+                    raise ValueError("expected a base64 string")
+                pdfs[item_id] = base64.b64decode(pdf_base64, validate=True)
+            except ValueError as e:
+                results[item_id] = {'success': False, 'error': f"Error decoding PDF: {str(e)}"}
+        results.update(parse_batch(pdfs, engine, backend, workers, use_cache))
+        
+        failed = sum(1 for result in results.values() if not result['success'])
+        response = {
+            'success': True,
+            'results': {item_id: results[item_id] for item_id in batch},
+            'totalPdfs': len(batch),
+            'failedPdfs': failed
+        }
+        if compact:
+            response['results'] = {
+                item_id: {**result, 'orders': [compact_order(order) for order in result['orders']]}
+                if result['success'] else result
+                for item_id, result in response['results'].items()
+            }
+            body = json.dumps(response, separators=COMPACT_SEPARATORS).encode('utf-8')
+        else:
+            body = json.dumps(response).encode('utf-8')
+        
+        gzipped = self.accepts_gzip() and len(body) >= GZIP_MIN_BYTES
+        if gzipped:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        
+        self.wfile.write(body)
+        PARSE_REQUESTS.inc(status='200')
+        PARSE_SECONDS.observe(perf_counter() - self.request_start, cache='batch')
+    
+    @staticmethod
+    def index_fields(index, order_numbers, orders):
+        """Response fields for the order index (1-based pages) and requested orders that weren't found"""
+        fields = {}
+        if index is not None:
+            fields['index'] = [{'orderNumber': number, 'firstPage': first + 1, 'lastPage': last + 1}
+                               for number, first, last in index]
+        if order_numbers is not None:
+            found = {order['orderNumber'] for order in orders}
+            fields['missingOrderNumbers'] = [number for number in order_numbers if number not in found]
+        return fields
+    
+    def count_success(self, cache_key, cache_status):
+        """Record a completed parse request in the metrics"""
+        PARSE_REQUESTS.inc(status='200')
+        PARSE_SECONDS.observe(perf_counter() - self.request_start,
+                              cache=self.cache_status_label(cache_key, cache_status).split('-')[0])
+    
+    def query_options(self):
+        """Parse options from the request query string (used for non-JSON uploads)"""
+        return self.coerce_options(dict(parse_qsl(urlsplit(self.path).query)))
+    
+    @staticmethod
+    def coerce_options(fields):
+        """Convert string form/query values to the types the JSON body would carry"""
+        names = ('engine', 'workers', 'backend', 'cache', 'compact', 'timings', 'async', 'index', 'orderNumbers', 'pages')
+        options = {key: value for key, value in fields.items() if key in names}
+        if options.get('workers', '').isdigit():
+            options['workers'] = int(options['workers'])
+        if 'cache' in options:
+            options['cache'] = options['cache'].lower() not in ('0', 'false', 'no', 'off')
+        if 'orderNumbers' in options:
+            options['orderNumbers'] = [number.strip() for number in options['orderNumbers'].split(',') if number.strip()]
+        for flag in ('compact', 'timings', 'async', 'index'):
+            if flag in options:
+                options[flag] = options[flag].lower() in ('1', 'true', 'yes', 'on')
+        return options
+    
+    def accepts_gzip(self):
+        """True when the Accept-Encoding header allows gzip"""
+        for coding in (self.headers.get('Accept-Encoding') or '').split(','):
+            name, _, params = coding.partition(';')
+            if name.strip().lower() in ('gzip', '*'):
+                return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+        return False
+    
+    def do_OPTIONS(self):
+        """Handle CORS preflight"""
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def stream_orders(self, pdf_source, engine, workers, backend, patterns_before, cache_key=None, compact=False,
+                      timer=None):
+        """Send orders as NDJSON lines using chunked transfer encoding.
+
+        Each order is written as soon as it is complete, followed by a summary
+        line with totalOrders and the pattern counters. An error after the
+        headers are sent is reported as a final {"type": "error"} line. With
+        gzip, the stream is flushed after every line so orders still arrive
+        one at a time. Headers go out before parsing, so timings (if enabled)
+        are reported in the summary line rather than a Server-Timing header.
+        """
+        cached_orders, cache_status = self.cache_get(cache_key, timer)
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if self.accepts_gzip() else None
+        
+        self.protocol_version = 'HTTP/1.1'  # chunked encoding needs HTTP/1.1
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.send_header('X-Parse-Cache', self.cache_status_label(cache_key, cache_status))
+        self.send_header('Vary', 'Accept-Encoding')
+        if compressor:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        
+        orders = cached_orders if cached_orders is not None else PARSER.iter_orders(pdf_source, engine, workers, backend, timer)
+        parsed_orders = [] if cache_key and cached_orders is None else None
+        total_orders = 0
+        try:
+            for order in orders:
+                total_orders += 1
+                self.write_chunk({'type': 'order', **(compact_order(order) if compact else order)},
+                                 compact, compressor)
+                if parsed_orders is not None:
+                    parsed_orders.append(order)
+            if parsed_orders is not None:
+                self.cache_put(cache_key, parsed_orders, timer)
+            summary = {'type': 'summary', 'success': True, 'totalOrders': total_orders}
+            if not compact:
+                summary['debug'] = {
+                    'patterns': PATTERNS.stats(since=patterns_before),
+                    'cache': self.cache_debug(cache_key, cache_status)
+                }
+            if timer:
+                summary['timings'] = timer.report(patterns_before)
+            self.write_chunk(summary, compact, compressor)
+            self.count_success(cache_key, cache_status)
+        except Exception as e:
+            PARSE_ERRORS.inc()
+            PARSE_REQUESTS.inc(status='stream-error')
+            self.write_chunk({'type': 'error', 'success': False, 'error': f"Internal server error: {str(e)}"},
+                             compact, compressor)
+        if compressor:
+            self.write_raw_chunk(compressor.flush())
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+    
+    @staticmethod
+    def cache_get(cache_key, timer=None):
+        """PARSE_CACHE.get for this request's key, or (None, None) when it doesn't use the cache"""
+        if not cache_key:
+            return None, None
+        start = perf_counter()
+        result = PARSE_CACHE.get(cache_key)
+        if timer:
+            timer.add('cache', perf_counter() - start)
+        return result
+    
+    @staticmethod
+    def cache_put(cache_key, orders, timer=None):
+        """Store freshly parsed orders when this request uses the cache"""
+        if not cache_key:
+            return
+        start = perf_counter()
+        PARSE_CACHE.put(cache_key, orders)
+        if timer:
+            timer.add('cache', perf_counter() - start)
+    
+    @staticmethod
+    def cache_status_label(cache_key, cache_status):
+        """X-Parse-Cache value: 'hit-memory', 'hit-disk', 'miss' or 'off'"""
+        if not cache_key:
+            return 'off'
+        return f"hit-{cache_status}" if cache_status else 'miss'
+    
+    def cache_debug(self, cache_key, cache_status):
+        """Cache outcome for this request plus the process-wide cache counters"""
+        debug = {'status': self.cache_status_label(cache_key, cache_status)}
+        if PARSE_CACHE:
+            debug.update(PARSE_CACHE.stats())
+        return debug
+    
+    def write_chunk(self, record, compact=False, compressor=None):
+        """Write one JSON record as an NDJSON line in its own HTTP chunk"""
+        line = json.dumps(record, separators=COMPACT_SEPARATORS if compact else None).encode('utf-8') + b"\n"
+        if compressor:
+            line = compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.write_raw_chunk(line)
+    
+    def write_raw_chunk(self, data):
+        """Write bytes as one HTTP chunk and flush it to the client"""
+        if data:
+            self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+    
+    def send_error_response(self, code, message):
+        """Send error response"""
+        PARSE_REQUESTS.inc(status=str(code))
+        response = {
+            'success': False,
+            'error': message
+        }
+        body = json.dumps(response).encode('utf-8')
+        
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
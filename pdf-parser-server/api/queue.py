@@ -12,15 +12,37 @@ Endpoints:
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-import requests
+from time import perf_counter
+from urllib.parse import urlsplit, parse_qsl
+
+try:
+    from _metrics import REGISTRY as METRICS, send_metrics
+except ImportError:
+    from api._metrics import REGISTRY as METRICS, send_metrics
 
 # Convex deployment URL (set in Vercel environment variables)
 CONVEX_URL = os.environ.get('CONVEX_URL', '')
 
+# Served by GET /api/queue?metrics
+CONVEX_CALLS = METRICS.counter('queue_convex_calls_total', 'Convex calls by function and outcome',
+                               ('function', 'outcome'))
+CONVEX_SECONDS = METRICS.histogram('queue_convex_call_duration_seconds', 'Convex call latency by function',
+                                   ('function',))
+QUEUE_REQUESTS = METRICS.counter('queue_requests_total', 'Queue API requests by action', ('action',))
+
 def call_convex(function_name, args):
-    """Call a Convex function via HTTP API"""
+    """Call a Convex function via HTTP API, recording its outcome and latency"""
+    start = perf_counter()
+    outcome, result = _call_convex(function_name, args)
+    CONVEX_CALLS.inc(function=function_name, outcome=outcome)
+    if outcome != 'unconfigured':
+        CONVEX_SECONDS.observe(perf_counter() - start, function=function_name)
+    return result
+
+def _call_convex(function_name, args):
+    """call_convex without the metrics: returns (outcome, result)"""
     if not CONVEX_URL:
-        return {
+        return 'unconfigured', {
             'success': False,
             'error': 'Convex not configured. Add CONVEX_URL environment variable in Vercel.'
         }
@@ -40,6 +62,9 @@ def call_convex(function_name, args):
             'format': 'json'
         }
 
+        # Imported on first call so CORS preflights and unconfigured deployments skip its import cost
+        import requests
+
         response = requests.post(
             url,
             headers={'Content-Type': 'application/json'},
@@ -51,20 +76,20 @@ def call_convex(function_name, args):
             result = response.json()
             # Convex wraps the result in a 'value' field and status
             if result.get('status') == 'success' and 'value' in result:
-                return result['value']
+                return 'success', result['value']
             elif result.get('status') == 'error':
-                return {
+                return 'convex_error', {
                     'success': False,
                     'error': f"Convex error: {result.get('message', 'Unknown error')}"
                 }
-            return result
+            return 'success', result
         else:
-            return {
+            return 'http_error', {
                 'success': False,
                 'error': f'Convex returned {response.status_code}: {response.text[:200]}'
             }
     except Exception as e:
-        return {
+        return 'exception', {
             'success': False,
             'error': f'Failed to call Convex: {str(e)}'
         }
@@ -113,9 +138,17 @@ def get_queue_status():
         result['convexConfigured'] = True
     return result
 
+# Known POST actions; anything else is counted as 'invalid' to keep metric labels bounded
+QUEUE_ACTIONS = ('tryClaimSQ', 'releaseSQ', 'reserveRefundLogWrite', 'releaseRefundLogWrite', 'getStatus')
+
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
-        """Health check and status endpoint"""
+        """Health check and status endpoint; GET /api/queue?metrics serves this instance's metrics"""
+        if 'metrics' in dict(parse_qsl(urlsplit(self.path).query, keep_blank_values=True)):
+            send_metrics(self)
+            return
+
+        QUEUE_REQUESTS.inc(action='status')
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -137,6 +170,8 @@ class handler(BaseHTTPRequestHandler):
             bot_id = data.get('botId')
             sq_number = data.get('sqNumber')
 
+            QUEUE_REQUESTS.inc(action=action if action in QUEUE_ACTIONS else 'invalid')
+
             if not action:
                 self.send_response(400)
                 self.send_header('Content-type', 'application/json')
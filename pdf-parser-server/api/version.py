@@ -1,29 +1,36 @@
 from http.server import BaseHTTPRequestHandler
 import json
-import subprocess
+import os
+
+# Stamped at build time by tools/stamp_build_info.py; without a build step
+# fall back to what the Vercel runtime environment knows.
+try:
+    from _build_info import BUILD_INFO
+except ImportError:
+    try:
+        from api._build_info import BUILD_INFO
+    except ImportError:
+        BUILD_INFO = {
+            'commit': (os.environ.get('VERCEL_GIT_COMMIT_SHA') or '')[:7] or 'unknown',
+            'message': (os.environ.get('VERCEL_GIT_COMMIT_MESSAGE') or '').split('\n')[0],
+            'parserVersion': 'unknown',
+            'patterns': [],
+            'builtAt': None
+        }
+
+# The response never changes for a deployment, so serialize it once
+RESPONSE_BODY = json.dumps(BUILD_INFO).encode('utf-8')
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         try:
-            # Try to get git commit hash
-            try:
-                commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], 
-                                                stderr=subprocess.DEVNULL).decode('utf-8').strip()
-            except:
-                commit = "unknown"
-            
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(RESPONSE_BODY)))
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            response = {
-                'commit': commit,
-                'message': 'Pattern 0b/0c with constraints',
-                'patterns': ['0', '0a', '0b', '0c', '1', '2', '3', '4']
-            }
-            
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+            self.wfile.write(RESPONSE_BODY)
             return
             
         except Exception as e:
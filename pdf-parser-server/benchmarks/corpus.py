@@ -0,0 +1,386 @@
+"""
+Synthetic TCGplayer Direct corpus: order text and PDFs for benchmarks.
+
+Every layout extract_cards handles has a generator below that emits the
+lines of one card row (with randomized names, sets and collector numbers so
+rows don't dedupe). Orders are assembled from those rows, and documents are
+paginated into a minimal Helvetica PDF that pdfplumber and pdfminer read
+like a real packing slip.
+
+Usage:
+    python benchmarks/corpus.py --orders 140 --cards 12 --out fixtures/direct.pdf
+    python benchmarks/corpus.py --orders 40 --table --out fixtures/table.pdf   # column-layout tables
+    python benchmarks/corpus.py --orders 3 --cards 5 --text   # print the order text
+"""
+import argparse
+import random
+import textwrap
+import zlib
+
+NAME_WORDS = [
+    'Lightning', 'Bolt', 'Shivan', 'Dragon', 'Llanowar', 'Elves', 'Counterspell', 'Serra', 'Angel',
+    'Goblin', 'Guide', 'Thassa', 'Bident', 'Knoll', 'Spinerock', 'Szeras', 'Oracle', 'Sentinel',
+    'Archon', 'Hydra', 'Warden', 'Ember', 'Glacial', 'Verdant', 'Obsidian', 'Phantom', 'Rune'
+]
+MAGIC_SETS = [
+    'Kaldheim', 'Forgotten Realms', 'Dominaria', 'Ice Age', 'Magic 2010', 'Commander Masters',
+    'March of the Machine', 'Outlaws of Thunder Junction', 'Phyrexia: All Will Be One', 'Portal'
+]
+POKEMON_SETS = ['Pokemon GO', 'Deck Exclusives', 'Crown Zenith', 'Paldea Evolved']
+YGO_SETS = [('Doom of Dimensions', 'DOOD'), ('Legend of Blue Eyes', 'LOB'), ('Phantom Nightmare', 'PHNI')]
+CONDITIONS = ['Near Mint', 'Lightly Played', 'Moderately Played', 'Heavily Played', 'Damaged']
+MAGIC_RARITIES = ['C', 'U', 'R', 'M']
+BUYER_NAMES = [
+    'John Smith', 'Brendan E White', 'Emily Bau-Madsen', 'Petteway, Nicholas', 'philip alston',
+    'R. Jeremy', 'Barbara Carver', "Mark O'Brien"
+]
+STREETS = [
+    '123 Main St', 'p.o. box 103', 'HC 3 BOX 37578', 'N58W23783 Hastings Ct', 'CMR 473 Box 546',
+    '91-111 MAKAALOA PL'
+]
+
+
+def card_name(rng):
+    return ' '.join(rng.sample(NAME_WORDS, rng.randint(2, 3)))
+
+
+def qty(rng):
+    return rng.choice((1, 1, 1, 2, 3, 4))
+
+
+# One generator per layout: rng -> list of lines for a single card row
+
+def layout_single_line(rng):
+    """Single line: "1 Name - #161 - C - Near Mint Magic - Set" """
+    return [f"{qty(rng)} {card_name(rng)} - #{rng.randint(1, 400)} - {rng.choice(MAGIC_RARITIES)} - "
+            f"{rng.choice(CONDITIONS)} Magic - {rng.choice(MAGIC_SETS)}"]
+
+
+def layout_no_hash(rng):
+    """Collector number omitted: "1 Name - U - Near Mint Magic - Set" """
+    return [f"{qty(rng)} {card_name(rng)} - {rng.choice(MAGIC_RARITIES)} - {rng.choice(CONDITIONS)} "
+            f"Magic - {rng.choice(MAGIC_SETS)}"]
+
+
+def layout_bin_prefix(rng):
+    """Bin location prefix with the set name wrapped onto the next line"""
+    return [f"Bin {rng.randint(1, 9)} {qty(rng)} {card_name(rng)} - #{rng.randint(1, 400)} - "
+            f"{rng.choice(MAGIC_RARITIES)} - {rng.choice(CONDITIONS)}",
+            rng.choice(MAGIC_SETS)]
+
+
+def layout_bin_split(rng):
+    """Header split around a "Bin N qty Game - Set" line, condition on the third line"""
+    condition = rng.choice(CONDITIONS).split(' ')
+    return [f"{card_name(rng)} (Extended Art) - #{rng.randint(1, 400)} - {rng.choice(MAGIC_RARITIES)} - {condition[0]}",
+            f"Bin {rng.randint(1, 9)}{rng.choice(('', '-T'))} {qty(rng)} Magic - {rng.choice(MAGIC_SETS)}",
+            ' '.join(condition[1:]) or 'Foil']
+
+
+def layout_slot_code(rng):
+    """Slot code prefix ("K 1 ..." / "K-T 1 ...") under a "Slot K - Condition" header"""
+    slot = rng.choice('ABCDKMOX')
+    condition = rng.choice(CONDITIONS)
+    return [f"Slot {slot} - {condition}",
+            f"{slot}{rng.choice(('', '-T'))} {qty(rng)} {card_name(rng)} - #{rng.randint(1, 400)} - "
+            f"{rng.choice(MAGIC_RARITIES)} - {condition} Magic - {rng.choice(MAGIC_SETS)}"]
+
+
+def layout_slot_multiline(rng):
+    """Slot O/X rows: header, then "qty Game - Set", then the condition tail"""
+    set_name, code = rng.choice(YGO_SETS)
+    return [f"{card_name(rng)} - #{code}-EN{rng.randint(1, 120):03d} - Super Rare - Near Mint 1st",
+            f"{qty(rng)} YuGiOh - {set_name}",
+            'Edition']
+
+
+def layout_pokemon_fraction(rng):
+    """Pokemon collector fraction without '#': "1 Name - 132/165 - Rare - ..." """
+    total = rng.choice((78, 165, 193, 198))
+    return [f"{qty(rng)} {card_name(rng)} - {rng.randint(1, total):03d}/{total} - Rare - "
+            f"{rng.choice(CONDITIONS)} Pokemon - {rng.choice(POKEMON_SETS)}"]
+
+
+def layout_double_sided(rng):
+    """Double-sided token with a "#18 // 20" collector pair"""
+    number = rng.randint(1, 40)
+    return [f"{qty(rng)} {card_name(rng)} // Plot Double-Sided Token - #{number} // {number + 2} - T - "
+            f"Near Mint Magic - {rng.choice(MAGIC_SETS)}"]
+
+
+def layout_double_sided_split(rng):
+    """Double-sided token header split around a Bin line"""
+    number = rng.randint(1, 40)
+    return [f"{card_name(rng)} // Plot Double-Sided Token - #{number} // {number + 2} - T - Near",
+            f"Bin {rng.randint(1, 9)} {qty(rng)} Magic - {rng.choice(MAGIC_SETS)}",
+            'Mint']
+
+
+def layout_theoden_split(rng):
+    """Game and set first, quantity alone, then "#N - R - Cond <set tail>" """
+    return [f"{card_name(rng)} - Magic - The Lord of the Rings: Tales",
+            str(qty(rng)),
+            f"#{rng.randint(1, 400)} - R - Near Mint of Middle-earth"]
+
+
+def layout_squirtle_split(rng):
+    """Name with a trailing '-', then "qty Game - Set", then "#N/T - Rarity - Cond" """
+    number = rng.randint(1, 165)
+    return [f"{card_name(rng)} - {number:03d}/165 (Reverse Cosmos Holo) (Costco Exclusive) -",
+            f"{qty(rng)} Pokemon - Miscellaneous Cards & Products",
+            f"#{number:03d}/165 - Promo - Near Mint"]
+
+
+def layout_ygo_fragment(rng):
+    """Yu-Gi-Oh code split across lines: "#DOOD-" ... "EN085 - ..." """
+    set_name, code = rng.choice(YGO_SETS)
+    return [f"{card_name(rng)} - #{code}-",
+            f"YuGiOh - {set_name}",
+            f"EN{rng.randint(1, 120):03d} - Common - Near Mint 1st Edition"]
+
+
+LAYOUTS = {
+    'single_line': layout_single_line,
+    'no_hash': layout_no_hash,
+    'bin_prefix': layout_bin_prefix,
+    'bin_split': layout_bin_split,
+    'slot_code': layout_slot_code,
+    'slot_multiline': layout_slot_multiline,
+    'pokemon_fraction': layout_pokemon_fraction,
+    'double_sided': layout_double_sided,
+    'double_sided_split': layout_double_sided_split,
+    'theoden_split': layout_theoden_split,
+    'squirtle_split': layout_squirtle_split,
+    'ygo_fragment': layout_ygo_fragment,
+}
+
+
+def order_lines(rng, index, cards, layouts=None):
+    """Lines of one Direct order: header, details, shipping address, item table"""
+    layouts = layouts or list(LAYOUTS)
+    lines = [
+        f"Direct by TCGplayer #{251012 + index % 9:06d}-{rng.randrange(65536):04X}",
+        f"Order Date: 10/{12 + index % 9}/2025",
+        'Shipping Address',
+        rng.choice(BUYER_NAMES),
+        rng.choice(STREETS),
+        'Springfield, IL 62701',
+        'Shipping Method: Standard',
+        'SLOT QTY PRODUCT NAME SET NAME'
+    ]
+    for _ in range(cards):
+        lines.extend(LAYOUTS[rng.choice(layouts)](rng))
+    return lines
+
+
+def generate_orders(seed=0, orders=100, cards=10, layouts=None):
+    """List of order texts; card counts vary between 1 and 2 * cards"""
+    rng = random.Random(seed)
+    return ['\n'.join(order_lines(rng, i, rng.randint(1, max(1, 2 * cards - 1)), layouts)) + '\n'
+            for i in range(orders)]
+
+
+def paginate(order_texts, lines_per_page=60):
+    """Flow orders onto pages the way a packing slip wraps long item tables"""
+    lines = [line for text in order_texts for line in text.rstrip('\n').split('\n') + ['']]
+    return [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(pages):
+    """Minimal PDF (Helvetica 9pt, one text line per row) from a list of pages of lines"""
+    page_ops = []
+    for lines in pages:
+        ops = ['BT /F1 9 Tf 11 TL 40 760 Td']
+        ops.extend(f"({_pdf_escape(line)}) Tj T*" for line in lines)
+        ops.append('ET')
+        page_ops.append(ops)
+    return _write_pdf(page_ops)
+
+
+def _write_pdf(page_ops):
+    """PDF bytes from each page's content stream operators, with Helvetica as /F1"""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = add(None)
+    kids = []
+    for ops in page_ops:
+        stream = zlib.compress('\n'.join(ops).encode('cp1252', 'replace'))
+        content = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+                        b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)))
+    objects[pages_id - 1] = (b"<< /Type /Pages /Kids [" + b' '.join(b"%d 0 R" % kid for kid in kids)
+                             + b"] /Count %d >>" % len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def generate_pdf(seed=0, orders=100, cards=10, layouts=None, lines_per_page=60):
+    return make_pdf(paginate(generate_orders(seed, orders, cards, layouts), lines_per_page))
+
+
+# Column-layout item tables, drawn the way a real packing slip is: every cell is
+# wrapped inside its column and the quantity is centred on its row, so
+# extract_text() interleaves the cells into the split rows the regex patterns
+# stitch back together. Columns start at these x positions; widths are in characters.
+TABLE_COLUMNS = (('SLOT', 40), ('QTY', 68), ('PRODUCT NAME', 96), ('SET NAME', 392))
+TABLE_PRODUCT_WIDTH = 58
+TABLE_SET_WIDTH = 38
+TABLE_LINE_HEIGHT = 11
+TABLE_TOP = 760
+TABLE_BOTTOM = 60
+LONG_MAGIC_SETS = ['The Lord of the Rings: Tales of Middle-earth', 'Commander: The Lost Caverns of Ixalan',
+                   'Duskmourn: House of Horror Commander']
+YGO_CONDITIONS = ['Near Mint 1st Edition', 'Lightly Played 1st Edition', 'Near Mint Unlimited', 'Near Mint Limited']
+
+
+def table_card(rng):
+    """One item-table card as the fields a parser should return, plus how its product cell shows the collector"""
+    kind = rng.choice(('magic', 'magic', 'magic_no_hash', 'pokemon', 'double_sided', 'ygo'))
+    name = card_name(rng)
+    condition = rng.choice(CONDITIONS)
+    game, set_name = 'Magic', rng.choice(MAGIC_SETS + LONG_MAGIC_SETS)
+    shown = None
+    if kind == 'magic':
+        name += rng.choice(('', '', ' (Extended Art)', ' (Borderless) (Confetti Foil)'))
+        collector, rarity = str(rng.randint(1, 400)), rng.choice(MAGIC_RARITIES)
+        condition += rng.choice(('', '', ' Foil'))
+    elif kind == 'magic_no_hash':
+        collector, rarity = '', rng.choice(MAGIC_RARITIES)
+    elif kind == 'pokemon':
+        total = rng.choice((78, 165, 193, 198))
+        collector, rarity = f"{rng.randint(1, total):03d}/{total}", rng.choice(('Rare', 'Double Rare', 'Illustration Rare'))
+        game, set_name = 'Pokemon', rng.choice(POKEMON_SETS)
+        shown = rng.choice((collector, f"#{collector}"))
+        condition += rng.choice(('', ' Holofoil', ' Reverse Holofoil'))
+    elif kind == 'double_sided':
+        number = rng.randint(1, 40)
+        name += ' // Plot Double-Sided Token'
+        collector, rarity = f"{number} // {number + 2}", 'T'
+    else:
+        ygo_set, code = rng.choice(YGO_SETS)
+        collector, rarity = f"{code}-EN{rng.randint(1, 120):03d}", rng.choice(('Common', 'Super Rare', 'Secret Rare'))
+        game, set_name, condition = 'YuGiOh', ygo_set, rng.choice(YGO_CONDITIONS)
+    card = {'name': name, 'quantity': qty(rng), 'condition': condition, 'setName': set_name,
+            'collectorNumber': collector, 'rarity': rarity}
+    fields = [name] + ([shown or f"#{collector}"] if collector else []) + [rarity, condition]
+    return card, ' - '.join(fields), f"{game} - {set_name}"
+
+
+def generate_table_orders(seed=0, orders=100, cards=10):
+    """[(order lines before the table, [(card, product cell, set cell, slot code)])]"""
+    rng = random.Random(seed)
+    result = []
+    for index in range(orders):
+        details = order_lines(rng, index, 0)[:-1]  # header, details and address; the table is drawn separately
+        rows = []
+        for _ in range(rng.randint(1, max(1, 2 * cards - 1))):
+            card, product, set_cell = table_card(rng)
+            rows.append((card, product, set_cell, rng.choice(('', '', 'K', 'X', 'B-T'))))
+        result.append((details, rows))
+    return result
+
+
+def make_table_pdf(table_orders):
+    """PDF with each order's details as plain lines and its items in a column-layout table.
+
+    A row that doesn't fit on the page moves to the next one, which repeats
+    the table header.
+    """
+    page_ops = []
+    ops = []
+    y = TABLE_TOP
+
+    def text(x, y, value):
+        ops.append(f"BT /F1 9 Tf {x} {y:.1f} Td ({_pdf_escape(value)}) Tj ET")
+
+    def need(lines, header=False):
+        nonlocal ops, y
+        if y - lines * TABLE_LINE_HEIGHT >= TABLE_BOTTOM:
+            return
+        page_ops.append(ops)
+        ops = []
+        y = TABLE_TOP
+        if header:
+            table_header()
+
+    def table_header():
+        nonlocal y
+        for label, x in TABLE_COLUMNS:
+            text(x, y, label)
+        y -= TABLE_LINE_HEIGHT
+
+    for details, rows in table_orders:
+        need(len(details) + 2)
+        for line in details:
+            text(TABLE_COLUMNS[0][1], y, line)
+            y -= TABLE_LINE_HEIGHT
+        table_header()
+        for card, product, set_cell, slot in rows:
+            product_lines = textwrap.wrap(product, TABLE_PRODUCT_WIDTH, break_long_words=False)
+            set_lines = textwrap.wrap(set_cell, TABLE_SET_WIDTH, break_long_words=False)
+            height = max(len(product_lines), len(set_lines))
+            need(height, header=True)
+            if slot:
+                text(TABLE_COLUMNS[0][1], y, slot)
+            text(TABLE_COLUMNS[1][1] + 4, y - (height - 1) * TABLE_LINE_HEIGHT / 2, str(card['quantity']))
+            for offset, line in enumerate(product_lines):
+                text(TABLE_COLUMNS[2][1], y - offset * TABLE_LINE_HEIGHT, line)
+            for offset, line in enumerate(set_lines):
+                text(TABLE_COLUMNS[3][1], y - offset * TABLE_LINE_HEIGHT, line)
+            y -= height * TABLE_LINE_HEIGHT
+        y -= TABLE_LINE_HEIGHT
+    page_ops.append(ops)
+    return _write_pdf(page_ops)
+
+
+def generate_table_pdf(seed=0, orders=100, cards=10):
+    """(PDF bytes, {order number: [expected card dicts]}) for a column-layout corpus"""
+    table_orders = generate_table_orders(seed, orders, cards)
+    expected = {details[0].split('#', 1)[1]: [card for card, _, _, _ in rows] for details, rows in table_orders}
+    return make_table_pdf(table_orders), expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100)
+    parser.add_argument('--cards', type=int, default=10, help='average cards per order')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--layouts', help=f"comma-separated subset of: {', '.join(LAYOUTS)}")
+    parser.add_argument('--out', help='write a PDF here')
+    parser.add_argument('--text', action='store_true', help='print the order text instead')
+    parser.add_argument('--table', action='store_true', help='draw item tables in columns, like a real slip')
+    args = parser.parse_args()
+
+    layouts = args.layouts.split(',') if args.layouts else None
+    if args.text or not args.out:
+        print('\n'.join(generate_orders(args.seed, args.orders, args.cards, layouts)))
+        return
+    with open(args.out, 'wb') as f:
+        if args.table:
+            f.write(generate_table_pdf(args.seed, args.orders, args.cards)[0])
+        else:
+            f.write(generate_pdf(args.seed, args.orders, args.cards, layouts))
+
+
+if __name__ == '__main__':
+    main()
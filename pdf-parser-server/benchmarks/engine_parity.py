@@ -0,0 +1,118 @@
+"""
+Legacy vs linear card parity, plus fixed rows whose cards are pinned.
+
+FIXED_ORDERS are item-table rows with the cards every regex engine must
+return for them, mostly rows whose output changed on purpose (noted with the
+PARSER_VERSION that changed it), so a later refactor that moves them again
+shows up here before it reaches the parse cache. Then the orders of a
+synthetic corpus (or of --pdf files) are parsed with both engines and the
+orders whose cards differ are listed. The linear engine runs its fixed
+pattern order (no PATTERN_PROFILE), so a difference is the engine's, not a
+plan's. Exits 1 on a fixed-row mismatch or an engine difference.
+
+Usage:
+    python benchmarks/engine_parity.py --orders 300 --cards 12
+    python benchmarks/engine_parity.py --pdf fixtures/*.pdf -v
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parse  # noqa: E402
+import corpus  # noqa: E402
+
+ENGINES = ('legacy', 'linear')
+ORDER_HEAD = ['Direct by TCGplayer #251012-ABCD', 'Shipping Address', 'John Smith', 'SLOT QTY PRODUCT NAME SET NAME']
+
+
+def card(name, quantity, condition, set_name, collector_number, rarity):
+    return {'name': name, 'quantity': quantity, 'condition': condition, 'setName': set_name,
+            'collectorNumber': collector_number, 'rarity': rarity}
+
+
+# (label, item-table lines, cards)
+FIXED_ORDERS = [
+    # 1.1.0 dropped lines over 300 characters; 1.3.0 parses them like any other row
+    ('row far wider than the page',
+     [f"1 {'Lightning Bolt ' * 20}- #161 - C - Near Mint Magic - Kaldheim"],
+     [card(' '.join(['Lightning Bolt'] * 20), 1, 'Near Mint', 'Kaldheim', '161', 'C')]),
+    # 1.4.0: the 1.2.0 classification changes are undone. The word after a
+    # two-word condition goes back to the set name when it is long or has "of" in it...
+    ('set name wrapped after the condition',
+     ['Gandalf - Magic - The Lord of the Rings: Tales', '1', '#12 - R - Near Mint of Middle-earth'],
+     [card('Gandalf', 1, 'Near Mint', 'The Lord of the Rings: Tales of Middle-earth', '12', 'R')]),
+    ('set name that starts like a condition suffix',
+     ['Black Lotus - Magic - Masters Edition', '1', '#232 - R - Near Mint Limited Edition Alpha'],
+     [card('Black Lotus', 1, 'Near Mint', 'Masters Edition Limited Edition Alpha', '232', 'R')]),
+    ('short condition suffix',
+     ['Black Lotus - Magic - Masters Edition', '1', '#232 - R - Lightly Played Foil'],
+     [card('Black Lotus', 1, 'Lightly Played Foil', 'Masters Edition', '232', 'R')]),
+    # ...Pattern 8 takes no L or T rarity code...
+    ('land code in a Pattern 8 row',
+     ['1 Plains - L - Near Mint Magic - Foundations'],
+     [card('Plains', 1, 'Foundations', '', 'L', 'Near Mint Magic')]),
+    # ...and "YuGiOh" is never cut from the end of a condition
+    ('YuGiOh stuck to the condition',
+     ['1 Dark Magician - #LOB-005 - UR - Near Mint YuGiOh'],
+     [card('Dark Magician', 1, 'Near Mint YuGiOh', '', 'LOB-005', 'UR')]),
+]
+
+
+def pdf_orders(path):
+    """The order sections of a PDF, as parse_order sees them"""
+    with open(path, 'rb') as f:
+        pdf_bytes = f.read()
+    text = ''.join(page + "\n\n" for page in parse.PARSER.iter_page_texts(pdf_bytes, 1))
+    return [text[order['startPos']:order['endPos']] for order in parse.PARSER.parse_pdf(pdf_bytes, 'legacy', 1)]
+
+
+def check_fixed(verbose=False):
+    """Number of (fixed order, engine) pairs whose cards aren't the pinned ones"""
+    failures = 0
+    for label, lines, expected in FIXED_ORDERS:
+        text = '\n'.join(ORDER_HEAD + lines) + '\n'
+        for engine in ENGINES:
+            cards = parse.PARSER.extract_cards(text, engine)[0]
+            if cards != expected:
+                failures += 1
+                print(f"  {label} ({engine}): got {json.dumps(cards)}, expected {json.dumps(expected)}")
+            elif verbose:
+                print(f"  {label} ({engine}): ok")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pdf', nargs='+', help='compare the orders of these PDFs instead of a synthetic corpus')
+    parser.add_argument('--orders', type=int, default=300)
+    parser.add_argument('--cards', type=int, default=12, help='average cards per order')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-v', '--verbose', action='store_true', help='list passing fixed rows and differing cards')
+    args = parser.parse_args()
+    parse.PATTERN_PROFILE = None
+
+    failures = check_fixed(args.verbose)
+    print(f"{len(FIXED_ORDERS)} fixed orders: {failures} mismatches")
+
+    if args.pdf:
+        order_texts = [text for path in args.pdf for text in pdf_orders(path)]
+    else:
+        order_texts = corpus.generate_orders(args.seed, args.orders, args.cards)
+    differing = 0
+    for text in order_texts:
+        legacy, linear = (parse.PARSER.extract_cards(text, engine)[0] for engine in ENGINES)
+        if legacy != linear:
+            differing += 1
+            if args.verbose:
+                print(f"  {text.split(chr(10), 1)[0]}: legacy {json.dumps(legacy)}, linear {json.dumps(linear)}")
+    print(f"{len(order_texts)} orders: {differing} with different legacy and linear cards")
+    if failures or differing:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Throughput and output equivalence of the text extraction backends.
+
+Extracts every PDF with each backend, reports pages/sec, lines handed to the
+regex stage and full parse time, and checks the page text and the parsed
+orders against the pdfplumber backend (the reference). Backends that drop
+lines on purpose (filters_text) only need to match on orders.
+
+Usage:
+    python benchmarks/extraction.py path/to/fixtures/*.pdf [--repeat 3]
+"""
+import argparse
+import difflib
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import parse  # noqa: E402
+
+REFERENCE = 'pdfplumber'
+
+
+def extract(backend_name, pdf_bytes):
+    backend = parse.EXTRACT_BACKENDS[backend_name]
+    with backend.open(pdf_bytes) as document:
+        return list(backend.iter_texts(document))
+
+
+def order_fields(orders):
+    """The parts of an order the Apps Script consumes"""
+    return [(order['orderNumber'], order['buyerName'], order['cards']) for order in orders]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdfs', nargs='+', help='fixture PDFs')
+    parser.add_argument('--repeat', type=int, default=3, help='extractions timed per backend (best reported)')
+    args = parser.parse_args()
+
+    backends = [name for name, backend in parse.EXTRACT_BACKENDS.items() if backend.available()]
+    core = parse.PARSER
+    totals = {name: [0, 0.0, 0, 0.0] for name in backends}  # pages, extract s, lines, parse s
+    mismatches = 0
+
+    for path in args.pdfs:
+        with open(path, 'rb') as f:
+            pdf_bytes = f.read()
+        print(os.path.basename(path))
+
+        reference_texts = reference_orders = None
+        for name in backends:
+            best = None
+            for _ in range(args.repeat):
+                start = perf_counter()
+                texts = extract(name, pdf_bytes)
+                elapsed = perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            lines = sum(text.count('\n') + 1 for text in texts if text)
+            start = perf_counter()
+            orders = order_fields(core.parse_pdf(pdf_bytes, backend=name))
+            parse_seconds = perf_counter() - start
+            for i, value in enumerate((len(texts), best, lines, parse_seconds)):
+                totals[name][i] += value
+
+            if name == REFERENCE:
+                reference_texts, reference_orders = texts, orders
+                verdict = 'reference'
+            else:
+                differing = []
+                if not parse.EXTRACT_BACKENDS[name].filters_text:
+                    differing = [i for i, (a, b) in enumerate(zip(reference_texts, texts)) if a != b]
+                    if len(texts) != len(reference_texts):
+                        differing.append(min(len(texts), len(reference_texts)))
+                same_orders = orders == reference_orders
+                if parse.EXTRACT_BACKENDS[name].filters_text:
+                    verdict = f"text filtered, orders {'identical' if same_orders else 'DIFFER'}"
+                else:
+                    verdict = f"{len(differing)} pages differ, orders {'identical' if same_orders else 'DIFFER'}"
+                if differing or not same_orders:
+                    mismatches += 1
+                if differing and differing[0] < len(texts) and differing[0] < len(reference_texts):
+                    page = differing[0]
+                    diff = difflib.unified_diff(reference_texts[page].split('\n'), texts[page].split('\n'),
+                                                f'{REFERENCE} page {page + 1}', f'{name} page {page + 1}', lineterm='')
+                    verdict += '\n' + '\n'.join(f"      {line}" for line in list(diff)[:12])
+            print(f"  {name:<12}{len(texts) / best:>8.1f} pages/s{lines:>8} lines{parse_seconds * 1000:>9.0f} ms parse  {verdict}")
+
+    print('total')
+    for name, (pages, seconds, lines, parse_seconds) in totals.items():
+        print(f"  {name:<12}{pages / seconds:>8.1f} pages/s{lines:>8} lines{parse_seconds * 1000:>9.0f} ms parse")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
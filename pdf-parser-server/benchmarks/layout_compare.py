@@ -0,0 +1,104 @@
+"""
+Layout engine vs the regex engines on column-layout packing slips.
+
+By default a synthetic corpus is drawn with real column-layout item tables
+(corpus.generate_table_pdf: cells wrapped inside their columns, quantities
+centred on their rows), parsed with every engine, and each order's cards are
+scored against the cards the corpus was generated from. With --pdf a real
+slip is parsed instead; there is no ground truth then, so the layout
+engine's orders are diffed against --against, and orders it had to hand to
+the regex engine are counted.
+
+Usage:
+    python benchmarks/layout_compare.py --orders 60 --cards 12
+    python benchmarks/layout_compare.py --pdf slip.pdf --against legacy -v
+"""
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parse  # noqa: E402
+import corpus  # noqa: E402
+
+
+def card_keys(cards):
+    """An order's cards as a sorted list of comparable strings (order of rows doesn't matter)"""
+    return sorted(json.dumps(card, sort_keys=True) for card in cards)
+
+
+def parse_timed(pdf_bytes, engine):
+    start = perf_counter()
+    orders = parse.PARSER.parse_pdf(pdf_bytes, engine, 1)
+    return orders, perf_counter() - start
+
+
+def fallbacks(orders):
+    return sum(1 for order in orders if order['debug'].get('layout', {}).get('fallback'))
+
+
+def score_synthetic(args):
+    pdf_bytes, expected = corpus.generate_table_pdf(args.seed, args.orders, args.cards)
+    total_cards = sum(len(cards) for cards in expected.values())
+    print(f"{args.orders} column-layout orders, {total_cards} cards ({len(pdf_bytes) / 1024:.0f} KB)")
+    print(f"  {'engine':<8}{'orders/s':>10}{'exact orders':>14}{'right cards':>13}{'wrong cards':>13}{'fallbacks':>11}")
+    for engine in parse.CARD_ENGINES:
+        orders, seconds = parse_timed(pdf_bytes, engine)
+        exact = right = wrong = 0
+        for order in orders:
+            want = card_keys(expected.get(order['orderNumber'], []))
+            got = card_keys(order['cards'])
+            exact += want == got
+            matched = len(set(want) & set(got))
+            right += matched
+            wrong += len(got) - matched
+            if args.verbose and want != got:
+                print(f"    {engine} {order['orderNumber']}: missing {sorted(set(want) - set(got))}, "
+                      f"extra {sorted(set(got) - set(want))}")
+        print(f"  {engine:<8}{len(orders) / seconds:>10.1f}{f'{exact}/{len(expected)}':>14}"
+              f"{f'{right}/{total_cards}':>13}{wrong:>13}{fallbacks(orders) if engine == 'layout' else '-':>11}")
+
+
+def diff_pdf(args):
+    with open(args.pdf, 'rb') as f:
+        pdf_bytes = f.read()
+    layout, layout_seconds = parse_timed(pdf_bytes, 'layout')
+    other, other_seconds = parse_timed(pdf_bytes, args.against)
+    other_cards = {order['orderNumber']: card_keys(order['cards']) for order in other}
+    differing = 0
+    for order in layout:
+        want = other_cards.get(order['orderNumber'], [])
+        got = card_keys(order['cards'])
+        if want != got:
+            differing += 1
+            if args.verbose:
+                print(f"  {order['orderNumber']}: only {args.against} {sorted(set(want) - set(got))}, "
+                      f"only layout {sorted(set(got) - set(want))}")
+    print(f"{os.path.basename(args.pdf)}: {len(layout)} orders, {differing} with different cards, "
+          f"{fallbacks(layout)} parsed by the regex fallback")
+    print(f"  layout {len(layout) / layout_seconds:.1f} orders/s, {args.against} {len(other) / other_seconds:.1f} orders/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pdf', help='compare on this PDF instead of a synthetic corpus')
+    parser.add_argument('--against', default='linear', choices=[e for e in parse.CARD_ENGINES if e != 'layout'],
+                        help='regex engine to diff a --pdf against')
+    parser.add_argument('--orders', type=int, default=60)
+    parser.add_argument('--cards', type=int, default=12, help='average cards per order')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-v', '--verbose', action='store_true', help='print every differing order')
+    args = parser.parse_args()
+
+    if args.pdf:
+        diff_pdf(args)
+    else:
+        score_synthetic(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Slot-row precedence check and adaptive pattern plan benchmark for the linear engine.
+
+Every cleaned line of every order (a synthetic corpus, or the orders of
+--pdf files) is offered to each slot-row rule (Patterns 0b, 0c, 0, 0a) on its
+own. Two rules that both claim some line have to be ordered by
+parse.SLOT_ROW_PRECEDENCE, directly or through another rule, or a plan that
+reorders them could turn the line into a different card; such pairs are
+listed and the script exits 1. Then a pattern profile is trained on one pass
+over the orders, and the linear engine's cards, time and pattern attempts
+with its plans are compared with the hand-written order without skipping.
+
+Usage:
+    python benchmarks/pattern_order.py --orders 300 --cards 12
+    python benchmarks/pattern_order.py --pdf fixtures/*.pdf --skip-after 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parse  # noqa: E402
+import corpus  # noqa: E402
+
+
+def pdf_orders(path):
+    """The order sections of a PDF, as parse_order sees them"""
+    with open(path, 'rb') as f:
+        pdf_bytes = f.read()
+    text = ''.join(page + "\n\n" for page in parse.PARSER.iter_page_texts(pdf_bytes, 1))
+    return [text[order['startPos']:order['endPos']] for order in parse.PARSER.parse_pdf(pdf_bytes, 'legacy', 1)]
+
+
+def ordered_pairs():
+    """Every (first, then) the declared precedence implies, transitively"""
+    pairs = set(parse.SLOT_ROW_PRECEDENCE)
+    while True:
+        implied = {(a, d) for a, b in pairs for c, d in pairs if b == c} - pairs
+        if not implied:
+            return pairs
+        pairs |= implied
+
+
+def overlapping_rules(order_texts):
+    """{(rule, rule): example line} for rule pairs that both claim a line, whatever their order"""
+    core = parse.PARSER
+    overlaps = {}
+    for order_text in order_texts:
+        lines, kinds, _, _ = core._linear_lines(order_text)
+        for i, line in enumerate(lines):
+            claimed = [rule for rule in parse.SLOT_ROW_RULES
+                       if getattr(core, f'_slot_row_{rule}')(i, lines, kinds, [])]
+            for a in range(len(claimed)):
+                for b in range(a + 1, len(claimed)):
+                    overlaps.setdefault((claimed[a], claimed[b]), line)
+    return overlaps
+
+
+def parse_all(order_texts, repeat=1):
+    """(linear cards per order, fastest of repeat passes in seconds, pattern attempts of the last pass)"""
+    best = None
+    for _ in range(repeat):
+        before = parse.PATTERNS.snapshot()
+        start = perf_counter()
+        cards = [parse.PARSER.extract_cards(text, 'linear')[0] for text in order_texts]
+        seconds = perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    attempts = sum(counters['attempts'] for counters in parse.PATTERNS.stats(since=before).values())
+    return cards, best, attempts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pdf', nargs='+', help='check the orders of these PDFs instead of a synthetic corpus')
+    parser.add_argument('--orders', type=int, default=300)
+    parser.add_argument('--cards', type=int, default=12, help='average cards per order')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='timed passes per plan (fastest reported)')
+    parser.add_argument('--skip-after', type=int, default=parse.PATTERN_SKIP_AFTER,
+                        help='orders without a hit before a family is skipped in a layout')
+    args = parser.parse_args()
+
+    if args.pdf:
+        order_texts = [text for path in args.pdf for text in pdf_orders(path)]
+    else:
+        order_texts = corpus.generate_orders(args.seed, args.orders, args.cards)
+
+    pairs = ordered_pairs()
+    overlaps = overlapping_rules(order_texts)
+    undeclared = {pair: line for pair, line in overlaps.items()
+                  if pair not in pairs and pair[::-1] not in pairs}
+    print(f"{len(order_texts)} orders; slot-row rules claiming the same line: "
+          f"{', '.join(f'{a}/{b}' for a, b in sorted(overlaps)) or 'none'}")
+    for (a, b), line in sorted(undeclared.items()):
+        print(f"  {a} and {b} both claim {line!r} but SLOT_ROW_PRECEDENCE doesn't order them")
+
+    with tempfile.TemporaryDirectory() as directory:
+        parse.PATTERN_SKIP_AFTER = args.skip_after
+        parse.PATTERN_PROFILE = None
+        fixed, fixed_seconds, fixed_attempts = parse_all(order_texts, args.repeat)
+        profile = parse.PATTERN_PROFILE = parse.PatternProfile(os.path.join(directory, 'profile.json'))
+        parse_all(order_texts)  # training pass
+        profile.flush()
+        adaptive, adaptive_seconds, adaptive_attempts = parse_all(order_texts, args.repeat)
+        profile.flush()
+    differing = sum(1 for a, b in zip(fixed, adaptive) if a != b)
+    print(f"  fixed order {len(order_texts) / fixed_seconds:.1f} orders/s, {fixed_attempts} pattern attempts; "
+          f"adaptive {len(order_texts) / adaptive_seconds:.1f} orders/s, {adaptive_attempts} pattern attempts; "
+          f"{differing} orders with different cards")
+    for layout in sorted(profile.layouts):
+        slot_order, skip = profile.plan(layout)
+        print(f"  {layout:<12} {profile.layouts[layout]['orders']:>6} orders  slot rows {' > '.join(slot_order)}"
+              f"  skipped {', '.join(sorted(skip)) or '-'}")
+    if undeclared:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
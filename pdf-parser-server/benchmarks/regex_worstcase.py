@@ -0,0 +1,156 @@
+"""
+Adversarial-input benchmark: every registered pattern must stay linear.
+
+Runs each pattern in parse.PATTERNS the way the parser does against
+pathological inputs of doubling size - long runs of the separators and
+lazy-quantifier bait the card and name patterns are built from - and
+estimates the growth exponent over the last two doublings (1 = linear,
+2 = quadratic). Scanning patterns run over the whole text, line patterns
+match every line of it, and order and buyer-name patterns match the text
+once. Most pieces make one long line, since that is where a lazy quantifier
+has the most to backtrack over. extract_buyer_name and every extract_cards
+engine are checked the same way on whole pathological
+orders. Exits 1 if anything grows faster than --max-exponent; checks that
+stay under --min-ms at the largest size are reported but never fail, since
+timer noise dominates their exponent.
+
+Usage:
+    python benchmarks/regex_worstcase.py
+    python benchmarks/regex_worstcase.py --max-size 8192 --max-exponent 1.3 -v
+"""
+import argparse
+import math
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import parse  # noqa: E402
+
+# Patterns the parser runs over a whole order text (search/finditer) rather than
+# matching at the start of one line
+SCAN_PATTERNS = {'order_header', 'shipping_header', '1', '2', '2b', '3', '4', '5', '5b', '6', 'digit'}
+
+# Pathological building blocks, repeated `size` times
+PIECES = {
+    'letters': 'a',
+    'words': 'Ab ',
+    'initials': 'A. ',
+    'commas': 'Ab, ',
+    'tabs': 'a \t',
+    'dashes': 'a - ',
+    'bare_dashes': '- ',
+    'dash_hash': 'a - #',
+    'header': 'a - #1 - ',
+    'header_tail': '#1 - a - ',
+    'rarity_chain': 'a - #1 - Rare - ',
+    'digits': '1 ',
+    'bin': 'Bin 1 1 a - ',
+    'slot': 'A 1 a - ',
+    'qty': '1 a - ',
+    'game_set': 'Magic - a ',
+    'hyphen_words': 'a-b ',
+    'apostrophes': "a'b ",
+    'short_lines': 'Ab Cd\n',
+    'collector_lines': 'a - #1\n',
+    'card_lines': '1 a - #1 - Rare\n',
+    'bin_lines': 'Bin 1 1 a - #1\n',
+    'dash_lines': 'a -\n',
+    'shipping': 'Shipping Address\nAb Cd\n',
+    'order_header': 'Direct by TCGplayer # ',
+}
+
+
+def timed(fn):
+    """Best-of-three seconds per call, repeating fast calls so timer resolution doesn't matter"""
+    calls = 1
+    while True:
+        start = perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = perf_counter() - start
+        if elapsed >= 0.005:
+            break
+        calls *= 4
+    best = elapsed
+    for _ in range(2):
+        start = perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, perf_counter() - start)
+    return best / calls
+
+
+def growth(make_call, max_size, time_limit):
+    """(exponent over the last two doublings, seconds at the largest size tried, that size)"""
+    history = []
+    size = 64
+    while size <= max_size:
+        history.append((size, timed(make_call(size))))
+        if history[-1][1] > time_limit:
+            break
+        size *= 2
+    (first_size, first), (last_size, last) = history[max(0, len(history) - 3)], history[-1]
+    exponent = math.log(last / first) / math.log(last_size / first_size) if last > first else 0.0
+    return exponent, last, last_size
+
+
+def pattern_call(pattern, text):
+    regex = pattern.regex
+    if pattern.name in SCAN_PATTERNS:
+        return lambda: sum(1 for _ in regex.finditer(text))
+    if pattern.family != 'order':
+        lines = text.split('\n')
+        return lambda: [regex.match(line) for line in lines]
+    return lambda: regex.match(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-size', type=int, default=4096, help='largest number of repeated pieces')
+    parser.add_argument('--max-exponent', type=float, default=1.5, help='fail above this growth exponent')
+    parser.add_argument('--min-ms', type=float, default=2.0, help='never fail a check faster than this at its largest size')
+    parser.add_argument('--time-limit', type=float, default=0.25, help='stop doubling once a call takes this long (s)')
+    parser.add_argument('--only', help='run only the checks whose name contains this text')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print every input, not just the worst')
+    args = parser.parse_args()
+
+    checks = []
+    for name in parse.PATTERNS.names():
+        pattern = parse.PATTERNS[name]
+        checks.append((f"pattern {name}", {piece: (lambda size, p=pattern, t=text: pattern_call(p, t * size))
+                                           for piece, text in PIECES.items()}))
+
+    core = parse.PARSER
+    header = 'Direct by TCGplayer # 251012-48B7\nShipping Address\n'
+    for engine in parse.CARD_ENGINES:
+        checks.append((f"extract_cards {engine}", {
+            piece: (lambda size, t=text, e=engine: lambda: core.extract_cards(header + t * size, e))
+            for piece, text in PIECES.items()
+        }))
+    checks.append(("extract_buyer_name", {
+        piece: (lambda size, t=text: lambda: core.extract_buyer_name(header + t * size + '\nShipping Method:', ''))
+        for piece, text in PIECES.items()
+    }))
+
+    if args.only:
+        checks = [(label, inputs) for label, inputs in checks if args.only in label]
+
+    failures = 0
+    print(f"{'check':<28}{'exponent':>9}{'ms at max':>11}  worst input")
+    for label, inputs in checks:
+        results = {piece: growth(make, args.max_size, args.time_limit) for piece, make in inputs.items()}
+        worst_piece, (exponent, seconds, size) = max(results.items(), key=lambda item: item[1][0])
+        failed = exponent > args.max_exponent and seconds * 1000 >= args.min_ms
+        failures += failed
+        print(f"{label:<28}{exponent:>9.2f}{seconds * 1000:>11.2f}  {worst_piece} x{size}{'  SUPERLINEAR' if failed else ''}")
+        if args.verbose:
+            for piece, (exponent, seconds, size) in results.items():
+                print(f"    {piece:<24}{exponent:>9.2f}{seconds * 1000:>11.2f}  x{size}")
+    print(f"{failures} superlinear" if failures else "all linear")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
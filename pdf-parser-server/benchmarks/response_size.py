@@ -0,0 +1,75 @@
+"""
+Response size/latency comparison for the parse endpoint's output modes.
+
+Parses each PDF once, then times serializing (and compressing) the response
+in every combination of full/compact and identity/gzip, the way do_POST
+builds it.
+
+Usage:
+    python benchmarks/response_size.py path/to/sq.pdf [more.pdf ...] [--repeat 20]
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import parse  # noqa: E402
+
+
+def encode_response(orders, compact, use_gzip):
+    """Build the response body exactly as do_POST does for these options"""
+    if compact:
+        response = {
+            'success': True,
+            'orders': [parse.compact_order(order) for order in orders],
+            'totalOrders': len(orders)
+        }
+        body = json.dumps(response, separators=parse.COMPACT_SEPARATORS).encode('utf-8')
+    else:
+        response = {
+            'success': True,
+            'orders': orders,
+            'totalOrders': len(orders),
+            'debug': {'patterns': parse.PATTERNS.stats()}
+        }
+        body = json.dumps(response).encode('utf-8')
+    if use_gzip and len(body) >= parse.GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=parse.GZIP_LEVEL)
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdfs', nargs='+', help='PDF files to parse')
+    parser.add_argument('--repeat', type=int, default=20, help='encodings timed per mode (median reported)')
+    args = parser.parse_args()
+
+    core = parse.PARSER
+    for path in args.pdfs:
+        with open(path, 'rb') as f:
+            pdf_bytes = f.read()
+        orders = core.parse_pdf(pdf_bytes)
+        print(f"{os.path.basename(path)}: {len(pdf_bytes) / 1024:.0f} KB PDF, {len(orders)} orders")
+        print(f"  {'mode':<18}{'bytes':>10}{'vs full':>9}{'encode ms':>11}")
+
+        full_size = None
+        for compact in (False, True):
+            for use_gzip in (False, True):
+                timings = []
+                for _ in range(args.repeat):
+                    start = perf_counter()
+                    body = encode_response(orders, compact, use_gzip)
+                    timings.append((perf_counter() - start) * 1000)
+                if full_size is None:
+                    full_size = len(body)
+                mode = ('compact' if compact else 'full') + ('+gzip' if use_gzip else '')
+                print(f"  {mode:<18}{len(body):>10}{len(body) / full_size:>8.0%}{statistics.median(timings):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
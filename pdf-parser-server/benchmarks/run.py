@@ -0,0 +1,209 @@
+"""
+Parser benchmark suite on the synthetic Direct corpus, with stored baselines.
+
+Times parse_pdf (end to end on a generated PDF), extract_buyer_name and
+extract_cards (on the generated order texts) separately, and reports
+orders/sec and peak Python memory per stage. The per-order stages also report
+the mean transient allocation peak of one order (what the card candidates,
+dedupe keys and scoring cost while an order is parsed). parse_pdf also runs once
+in a fresh interpreter to report its peak RSS, which covers what tracemalloc
+can't see (pdfminer's C-level buffers, allocator overhead). Results are compared
+against benchmarks/baselines/<label>.json so a regression shows up as a number.
+
+Usage:
+    python benchmarks/run.py                       # compare with the stored baseline
+    python benchmarks/run.py --save-baseline       # record a new baseline
+    python benchmarks/run.py --engine linear --backend pdfminer --orders 300 --cards 15
+    python benchmarks/run.py --fail-over 25        # exit 1 if any stage is >25% slower
+    python benchmarks/run.py --orders 700 --repeat 1 --label large   # ~365 pages: RSS should stay flat
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+API_DIR = os.path.join(BENCH_DIR, '..', 'api')
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import corpus  # noqa: E402
+import parse  # noqa: E402
+
+
+def measure(fn, repeat):
+    """(median seconds over repeat runs, peak traced bytes of one extra run)"""
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        timings.append(perf_counter() - start)
+    # Memory is traced in a separate run: tracemalloc slows allocation-heavy code
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def order_peak(fn, count):
+    """Mean over fn(0..count-1) of the memory each call allocates at its peak, in bytes"""
+    total = 0
+    tracemalloc.start()
+    try:
+        for i in range(count):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(i)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / count
+
+
+# Run by peak_rss in a fresh interpreter; extraction modules are imported before the
+# current RSS is read, so only the parse itself counts as growth
+RSS_PROBE = """
+import resource, sys
+sys.path.insert(0, sys.argv[1])
+import parse
+parse.load_pdfplumber()
+import pdfminer.converter, pdfminer.layout
+with open(sys.argv[2], 'rb') as f:
+    pdf_bytes = f.read()
+try:
+    with open('/proc/self/statm') as f:
+        before = int(f.read().split()[1]) * resource.getpagesize() // 1024
+except OSError:
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+parse.PARSER.parse_pdf(pdf_bytes, sys.argv[3], 1, sys.argv[4])
+print(before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def peak_rss(pdf_bytes, engine, backend):
+    """(peak RSS MB, MB it rose by while parsing) of one parse_pdf in a fresh interpreter"""
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+        f.write(pdf_bytes)
+        f.flush()
+        output = subprocess.run([sys.executable, '-c', RSS_PROBE, API_DIR, f.name, engine, backend],
+                                capture_output=True, text=True, check=True).stdout
+    before, after = (int(value) / 1024 for value in output.split())  # ru_maxrss is in KB on Linux
+    return round(after, 1), round(after - before, 1)
+
+
+def run_suite(args):
+    core = parse.PARSER
+    order_texts = corpus.generate_orders(args.seed, args.orders, args.cards)
+    order_numbers = [parse.PATTERNS['order_header'].search(text).group(1) for text in order_texts]
+    pdf_bytes = corpus.make_pdf(corpus.paginate(order_texts))
+
+    stages = {
+        'parse_pdf': lambda: core.parse_pdf(pdf_bytes, args.engine, 1, args.backend),
+        'extract_buyer_name': lambda: [core.extract_buyer_name(text, number)
+                                          for text, number in zip(order_texts, order_numbers)],
+        'extract_cards': lambda: [core.extract_cards(text, args.engine) for text in order_texts],
+    }
+    per_order = {
+        'extract_buyer_name': lambda i: core.extract_buyer_name(order_texts[i], order_numbers[i]),
+        'extract_cards': lambda i: core.extract_cards(order_texts[i], args.engine),
+    }
+    results = {}
+    for name, fn in stages.items():
+        seconds, peak = measure(fn, args.repeat)
+        results[name] = {
+            'seconds': round(seconds, 5),
+            'ordersPerSec': round(args.orders / seconds, 1),
+            'peakMemoryKB': round(peak / 1024)
+        }
+        if name in per_order:
+            results[name]['orderPeakKB'] = round(order_peak(per_order[name], args.orders) / 1024, 1)
+    results['parse_pdf']['peakRssMB'], results['parse_pdf']['rssGrowthMB'] = peak_rss(pdf_bytes, args.engine,
+                                                                                      args.backend)
+    return {
+        'config': {
+            'orders': args.orders, 'cards': args.cards, 'seed': args.seed,
+            'engine': args.engine, 'backend': args.backend,
+            'pages': len(corpus.paginate(order_texts)), 'pdfKB': round(len(pdf_bytes) / 1024)
+        },
+        'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+        'maxRssMB': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stages': results
+    }
+
+
+def report(current, baseline):
+    config = current['config']
+    print(f"{config['orders']} orders, ~{config['cards']} cards/order, {config['pages']} pages "
+          f"({config['pdfKB']} KB), engine={config['engine']}, backend={config['backend']}")
+    print(f"  {'stage':<20}{'orders/s':>10}{'baseline':>10}{'change':>9}{'peak KB':>10}{'baseline':>10}"
+          f"{'order KB':>10}{'baseline':>10}")
+    worst = 0.0
+    for name, stage in current['stages'].items():
+        base = (baseline or {}).get('stages', {}).get(name)
+        order_kb = stage.get('orderPeakKB', '-')
+        if base:
+            change = stage['seconds'] / base['seconds'] - 1
+            worst = max(worst, change)
+            print(f"  {name:<20}{stage['ordersPerSec']:>10}{base['ordersPerSec']:>10}{change:>+9.0%}"
+                  f"{stage['peakMemoryKB']:>10}{base['peakMemoryKB']:>10}{order_kb:>10}{base.get('orderPeakKB', '-'):>10}")
+        else:
+            print(f"  {name:<20}{stage['ordersPerSec']:>10}{'-':>10}{'':>9}{stage['peakMemoryKB']:>10}{'-':>10}"
+                  f"{order_kb:>10}{'-':>10}")
+    stage = current['stages']['parse_pdf']
+    base = (baseline or {}).get('stages', {}).get('parse_pdf', {})
+    print(f"  parse_pdf peak RSS {stage['peakRssMB']} MB, {stage['rssGrowthMB']} MB of it while parsing"
+          + (f" (baseline {base['peakRssMB']} MB, {base['rssGrowthMB']} MB)" if 'peakRssMB' in base else ''))
+    print(f"  max RSS {current['maxRssMB']} MB")
+    if baseline and baseline.get('config') != current['config']:
+        print("  note: baseline was recorded with a different config")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=140)
+    parser.add_argument('--cards', type=int, default=10, help='average cards per order')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', default=parse.CARD_ENGINE, choices=parse.CARD_ENGINES)
+    parser.add_argument('--backend', choices=list(parse.EXTRACT_BACKENDS),
+                        help='extraction backend (default: the one the engine uses by default)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage (median reported)')
+    parser.add_argument('--label', help='baseline name (default: <engine>-<backend>)')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--fail-over', type=float, help='exit 1 if a stage is this many percent slower')
+    args = parser.parse_args()
+    args.backend = args.backend or parse.default_backend(args.engine)
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.label or f'{args.engine}-{args.backend}'}.json")
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    current = run_suite(args)
+    worst = report(current, None if args.save_baseline else baseline)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline {os.path.relpath(baseline_path)}")
+    elif args.fail_over is not None and worst * 100 > args.fail_over:
+        print(f"Regression: a stage is {worst:.0%} slower than the baseline (limit {args.fail_over:g}%)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
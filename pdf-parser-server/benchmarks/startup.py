@@ -0,0 +1,92 @@
+"""
+Cold-start import time of each endpoint module, measured with -X importtime.
+
+Every run imports one api/*.py module in a fresh interpreter (bytecode already
+compiled, as in a deployed bundle) and reports the median wall time of the
+import plus its heaviest direct imports. --pdf also times the first
+load_pdfplumber() call that parse.py defers until a PDF is opened.
+
+Usage:
+    python benchmarks/startup.py [--repeat 7] [--top 5] [--pdf]
+"""
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+ENDPOINTS = ('parse', 'queue', 'version')
+
+# Loaded by path under another name: api/queue.py would shadow the stdlib queue module
+IMPORT_SNIPPET = """
+import importlib.util, sys
+from time import perf_counter
+sys.stderr.write('-- endpoint --\\n')
+sys.stderr.flush()
+start = perf_counter()
+spec = importlib.util.spec_from_file_location('endpoint_{name}', {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print('import', perf_counter() - start)
+if {pdf!r} and hasattr(module, 'load_pdfplumber'):
+    start = perf_counter()
+    module.load_pdfplumber()
+    print('pdfplumber', perf_counter() - start)
+"""
+
+
+def run_once(name, pdf):
+    """Import one endpoint in a fresh interpreter; returns (timings, {module: cumulative_us})"""
+    code = IMPORT_SNIPPET.format(name=name, path=os.path.join(API_DIR, f"{name}.py"), pdf=pdf)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, check=True)
+
+    timings = {}
+    for line in result.stdout.splitlines():
+        label, value = line.split()
+        timings[label] = float(value) * 1000
+
+    # Top-level lines ("import time: self | cumulative | name") after the
+    # marker are the endpoint's direct imports; earlier ones are interpreter startup
+    direct = {}
+    lines = result.stderr.splitlines()
+    for line in lines[lines.index('-- endpoint --') + 1:]:
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, module = line.split('|')
+        if module.startswith('  '):
+            continue
+        direct[module.strip()] = int(cumulative)
+    return timings, direct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=7, help='fresh interpreters per endpoint (median reported)')
+    parser.add_argument('--top', type=int, default=5, help='heaviest direct imports to list')
+    parser.add_argument('--pdf', action='store_true', help='also time the deferred pdfplumber import')
+    args = parser.parse_args()
+
+    compileall.compile_dir(API_DIR, quiet=1)
+
+    for name in ENDPOINTS:
+        runs = [run_once(name, args.pdf) for _ in range(args.repeat)]
+        import_ms = statistics.median(timings['import'] for timings, _ in runs)
+        print(f"api/{name}.py: {import_ms:.1f} ms")
+
+        if args.pdf and 'pdfplumber' in runs[0][0]:
+            pdf_ms = statistics.median(timings['pdfplumber'] for timings, _ in runs)
+            print(f"  + first PDF (pdfplumber import): {pdf_ms:.1f} ms")
+
+        modules = {module for _, direct in runs for module in direct}
+        medians = {module: statistics.median(direct.get(module, 0) for _, direct in runs) / 1000
+                   for module in modules}
+        for module, ms in sorted(medians.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {module:<24}{ms:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Bulk-parse a directory of Direct PDFs into JSONL, one line per file.
+
+Uses the same parser core as /api/parse (parse.parse_orders), spread over
+a process pool. Each line carries the file path, success flag, order count,
+parse time and either the orders or the error.
+
+Usage:
+    python tools/bulk_parse.py archive/ -o parsed.jsonl --jobs 8
+    python tools/bulk_parse.py archive/ --engine linear --backend pdfminer --compact > parsed.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from time import perf_counter
+
+# Appended, not prepended: api/queue.py would otherwise shadow the stdlib queue
+# module that multiprocessing.Pool imports
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import parse  # noqa: E402
+
+
+def find_pdfs(paths):
+    """PDF files named directly or found (recursively) under directories, in sorted order"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, name) for name in sorted(files)
+                             if name.lower().endswith('.pdf'))
+        else:
+            found.append(path)
+    return found
+
+
+def parse_file(task):
+    """Pool worker: parse one PDF and return its JSONL record"""
+    path, engine, backend, compact = task
+    start = perf_counter()
+    try:
+        orders = parse.parse_orders(path, engine, 1, backend)
+    except Exception as e:
+        return {'file': path, 'success': False, 'error': str(e),
+                'seconds': round(perf_counter() - start, 3)}
+    finally:
+        # Pool workers are terminated without running atexit, so counts are written per file
+        parse.flush_pattern_profile()
+    if compact:
+        orders = [parse.compact_order(order) for order in orders]
+    return {'file': path, 'success': True, 'totalOrders': len(orders),
+            'seconds': round(perf_counter() - start, 3), 'orders': orders}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='PDF files or directories to search for *.pdf')
+    parser.add_argument('-o', '--output', help='JSONL file to write (default: stdout)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--engine', default=parse.CARD_ENGINE, choices=parse.CARD_ENGINES)
+    parser.add_argument('--backend', choices=list(parse.EXTRACT_BACKENDS),
+                        help='extraction backend (default: the one the engine uses by default)')
+    parser.add_argument('--compact', action='store_true', help='drop startPos/endPos/debug from orders')
+    args = parser.parse_args()
+    args.backend = args.backend or parse.default_backend(args.engine)
+
+    pdfs = find_pdfs(args.paths)
+    tasks = [(path, args.engine, args.backend, args.compact) for path in pdfs]
+    out = open(args.output, 'w') if args.output else sys.stdout
+    failed = 0
+    start = perf_counter()
+    try:
+        with multiprocessing.Pool(max(1, args.jobs)) as pool:
+            # Ordered results so the output follows the file list; small chunks keep workers busy
+            for record in pool.imap(parse_file, tasks, chunksize=1):
+                failed += not record['success']
+                out.write(json.dumps(record, separators=parse.COMPACT_SEPARATORS) + '\n')
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = perf_counter() - start
+    print(f"Parsed {len(pdfs) - failed}/{len(pdfs)} files in {elapsed:.1f}s "
+          f"({len(pdfs) / elapsed if elapsed else 0:.1f} files/s, {args.jobs} jobs)", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Run queued async parse jobs from the job store.
+
+For deployments with JOB_RUNNER=external, where the instance that accepts
+a job can't keep parsing after it responds (e.g. Vercel freezes a function
+once its response is sent). Point JOB_STORE at the same store as the API
+and run this wherever long parses are allowed; it claims the oldest queued
+job, parses it with progress updates, and moves on to the next.
+
+Usage:
+    python tools/job_worker.py              # keep polling for jobs
+    python tools/job_worker.py --once       # run queued jobs, then exit
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+import parse  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--once', action='store_true', help='exit once no job is queued')
+    parser.add_argument('--poll', type=float, default=2.0, help='seconds to wait when no job is queued')
+    args = parser.parse_args()
+
+    done = 0
+    while True:
+        if parse.work_job():
+            done += 1
+            continue
+        if args.once:
+            break
+        time.sleep(args.poll)
+    print(f"Ran {done} job{'s' if done != 1 else ''}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Long-running parse server: /api/parse, /api/queue and /api/version on one port.
+
+For running the parser on our own machine rather than as Vercel functions,
+where every cold invocation pays for importing the endpoint and pdfplumber.
+The parent imports the endpoint modules and pdfplumber once, binds the port
+and pre-forks SERVER_WORKERS processes that inherit the warm interpreter.
+Workers accept connections from the shared socket and serve one connection
+at a time, with HTTP/1.1 keep-alive (idle connections are closed after
+SERVER_KEEPALIVE_SECONDS). A worker exits after SERVER_MAX_REQUESTS requests
+(plus up to 10% jitter, so workers don't all recycle at once) and the parent
+forks a fresh one, which hands back whatever memory its parses left behind.
+The parent itself never parses.
+
+The endpoints run unchanged. Each worker has its own in-memory parse cache
+and metrics (/api/parse?metrics reports the worker that answered); the
+disk cache and the job store are shared. SIGTERM or Ctrl-C stops the
+workers once their current request is done.
+
+Usage:
+    python tools/serve.py                                # 127.0.0.1:3000, one worker per CPU
+    python tools/serve.py --host 0.0.0.0 --port 8080 --workers 4 --max-requests 200
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Imported through the api package: on sys.path, api/queue.py would shadow the stdlib queue module
+from api import parse, queue as queue_endpoint, version  # noqa: E402
+
+SERVER_HOST = os.environ.get('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.environ.get('SERVER_PORT', '3000'))
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', '0'))  # 0 = one per CPU
+SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', '500'))
+SERVER_KEEPALIVE_SECONDS = float(os.environ.get('SERVER_KEEPALIVE_SECONDS', '5'))
+
+# A worker that fails sooner than this after starting is replaced only after a pause
+RESPAWN_PAUSE_SECONDS = 1.0
+
+# Set in a worker once it has been asked to stop
+STOPPING = False
+
+
+class WarmRoute(BaseHTTPRequestHandler):
+    """Keep-alive connection that dispatches each request to its endpoint's handler.
+
+    Once a request's line and headers are parsed, the instance's class is
+    switched to the route for its path (the endpoint's handler class with
+    this one in front), so the endpoint's do_* methods run as on Vercel.
+    A response without Content-Length or chunked encoding, an error response
+    that may leave the request body unread, and the last request before the
+    worker recycles or stops all close the connection.
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = SERVER_KEEPALIVE_SECONDS
+    routes = {}
+    served = 0  # requests this worker has started
+    max_requests = SERVER_MAX_REQUESTS
+
+    def parse_request(self):
+        self.response_code = None
+        self.response_framed = False
+        self.response_closes = False
+        if not super().parse_request():
+            return False
+        WarmRoute.served += 1
+        self.__class__ = self.routes.get(urlsplit(self.path).path.rstrip('/'), NotFound)
+        return True
+
+    def send_response(self, code, message=None):
+        self.response_code = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        name = keyword.lower()
+        if name == 'content-length' or (name == 'transfer-encoding' and 'chunked' in value.lower()):
+            self.response_framed = True
+        elif name == 'connection' and value.lower() == 'close':
+            self.response_closes = True
+        super().send_header(keyword, value)
+
+    def end_headers(self):
+        if not self.response_closes and self.close_after_response():
+            self.send_header('Connection', 'close')  # also sets close_connection
+        super().end_headers()
+
+    def close_after_response(self):
+        if STOPPING or WarmRoute.served >= self.max_requests or not self.response_framed:
+            return True
+        headers = getattr(self, 'headers', None)
+        if self.response_code is not None and self.response_code >= 400 and headers is not None:
+            return headers.get('Content-Length', '0').strip() != '0' or 'Transfer-Encoding' in headers
+        return False
+
+
+class NotFound(WarmRoute):
+    """Any path other than the hosted endpoints"""
+
+    def send_not_found(self):
+        body = b'{"success": false, "error": "Not found"}'
+        self.send_response(404)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = do_HEAD = send_not_found
+
+
+WarmRoute.routes = {
+    f"/api/{name}": type(f"{name.capitalize()}Route", (WarmRoute, module.handler), {})
+    for name, module in (('parse', parse), ('queue', queue_endpoint), ('version', version))
+}
+
+
+def warm_up():
+    """Import what the first request would otherwise pay for"""
+    parse.load_pdfplumber()
+    try:
+        import pdfminer.high_level  # noqa: F401  (the pdfminer backend and the order index)
+        import requests  # noqa: F401  (the queue endpoint's Convex calls)
+    except ImportError:
+        pass
+
+
+def serve_worker(listener, max_requests):
+    """Accept and serve connections until max_requests have been handled or the worker is stopped"""
+    busy = False
+
+    def stop(signum, frame):
+        global STOPPING
+        STOPPING = True
+        if not busy:
+            raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent relays Ctrl-C as SIGTERM
+
+    server = HTTPServer(listener.getsockname()[:2], WarmRoute, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    WarmRoute.max_requests = max_requests
+    while not STOPPING and WarmRoute.served < max_requests:
+        connection, address = listener.accept()
+        busy = True
+        try:
+            server.finish_request(connection, address)
+        except Exception:
+            server.handle_error(connection, address)
+        finally:
+            server.shutdown_request(connection)
+            busy = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help='worker processes (0 = one per CPU)')
+    parser.add_argument('--max-requests', type=int, default=SERVER_MAX_REQUESTS,
+                        help='requests a worker serves before it is replaced')
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+
+    warm_up()
+    listener = socket.create_server((args.host, args.port), backlog=128)
+    print(f"Serving /api/parse, /api/queue and /api/version on http://{args.host}:{args.port} "
+          f"with {workers} worker{'s' if workers != 1 else ''}, recycled after ~{args.max_requests} requests",
+          file=sys.stderr)
+
+    children = {}  # pid -> start time
+    stopping = False
+
+    def spawn():
+        limit = args.max_requests + random.randint(0, args.max_requests // 10)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                serve_worker(listener, limit)
+            except SystemExit:
+                pass
+            except BaseException:
+                code = 1
+            finally:
+                try:
+                    parse.flush_pattern_profile()  # os._exit skips the atexit flush
+                finally:
+                    os._exit(code)
+        children[pid] = time.monotonic()
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        if status and time.monotonic() - started < RESPAWN_PAUSE_SECONDS:
+            print(f"Worker {pid} failed right after starting (status {status}); replacing it shortly", file=sys.stderr)
+            time.sleep(RESPAWN_PAUSE_SECONDS)
+        spawn()
+    listener.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Summarise a shadow-mode log (SHADOW_LOG): parity and speedup of the candidate engine.
+
+Each served engine / candidate pair is reported separately: how many orders
+matched card for card, how many differed (and by how many missing, extra and
+changed cards), how many raised, and the total and median card extraction
+time of both engines. Orders where a layout engine had no usable table rows
+and fell back to linear are reported as "layout->linear", apart from the
+orders it read from table rows. With -v the differing orders are listed too.
+
+Usage:
+    python tools/shadow_report.py                         # the default SHADOW_LOG
+    python tools/shadow_report.py /var/log/pdf-parse-shadow.jsonl -v
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+DEFAULT_LOG = os.environ.get('SHADOW_LOG', os.path.join(tempfile.gettempdir(), 'pdf-parse-shadow.jsonl'))
+
+
+def read_records(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def engine_label(engine, layout):
+    """engine, or "layout->linear" when a layout engine fell back for this order"""
+    return f"{engine}->linear" if layout and layout.get('fallback') else engine
+
+
+def report(records, verbose=False):
+    pairs = {}
+    for record in records:
+        key = (engine_label(record['engine'], record.get('layout')),
+               engine_label(record['candidate'], record.get('candidateLayout')))
+        pairs.setdefault(key, []).append(record)
+    if not pairs:
+        print("No shadowed orders")
+        return
+    for (engine, candidate), group in sorted(pairs.items()):
+        outcomes = {'match': 0, 'differ': 0, 'error': 0}
+        for record in group:
+            outcomes[record['outcome']] += 1
+        served_ms = [record['ms'] for record in group]
+        candidate_ms = [record['candidateMs'] for record in group]
+        print(f"{engine} served, {candidate} shadowed: {len(group)} orders, {outcomes['match']} matched "
+              f"({outcomes['match'] / len(group):.1%}), {outcomes['differ']} differed, {outcomes['error']} raised")
+        print(f"  cards: {sum(len(record.get('missing', ())) for record in group)} missing, "
+              f"{sum(len(record.get('extra', ())) for record in group)} extra, "
+              f"{sum(len(record.get('changed', ())) for record in group)} changed "
+              f"of {sum(record.get('cards', 0) for record in group)} served")
+        speedup = sum(served_ms) / sum(candidate_ms) if sum(candidate_ms) else float('inf')
+        print(f"  card extraction: {engine} {sum(served_ms):.1f} ms total ({statistics.median(served_ms):.3f} median), "
+              f"{candidate} {sum(candidate_ms):.1f} ms total ({statistics.median(candidate_ms):.3f} median), "
+              f"{speedup:.2f}x")
+        if verbose:
+            for record in group:
+                if record['outcome'] == 'error':
+                    print(f"    {record['orderNumber']}: {record['error']}")
+                elif record['outcome'] == 'differ':
+                    print(f"    {record['orderNumber']}: missing {record['missing']}, extra {record['extra']}, "
+                          f"changed {record['changed']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('log', nargs='?', default=DEFAULT_LOG, help='shadow log (default: SHADOW_LOG)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='list every differing order')
+    args = parser.parse_args()
+    if not os.path.exists(args.log):
+        sys.exit(f"{args.log} does not exist; run the parser with SHADOW_ENGINE set first")
+    report(read_records(args.log), args.verbose)
+
+
+if __name__ == '__main__':
+    main()
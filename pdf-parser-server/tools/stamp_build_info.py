@@ -0,0 +1,52 @@
+"""
+Generate api/_build_info.py with the commit, parser version and pattern list.
+
+Run at build time (vercel.json buildCommand) so /api/version can serve a
+constant instead of shelling out to git on every request; the deployed
+bundle has no .git directory anyway.
+
+Usage:
+    python tools/stamp_build_info.py
+"""
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+OUTPUT = os.path.join(API_DIR, '_build_info.py')
+
+sys.path.insert(0, API_DIR)
+
+import parse  # noqa: E402
+
+
+def git(*args):
+    try:
+        return subprocess.check_output(['git', *args], cwd=API_DIR,
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    # Vercel exposes the deployed commit in the build environment
+    commit = (os.environ.get('VERCEL_GIT_COMMIT_SHA') or '')[:7] or git('rev-parse', '--short', 'HEAD') or 'unknown'
+    message = (os.environ.get('VERCEL_GIT_COMMIT_MESSAGE') or '').split('\n')[0] or git('log', '-1', '--format=%s') or ''
+    
+    build_info = {
+        'commit': commit,
+        'message': message,
+        'parserVersion': parse.PARSER_VERSION,
+        'patterns': parse.PATTERNS.names(),
+        'builtAt': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    }
+    
+    with open(OUTPUT, 'w') as f:
+        f.write('"""Generated by tools/stamp_build_info.py - do not edit"""\n')
+        f.write(f"BUILD_INFO = {build_info!r}\n")
+    print(f"Wrote {os.path.relpath(OUTPUT)} ({commit}, parser {parse.PARSER_VERSION}, {len(build_info['patterns'])} patterns)")
+
+
+if __name__ == '__main__':
+    main()
@@ -232,7 +232,8 @@ function extractTextFromPDF(blob) {
     const options = {
       method: 'post',
       contentType: 'application/json',
-      payload: JSON.stringify({ pdf: base64PDF }),
+      // compact: drop startPos/endPos/debug so PARSED_ORDERS fits in Script Properties
+      payload: JSON.stringify({ pdf: base64PDF, compact: true }),
       muteHttpExceptions: true
     };
     